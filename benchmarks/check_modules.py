@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Checks results of modules and the roles using them against a synthetic cluster
+
+Every check runs modules the same way run_benchmarks.py does and verifies
+what they return, send or leave behind, rather than how fast they are.
+
+Examples:
+    ./check_modules.py
+    ./check_modules.py -v role_templates
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import jinja2
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, BENCH_DIR)
+
+from cluster_model import ClusterModel  # noqa: E402
+from run_benchmarks import Bench  # noqa: E402
+
+
+def _first_guest(state, vm_type='qemu'):
+    return min([int(v) for (v, g) in state['guests'].items() if g['type'] == vm_type])
+
+
+def _jinja():
+    """Returns an environment evaluating templates like Ansible does"""
+
+    env = jinja2.Environment(undefined=jinja2.StrictUndefined)
+    env.filters['to_json'] = json.dumps
+    return env
+
+
+def check_role_templates(bench, state):
+    """Renders the templates and conditions of the roles with the result of vm_get_config"""
+
+    problems = list()
+    vmid = _first_guest(state)
+    (_wall, result, _calls) = bench.run('vm_get_config', dict(vmid=vmid))
+    if result.get('failed', False):
+        return ["vm_get_config failed: %s" % result.get('msg', '')]
+    env = _jinja()
+
+    # vm_cloudinit: MAC addresses of the configured interfaces
+    with open(os.path.join(REPO_DIR, 'roles', 'vm_cloudinit', 'templates', 'network-config.j2'), 'r') as f:
+        template = env.from_string(f.read())
+    try:
+        rendered = yaml.safe_load(template.render(
+            pve_vm_net={0: dict(ip='192.0.2.10', s_net=24, gw='192.0.2.1')},
+            _pve_vm_current_config=result,
+        ))
+        mac = rendered['ethernets']['enp6s18']['match']['macaddress']
+        if mac != "bc:24:11:%02x:%02x:%02x" % ((vmid >> 16) & 255, (vmid >> 8) & 255, vmid & 255):
+            problems.append("network-config.j2 rendered MAC %s" % mac)
+    except Exception as e:
+        problems.append("network-config.j2: %s: %s" % (type(e).__name__, e))
+
+    # vm_disks: existing disks are resized, missing ones created
+    with open(os.path.join(REPO_DIR, 'roles', 'vm_disks', 'tasks', 'main.yml'), 'r') as f:
+        tasks = dict([(t['name'], t) for t in yaml.safe_load(f)])
+    for (task, c_key, expected) in [
+        ('resize disks', 'scsi0', True), ('resize disks', 'scsi9', False),
+        ('create disks', 'scsi0', False), ('create disks', 'scsi9', True),
+    ]:
+        try:
+            run = all([
+                env.compile_expression(cond)(
+                    c_key=c_key, item=dict(key=c_key[4:], value=dict(size='40G')),
+                    pve_vm_state='present', _pve_vm_get_config=result,
+                )
+                for cond in tasks[task]['when']
+            ])
+        except Exception as e:
+            problems.append("vm_disks '%s' for %s: %s: %s" % (task, c_key, type(e).__name__, e))
+            continue
+        if run != expected:
+            problems.append("vm_disks '%s' %s for %s" % (task, "ran" if run else "skipped", c_key))
+    return problems
+
+
+def _config(bench, vmid):
+    """Returns the config of a guest as the cluster has it now"""
+
+    with open(bench.state_file, 'r') as f:
+        state = json.load(f)
+    return ClusterModel(state).config(state['guests'][str(vmid)])
+
+
+def check_config_delete(bench, state):
+    """Deletes keys with vm_config given as string, CSV and list like roles/vm_cloudinit does"""
+
+    problems = list()
+    vmids = sorted([int(v) for (v, g) in state['guests'].items() if g['type'] == 'qemu'])
+    for (vmid, delete, keys) in [
+        (vmids[0], 'ide2', ['ide2']),
+        (vmids[1], 'ide2,description', ['ide2', 'description']),
+        (vmids[2], ['ide2', 'description'], ['ide2', 'description']),
+    ]:
+        (_wall, result, calls) = bench.run('vm_config', dict(vmid=vmid, update=dict(delete=delete)))
+        left = [k for k in keys if k in _config(bench, vmid)]
+        if result.get('failed', False) or (not result.get('changed', False)) or (len(left) > 0):
+            problems.append("delete %s: changed=%s, still set: %s, msg: %s" % (
+                json.dumps(delete), result.get('changed', None), ', '.join(left), result.get('msg', ''),
+            ))
+        # again, nothing left to delete
+        (_wall, result, calls) = bench.run('vm_config', dict(vmid=vmid, update=dict(delete=delete)))
+        writes = [c for c in calls if c['method'] != 'get']
+        if result.get('changed', True) or (len(writes) > 0):
+            problems.append("delete %s again: changed=%s, %d writes" % (
+                json.dumps(delete), result.get('changed', None), len(writes),
+            ))
+    return problems
+
+
+def check_config_hotplug(bench, state):
+    """Sets hotplug as list with vm_config, reads it back and sets it again in another order"""
+
+    problems = list()
+    vmids = sorted([int(v) for (v, g) in state['guests'].items() if g['type'] == 'qemu'])
+
+    # as written by Proxmox VE itself
+    with open(bench.state_file, 'r') as f:
+        cluster = json.load(f)
+    config = ClusterModel(cluster).config(cluster['guests'][str(vmids[1])])
+    cluster['configs'][str(vmids[1])] = dict(config, hotplug='disk,network,usb')
+    with open(bench.state_file, 'w') as f:
+        json.dump(cluster, f)
+
+    (_wall, result, _calls) = bench.run('vm_config', dict(
+        vmid=vmids[0], update=dict(hotplug=['network', 'disk', 'usb']),
+    ))
+    hotplug = _config(bench, vmids[0]).get('hotplug', None)
+    if result.get('failed', False) or (not result.get('changed', False)) or (hotplug != 'network,disk,usb'):
+        problems.append("set: changed=%s, hotplug=%s, msg: %s" % (
+            result.get('changed', None), hotplug, result.get('msg', ''),
+        ))
+
+    for vmid in vmids[:2]:
+        (_wall, result, _calls) = bench.run('vm_get_config', dict(vmid=vmid))
+        if result.get('failed', False):
+            problems.append("vm_get_config %d failed: %s" % (vmid, result.get('msg', '')))
+            continue
+        parsed = result['pve_vm_config'][1].get('hotplug', None)
+        if sorted(parsed or list()) != ['disk', 'network', 'usb']:
+            problems.append("vm_get_config %d: hotplug parsed as %s" % (vmid, json.dumps(parsed)))
+            continue
+        for desired in [list(reversed(parsed)), ','.join(parsed)]:
+            (_wall, result, calls) = bench.run('vm_config', dict(vmid=vmid, update=dict(hotplug=desired)))
+            writes = [c for c in calls if c['method'] != 'get']
+            if result.get('failed', False) or result.get('changed', True) or (len(writes) > 0):
+                problems.append("set %s on %d again: changed=%s, %d writes, msg: %s" % (
+                    json.dumps(desired), vmid, result.get('changed', None), len(writes),
+                    result.get('msg', ''),
+                ))
+    return problems
+
+
+def check_migrate_no_target(bench, state):
+    """Evacuates a node with vm_migrate where one HA group has no other member"""
+
+    problems = list()
+    src = state['local_node']
+    with open(bench.state_file, 'r') as f:
+        cluster = json.load(f)
+    groups = dict([(r['sid'], r['group']) for r in cluster['ha_resources']])
+    stuck = [
+        int(v) for (v, g) in sorted(cluster['guests'].items())
+        if (g['node'] == src) and (groups.get("vm:%s" % v, None) == 'ha0')
+    ]
+    movable = [
+        int(v) for (v, g) in sorted(cluster['guests'].items())
+        if (g['node'] == src) and (g['type'] == 'qemu') and (groups.get("vm:%s" % v, None) != 'ha0')
+    ]
+    # ha0 only consists of the source node
+    for g in cluster['ha_groups']:
+        if g['group'] == 'ha0':
+            g['nodes'] = src
+    with open(bench.state_file, 'w') as f:
+        json.dump(cluster, f)
+
+    vmids = stuck[:1] + movable[:1]
+    (_wall, result, _calls) = bench.run('vm_migrate', dict(
+        src_node_name=src, vmids=vmids, allow_overcommit=True, _ansible_check_mode=True,
+    ))
+    if result.get('failed', False):
+        return ["vm_migrate failed: %s" % result.get('msg', '')]
+    if result.get('no_target', None) != stuck[:1]:
+        problems.append("no_target: %s, expected %s" % (result.get('no_target', None), stuck[:1]))
+    if result.get('unplaced', None) != list():
+        problems.append("unplaced: %s" % result.get('unplaced', None))
+    if stuck[0] not in result['message'].get(src, list()):
+        problems.append("VM %d does not stay on %s: %s" % (stuck[0], src, json.dumps(result['message'])))
+    if not any([movable[0] in v for (n, v) in result['message'].items() if n != src]):
+        problems.append("VM %d not placed: %s" % (movable[0], json.dumps(result['message'])))
+    return problems
+
+
+def check_ceph_flags_task(bench, state):
+    """Sets noout with ceph_flags, which has to wait for the task and fail with it"""
+
+    problems = list()
+    (_wall, result, calls) = bench.run('ceph_flags', dict(noout=True))
+    with open(bench.state_file, 'r') as f:
+        cluster = json.load(f)
+    paths = [c['path'] for c in calls]
+    waited = [
+        i for (i, c) in enumerate(calls)
+        if (c['method'] == 'get') and ('/tasks/' in c['path']) and c['path'].endswith('/status')
+    ]
+    sets = [i for (i, c) in enumerate(calls) if c['method'] == 'set']
+    if result.get('failed', False) or (not result.get('changed', False)) or \
+            (not cluster['ceph_flags'].get('noout', False)):
+        problems.append("set noout: changed=%s, noout=%s, msg: %s" % (
+            result.get('changed', None), cluster['ceph_flags'].get('noout', None), result.get('msg', ''),
+        ))
+    if (len(sets) != 1) or (len(waited) == 0) or (max(waited) < sets[0]):
+        problems.append("task of set noout not waited for: %s" % ', '.join(paths))
+
+    cluster['flags_task_status'] = 'command failed'
+    with open(bench.state_file, 'w') as f:
+        json.dump(cluster, f)
+    (_wall, result, calls) = bench.run('ceph_flags', dict(noout=False))
+    if not result.get('failed', False):
+        problems.append("unset noout with a failing task did not fail")
+    return problems
+
+
+def check_disk_sizes(bench, state):
+    """Creates disks of fractional GiB with vm_disks, which must not be truncated"""
+
+    problems = list()
+    vmid = _first_guest(state)
+    (_wall, result, _calls) = bench.run('vm_disks', dict(
+        vmid=vmid, parallel_storages=True, scsi={
+            '5': dict(size=0.5, storage='ceph'), '6': dict(size=2, storage='local-lvm'),
+        },
+    ))
+    with open(bench.state_file, 'r') as f:
+        volumes = json.load(f).get('volumes', dict())
+    sizes = sorted([v['size'] // (1024 * 1024) for v in volumes.values()])
+    if result.get('failed', False) or (sizes != [512, 2048]):
+        problems.append("allocated %s MiB, msg: %s" % (sizes, result.get('msg', '')))
+
+    (_wall, result, calls) = bench.run('vm_disks', dict(vmid=vmid, scsi={'7': dict(size=1.0001, storage='ceph')}))
+    writes = [c for c in calls if c['method'] != 'get']
+    if (not result.get('failed', False)) or (len(writes) > 0):
+        problems.append("size 1.0001 not rejected: %d writes, msg: %s" % (len(writes), result.get('msg', '')))
+    return problems
+
+
+# name -> function(bench, cluster state) returning a list of problems
+CHECKS = dict(
+    role_templates=check_role_templates,
+    config_delete=check_config_delete,
+    config_hotplug=check_config_hotplug,
+    migrate_no_target=check_migrate_no_target,
+    ceph_flags_task=check_ceph_flags_task,
+    disk_sizes=check_disk_sizes,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('checks', nargs='*', default=sorted(CHECKS.keys()),
+                        help="checks to run (default: all of %s)" % ', '.join(sorted(CHECKS)))
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="print the docstring of every check")
+    opts = parser.parse_args()
+
+    for name in opts.checks:
+        if name not in CHECKS:
+            parser.error("unknown check %s" % name)
+
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix='pve-check-') as workdir:
+        bench = Bench(workdir, 0.0)
+        try:
+            for name in opts.checks:
+                state = bench.setup_cluster(3, 20)
+                problems = CHECKS[name](bench, state)
+                print("%-8s %s" % ('OK' if len(problems) == 0 else 'FAILED', name))
+                if opts.verbose:
+                    print("    %s" % CHECKS[name].__doc__)
+                for p in problems:
+                    print("    %s" % p)
+                if len(problems) > 0:
+                    failures += 1
+        finally:
+            bench.stop_server()
+    return 1 if failures > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Compares answers of the pmxcfs reader with those of the pvesh fallback
+
+pmxcfs/etc-pve holds the files of /etc/pve of a small cluster, pmxcfs/pvesh.json
+what pvesh answered on the same cluster. Every lookup is done once with
+pmxcfs enabled and once with the recorded pvesh, the answers have to be the
+same and the pmxcfs run must not call pvesh, unless the reader cannot answer
+the lookup (vm_info of HA managed guests).
+
+On a Proxmox VE node with this collection installed, --capture copies the
+files of the given guests from /etc/pve and records the answers of pvesh
+to build a new fixture from.
+
+Examples:
+    ./check_pmxcfs.py
+    ./check_pmxcfs.py -v
+    ./check_pmxcfs.py --capture /tmp/fixture --vmids 100,101,102
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, 'pmxcfs')
+
+sys.path.insert(0, BENCH_DIR)
+
+from run_benchmarks import Bench  # noqa: E402
+
+# name -> function(module, vmid) returning the answer to compare
+LOOKUPS = dict(
+    get_local_node=lambda mod, vmid: mod.get_local_node(),
+    get_nodes=lambda mod, vmid: mod.get_nodes(),
+    vm_locate=lambda mod, vmid: mod.vm_locate(vmid),
+    vm_info=lambda mod, vmid: mod.vm_info(vmid),
+    vm_config_get_raw=lambda mod, vmid: mod.vm_config_get_raw(vmid)[1],
+    vm_config_get=lambda mod, vmid: mod.vm_config_get(vmid)[1],
+)
+
+# lookups which are independent of the guest
+GLOBAL_LOOKUPS = ['get_local_node', 'get_nodes']
+
+# files copied from /etc/pve by --capture, besides the guest configs
+CAPTURED_FILES = ['.members', '.vmlist', '.rrd', 'user.cfg', 'ha/resources.cfg']
+
+
+def lookup_module():
+    """Answers a single lookup, run like an Ansible module"""
+
+    from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+
+    mod = PveApiModule(argument_spec=dict(
+        lookup=dict(type='str', required=True, choices=list(LOOKUPS.keys())),
+        vmid=dict(type='int', required=True),
+    ))
+    mod.exit_json(changed=False, answer=LOOKUPS[mod.params['lookup']](mod, mod.params['vmid']))
+
+
+def _pvesh(bench, recording, real_pvesh=None):
+    """Puts a pvesh answering with (or recording to) recording on PATH"""
+
+    with open(os.path.join(bench.workdir, 'bin', 'pvesh'), 'w') as f:
+        f.write("#!/bin/sh\nexec '%s' '%s' \"$@\"\n" % (
+            sys.executable, os.path.join(BENCH_DIR, 'replay_pvesh.py')
+        ))
+    bench.env['PVE_PVESH_REPLAY'] = recording
+    if real_pvesh is not None:
+        bench.env['PVE_PVESH_RECORD'] = real_pvesh
+
+
+def _expects_api(name, vmid, etc_pve):
+    """Returns true if the reader is expected to fall back to pvesh"""
+
+    if name != 'vm_info':
+        return False
+    try:
+        with open(os.path.join(etc_pve, 'ha', 'resources.cfg'), 'r') as f:
+            ha = f.read()
+    except OSError:
+        return False
+    return any([
+        line.split(':', 1)[1].strip() == str(vmid)
+        for line in ha.split("\n") if line.split(':', 1)[0] in ['vm', 'ct']
+    ])
+
+
+def _lookup(bench, name, vmid, args):
+    """Runs a lookup in a separate process
+
+    :returns: (answer, number of pvesh calls)
+    """
+
+    args_file = os.path.join(bench.workdir, 'args.json')
+    with open(args_file, 'w') as f:
+        json.dump(dict(ANSIBLE_MODULE_ARGS=dict(args, lookup=name, vmid=vmid)), f)
+    open(bench.log, 'w').close()
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), args_file],
+        env=bench.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    try:
+        result = json.loads(proc.stdout)
+    except ValueError:
+        result = dict(failed=True, msg=(proc.stdout + proc.stderr).strip()[-500:])
+    with open(bench.log, 'r') as f:
+        calls = len([line for line in f if line.strip() != ""])
+    if result.get('failed', False):
+        return dict(failed=result.get('msg', '')), calls
+    return result['answer'], calls
+
+
+def run_checks(fixture_dir, verbose=False):
+    """Runs all lookups for all guests of a fixture
+
+    :returns: number of mismatches
+    """
+
+    etc_pve = os.path.join(fixture_dir, 'etc-pve')
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix='pve-pmxcfs-') as workdir:
+        bench = Bench(workdir, 0.0)
+        _pvesh(bench, os.path.join(fixture_dir, 'pvesh.json'))
+
+        with open(os.path.join(etc_pve, '.vmlist'), 'r') as f:
+            vmids = sorted([int(v) for v in json.load(f)['ids']])
+
+        for name in sorted(LOOKUPS):
+            for vmid in vmids:
+                answers = dict()
+                calls = dict()
+                for (backend, args) in [
+                    ('pmxcfs', dict(pmxcfs=True, pmxcfs_path=etc_pve)),
+                    ('pvesh', dict()),
+                ]:
+                    (answers[backend], calls[backend]) = _lookup(bench, name, vmid, args)
+
+                ok = (answers['pmxcfs'] == answers['pvesh']) and \
+                    ((calls['pmxcfs'] == 0) != _expects_api(name, vmid, etc_pve))
+                if not ok:
+                    failures += 1
+                print("%-8s %-18s %4d  pvesh calls: %d/%d" % (
+                    'OK' if ok else 'MISMATCH', name, vmid, calls['pmxcfs'], calls['pvesh'],
+                ))
+                if verbose or not ok:
+                    for backend in ['pmxcfs', 'pvesh']:
+                        print("    %-7s %s" % (backend, json.dumps(answers[backend], sort_keys=True)))
+                if name in GLOBAL_LOOKUPS:
+                    break
+    return failures
+
+
+def capture(target, vmids, root='/etc/pve', pvesh='/usr/bin/pvesh'):
+    """Builds a fixture from a Proxmox VE node
+
+    Copies the files of the given guests from root and records what pvesh
+    answers to the lookups. Status data and pools of other guests are left
+    out, user.cfg is reduced to its pools.
+    """
+
+    etc_pve = os.path.join(target, 'etc-pve')
+    os.makedirs(etc_pve)
+    with open(os.path.join(root, '.vmlist'), 'r') as f:
+        vmlist = json.load(f)
+    vmlist['ids'] = dict([(k, v) for (k, v) in vmlist['ids'].items() if int(k) in vmids])
+
+    for name in CAPTURED_FILES:
+        if not os.path.exists(os.path.join(root, name)):
+            continue
+        with open(os.path.join(root, name), 'r') as f:
+            lines = f.read().split("\n")
+        if name == '.vmlist':
+            lines = json.dumps(vmlist, indent=1).split("\n")
+        elif name == '.rrd':
+            lines = [
+                line for line in lines
+                if (not line.startswith('pve2.3-vm/')) or
+                (int(line.split(':', 1)[0].split('/', 1)[1]) in vmids)
+            ]
+        elif name == 'user.cfg':
+            lines = [line for line in lines if line.startswith('pool:')]
+        os.makedirs(os.path.dirname(os.path.join(etc_pve, name)), exist_ok=True)
+        with open(os.path.join(etc_pve, name), 'w') as f:
+            f.write("\n".join(lines))
+    for (vmid, e) in vmlist['ids'].items():
+        path = os.path.join('nodes', e['node'], 'qemu-server' if e['type'] == 'qemu' else 'lxc')
+        os.makedirs(os.path.join(etc_pve, path), exist_ok=True)
+        shutil.copy(os.path.join(root, path, "%s.conf" % vmid), os.path.join(etc_pve, path))
+
+    recording = os.path.join(target, 'pvesh.json')
+    with tempfile.TemporaryDirectory(prefix='pve-pmxcfs-') as workdir:
+        bench = Bench(workdir, 0.0)
+        _pvesh(bench, recording, real_pvesh=pvesh)
+        for name in sorted(LOOKUPS):
+            for vmid in sorted(vmids):
+                (answer, _calls) = _lookup(bench, name, vmid, dict())
+                if isinstance(answer, dict) and ('failed' in answer):
+                    print("%s %d failed: %s" % (name, vmid, answer['failed']))
+                if name in GLOBAL_LOOKUPS:
+                    break
+
+    # the fixture only holds the captured guests
+    with open(recording, 'r') as f:
+        calls = json.load(f)
+    for c in calls:
+        if c['args'][:2] == ['get', '/cluster/resources'] and (c['rc'] == 0):
+            c['stdout'] = json.dumps([
+                r for r in json.loads(c['stdout']) if r.get('vmid', None) in vmids
+            ], separators=(',', ':')) + "\n"
+    with open(recording, 'w') as f:
+        json.dump(calls, f, indent=1)
+        f.write("\n")
+
+
+def main():
+    if (len(sys.argv) == 2) and sys.argv[1].endswith('.json'):
+        lookup_module()
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="print the answers of both backends")
+    parser.add_argument('--fixture', default=FIXTURE_DIR,
+                        help="fixture to check (default: %s)" % FIXTURE_DIR)
+    parser.add_argument('--capture', metavar='DIR',
+                        help="build a fixture in DIR from /etc/pve and pvesh of this node")
+    parser.add_argument('--vmids', type=lambda v: [int(e) for e in v.split(',') if e != ""],
+                        help="comma separated VMIDs of the guests to capture")
+    opts = parser.parse_args()
+    if opts.capture is not None:
+        if not opts.vmids:
+            parser.error("--capture needs --vmids")
+        capture(opts.capture, opts.vmids)
+        return 0
+    return 1 if run_checks(opts.fixture, opts.verbose) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
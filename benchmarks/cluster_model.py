@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Synthetic Proxmox VE cluster answering API requests
+
+The model is plain JSON, so the fake pvesh (a new process per call) can load
+and store it, while the fake API server keeps it in memory.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
+GiB = 1024 ** 3
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super(ApiError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+def log_call(access, method, path, start, rc):
+    """Appends a served call to the file named by PVE_BENCH_LOG
+
+    Lines are short enough to be written atomically by concurrent processes.
+    """
+
+    log = os.environ.get('PVE_BENCH_LOG', None)
+    if log is None:
+        return
+    line = json.dumps(dict(
+        access=access, method=method, path=path, rc=rc,
+        start=start, elapsed=round(time.time() - start, 6),
+    )) + "\n"
+    with open(log, 'a') as f:
+        f.write(line)
+
+
+def generate(n_nodes=3, n_guests=100, n_ha_groups=2, ceph=True, seed=0):
+    """Generates the state of a synthetic cluster
+
+    :param n_nodes: number of nodes
+    :param n_guests: number of guests; 80% QEMU VMs, 20% LXC containers
+    :param n_ha_groups: number of HA groups; every third guest is HA managed
+    :param ceph: whether Ceph is installed
+    :param seed: seed of the random generator
+    :rtype: dict
+    """
+
+    rnd = random.Random(seed)
+    nodes = ["pve%02d" % (i + 1) for i in range(n_nodes)]
+    guests = dict()
+    for i in range(n_guests):
+        vmid = 100 + i
+        guests[str(vmid)] = dict(
+            vmid=vmid,
+            type='lxc' if i % 5 == 4 else 'qemu',
+            node=nodes[i % n_nodes],
+            name="guest%d" % vmid,
+            status='stopped' if i % 10 == 9 else 'running',
+            maxmem=rnd.choice([1, 2, 4, 8, 16, 32, 64]) * GiB,
+            maxcpu=rnd.choice([1, 2, 4, 8]),
+            cpu=round(rnd.random() * 0.5, 4),
+            maxdisk=rnd.choice([8, 32, 64, 128]) * GiB,
+            tags="bench;group%d" % (i % 4),
+            pool="pool%d" % (i % 3),
+        )
+        guests[str(vmid)]['mem'] = int(guests[str(vmid)]['maxmem'] * rnd.uniform(0.2, 0.9))
+
+    groups = list()
+    for g in range(n_ha_groups):
+        members = [nodes[(g + k) % n_nodes] for k in range(min(3, n_nodes))]
+        groups.append(dict(group="ha%d" % g, nodes=','.join(members), type='group'))
+    ha_resources = list()
+    for (i, vmid) in enumerate(sorted(guests, key=int)):
+        if (i % 3 == 0) and (len(groups) > 0):
+            guest = guests[vmid]
+            ha_resources.append(dict(
+                sid="%s:%s" % ('ct' if guest['type'] == 'lxc' else 'vm', vmid),
+                group=groups[i % len(groups)]['group'],
+                state='started', type='ct' if guest['type'] == 'lxc' else 'vm',
+            ))
+
+    return dict(
+        cluster="bench",
+        local_node=nodes[0],
+        nodes={n: dict(
+            maxmem=512 * GiB, maxcpu=64, online=1, maintenance=False,
+            osds=[k * n_nodes + j for (j, x) in enumerate(nodes) if x == n for k in range(4)],
+        ) for n in nodes},
+        guests=guests,
+        configs=dict(),
+        ha_groups=groups,
+        ha_resources=ha_resources,
+        ceph=ceph,
+        ceph_flags=dict(),
+        tasks=list(),
+        seq=0,
+    )
+
+
+def parse_size(size):
+    """Returns bytes of a size as accepted by the storage API, e.g. 32G or 512M"""
+
+    size = str(size)
+    units = dict(K=1024, M=1024 * 1024, G=GiB, T=1024 * GiB)
+    if size[-1:] in units:
+        return int(size[:-1]) * units[size[-1]]
+    return int(size) * 1024
+
+
+class ClusterModel:
+    """Answers API requests from a cluster state as returned by generate()"""
+
+    def __init__(self, state):
+        self.state = state
+        self.changed = False
+
+    # --- helpers -------------------------------------------------------
+
+    def _upid(self, node, task_type, task_id, status='OK'):
+        self.state['seq'] += 1
+        now = int(time.time())
+        upid = "UPID:%s:%08X:%08X:%08X:%s:%s:root@pam:" % (
+            node, 1000 + self.state['seq'], self.state['seq'], now, task_type, task_id,
+        )
+        self.state['tasks'].append(dict(
+            upid=upid, node=node, type=task_type, id=task_id, user='root@pam',
+            starttime=now, endtime=now, status=status,
+        ))
+        self.changed = True
+        return upid
+
+    def _guest(self, vmid, node=None, vm_type=None):
+        guest = self.state['guests'].get(str(vmid), None)
+        if (guest is None) or ((node is not None) and (guest['node'] != node)) or \
+                ((vm_type is not None) and (guest['type'] != vm_type)):
+            raise ApiError(500, "Configuration file for %s %s does not exist\n" % (vm_type, vmid))
+        return guest
+
+    def _node_usage(self, node):
+        guests = [g for g in self.state['guests'].values()
+                  if (g['node'] == node) and (g['status'] == 'running')]
+        return (
+            sum([g['mem'] for g in guests]) + 8 * GiB,
+            min(sum([g['cpu'] * g['maxcpu'] for g in guests]) / 64.0, 1.0),
+        )
+
+    def config(self, guest):
+        vmid = guest['vmid']
+        ret = self.state['configs'].get(str(vmid), None)
+        if ret is not None:
+            return dict(ret)
+        mac = "BC:24:11:%02X:%02X:%02X" % ((vmid >> 16) & 255, (vmid >> 8) & 255, vmid & 255)
+        if guest['type'] == 'qemu':
+            ret = dict(
+                name=guest['name'], memory=str(guest['maxmem'] // 1024 ** 2),
+                cores=guest['maxcpu'], sockets=1, ostype='l26', agent='1',
+                scsihw='virtio-scsi-pci', boot='order=scsi0;ide2;net0',
+                net0="virtio=%s,bridge=vmbr0,firewall=1" % mac,
+                scsi0="ceph:vm-%d-disk-0,discard=on,size=%dG" % (vmid, guest['maxdisk'] // GiB),
+                ide2='none,media=cdrom', tags=guest['tags'],
+                description="benchmark guest %d" % vmid,
+            )
+        else:
+            ret = dict(
+                hostname=guest['name'], memory=guest['maxmem'] // 1024 ** 2,
+                cores=guest['maxcpu'], ostype='debian', arch='amd64',
+                rootfs="ceph:vm-%d-disk-0,size=%dG" % (vmid, guest['maxdisk'] // GiB),
+                net0="name=eth0,bridge=vmbr0,hwaddr=%s,ip=dhcp,type=veth" % mac,
+                tags=guest['tags'],
+            )
+        return ret
+
+    def _digest(self, config):
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf8')).hexdigest()
+
+    def _set_config(self, guest, params):
+        config = self.config(guest)
+        digest = params.pop('digest', None)
+        if (digest is not None) and (digest != self._digest(config)):
+            raise ApiError(500, "config file has already been modified\n")
+        for k in [k for k in re.split(r'[,;\s]+', params.pop('delete', '')) if k != ""]:
+            config.pop(k, None)
+        disks = False
+        for (k, v) in params.items():
+            m = re.match(r'^([a-z]+:)?(\d+)(,.*)?$', str(v))
+            if re.match(r'^(scsi|sata|ide|virtio)\d+$', k):
+                disks = True
+            if re.match(r'^(scsi|sata|ide|virtio)\d+$', k) and m and m.group(1):
+                # allocate new volume
+                v = "%svm-%d-disk-%d,size=%sG%s" % (
+                    m.group(1), guest['vmid'], len(config), m.group(2), m.group(3) or ""
+                )
+            config[k] = v
+        # changing disks runs as a task, which fails as configured
+        status = self.state.get('disk_task_status', 'OK')
+        if disks and (status != 'OK'):
+            return self._upid(guest['node'], 'qmconfig', guest['vmid'], status=status)
+        guest['tags'] = config.get('tags', "")
+        self.state['configs'][str(guest['vmid'])] = config
+        self.changed = True
+        if disks:
+            return self._upid(guest['node'], 'qmconfig', guest['vmid'])
+        return None
+
+    def _storage_content(self, method, storage, p, params):
+        volumes = self.state.setdefault('volumes', dict())
+        if method == 'create':
+            volid = "%s:%s" % (storage, params['filename'])
+            if volid in volumes:
+                raise ApiError(500, "volume '%s' already exists\n" % volid)
+            volumes[volid] = dict(volid=volid, vmid=int(params['vmid']), format='raw',
+                                  size=parse_size(params['size']))
+            self.changed = True
+            return volid
+        if method == 'delete':
+            volid = p[0] if len(p) > 0 else ""
+            if volumes.pop(volid, None) is None:
+                raise ApiError(500, "no such volume '%s'\n" % volid)
+            self.changed = True
+            return None
+        ret = [v for v in volumes.values() if v['volid'].startswith(storage + ':')]
+        configs = dict(self.state['configs'])
+        if 'vmid' in (params or dict()):
+            configs[str(params['vmid'])] = self.config(self._guest(params['vmid']))
+        for (vmid, config) in configs.items():
+            for v in config.values():
+                m = re.match(r'^(%s:vm-\d+-disk-\d+)' % re.escape(storage), str(v))
+                if m and m.group(1) not in volumes:
+                    ret.append(dict(volid=m.group(1), vmid=int(vmid), format='raw'))
+        if 'vmid' in (params or dict()):
+            ret = [v for v in ret if v['vmid'] == int(params['vmid'])]
+        return ret
+
+    def _migrate(self, guest, target):
+        if target not in self.state['nodes']:
+            raise ApiError(500, "no such cluster node '%s'\n" % target)
+        source = guest['node']
+        guest['node'] = target
+        self.changed = True
+        return self._upid(source, "%smigrate" % guest['type'], guest['vmid'])
+
+    # --- request handling ----------------------------------------------
+
+    def handle(self, method, path, params=None):
+        """Answers a single request
+
+        :param method: 'get', 'create', 'set' or 'delete'
+        :param path: API path
+        :param params: parameters as strings
+        :returns: data as returned by the API
+        :raises ApiError: if the request fails
+        """
+
+        params = dict(params or dict())
+        p = [e for e in path.split('/') if e != ""]
+        st = self.state
+        nodes = sorted(st['nodes'])
+
+        if p == ['version']:
+            return dict(version='8.2.4', release='8.2', repoid='faa83925c9641325')
+        if p == ['nodes']:
+            ret = list()
+            for n in nodes:
+                (mem, cpu) = self._node_usage(n)
+                ret.append(dict(node=n, status='online', maxmem=st['nodes'][n]['maxmem'],
+                                mem=mem, maxcpu=64, cpu=cpu, type='node', id="node/%s" % n))
+            return ret
+        if p == ['storage']:
+            return [
+                dict(storage='ceph', type='rbd', shared=1, content='images,rootdir'),
+                dict(storage='local-lvm', type='lvmthin', shared=0, content='images,rootdir'),
+                dict(storage='local', type='dir', shared=0, content='iso,vztmpl,backup'),
+            ]
+
+        if p[:1] == ['cluster']:
+            return self._handle_cluster(method, p[1:], params)
+        if (p[:1] == ['nodes']) and (len(p) >= 2):
+            if p[1] not in st['nodes']:
+                raise ApiError(500, "no such cluster node '%s'\n" % p[1])
+            return self._handle_node(method, p[1], p[2:], params)
+        raise ApiError(501, "no '%s' handler for '%s'\n" % (method, path))
+
+    def _handle_cluster(self, method, p, params):
+        st = self.state
+        nodes = sorted(st['nodes'])
+
+        if p == ['status']:
+            ret = [dict(type='cluster', id='cluster', name=st['cluster'],
+                        nodes=len(nodes), quorate=1, version=len(nodes))]
+            for (i, n) in enumerate(nodes):
+                ret.append(dict(type='node', id="node/%s" % n, name=n, nodeid=i + 1,
+                                online=st['nodes'][n]['online'], ip="10.0.0.%d" % (i + 1),
+                                local=int(n == st['local_node'])))
+            return ret
+        if p == ['resources']:
+            ret = list()
+            res_type = params.get('type', None)
+            if res_type in [None, 'vm']:
+                for g in sorted(st['guests'].values(), key=lambda x: x['vmid']):
+                    ret.append(dict(g, id="%s/%d" % (g['type'], g['vmid']),
+                                    template=0, uptime=3600 if g['status'] == 'running' else 0))
+            if res_type in [None, 'node']:
+                for n in nodes:
+                    (mem, cpu) = self._node_usage(n)
+                    ret.append(dict(id="node/%s" % n, type='node', node=n, status='online',
+                                    maxmem=st['nodes'][n]['maxmem'], mem=mem,
+                                    maxcpu=64, cpu=cpu))
+            if res_type in [None, 'storage']:
+                for n in nodes:
+                    ret.append(dict(id="storage/%s/ceph" % n, type='storage', node=n,
+                                    storage='ceph', shared=1, status='available'))
+            return ret
+        if p == ['nextid']:
+            if 'vmid' in params:
+                if params['vmid'] in st['guests']:
+                    raise ApiError(400, "VM %s already exists\n" % params['vmid'])
+                return params['vmid']
+            return str(max([100] + [int(v) + 1 for v in st['guests']]))
+        if p == ['tasks']:
+            return list(reversed(st['tasks'][-50:]))
+        if p == ['ha', 'groups']:
+            return st['ha_groups']
+        if p == ['ha', 'resources']:
+            if method == 'create':
+                st['ha_resources'].append(dict(sid=params['sid'], group=params.get('group'),
+                                               state=params.get('state', 'started')))
+                self.changed = True
+                return None
+            return st['ha_resources']
+        if (p[:2] == ['ha', 'resources']) and (len(p) == 3):
+            found = [r for r in st['ha_resources'] if r['sid'] == p[2]]
+            if len(found) == 0:
+                raise ApiError(500, "no such resource '%s'\n" % p[2])
+            if method == 'set':
+                found[0].update(dict([(k, v) for (k, v) in params.items() if k in ['state', 'group']]))
+                self.changed = True
+                return None
+            return found[0]
+        if p == ['ha', 'status', 'current']:
+            ret = [dict(id='quorum', type='quorum', status='OK', quorate=1, node=nodes[0]),
+                   dict(id='master', type='master', node=nodes[0],
+                        status="%s (active, Mon Jan  1 00:00:00 2024)" % nodes[0])]
+            for n in nodes:
+                status = "%s (active, Mon Jan  1 00:00:00 2024)" % n
+                if st['nodes'][n]['maintenance']:
+                    status = 'maintenance mode'
+                ret.append(dict(id="lrm:%s" % n, type='lrm', node=n, status=status))
+            for r in st['ha_resources']:
+                guest = st['guests'].get(r['sid'].split(':', 1)[1], None)
+                if guest is not None:
+                    ret.append(dict(id="service:%s" % r['sid'], type='service', sid=r['sid'],
+                                    node=guest['node'], state=r['state'],
+                                    status="%s (%s, %s)" % (r['sid'], guest['node'], r['state'])))
+            return ret
+        if (p[:1] == ['ceph']) and not st['ceph']:
+            raise ApiError(500, "binary not installed: /usr/bin/ceph-mon\n")
+        if p == ['ceph', 'status']:
+            checks = dict([(c, dict(severity='HEALTH_WARN', summary=dict(message=c)))
+                           for c in st.get('ceph_warnings', [])])
+            pgmap = dict(num_pgs=1024, num_objects=100000, bytes_used=10 * GiB)
+            recovery = st.get('ceph_recovery', None)
+            if recovery is not None:
+                # objects recovered at a constant rate since recovery started
+                left = int(max(recovery['objects'] - recovery['rate'] * (time.time() - recovery['start']), 0))
+                if left > 0:
+                    pgmap.update(degraded_objects=left, degraded_total=100000,
+                                 recovering_objects_per_sec=recovery['rate'])
+                    checks['PG_DEGRADED'] = dict(severity='HEALTH_WARN',
+                                                 summary=dict(message="%d objects degraded" % left))
+            status = 'HEALTH_WARN' if len(checks) > 0 else 'HEALTH_OK'
+            return dict(
+                health=dict(status=status, checks=checks),
+                pgmap=pgmap,
+                osdmap=dict(num_osds=4 * len(nodes), num_up_osds=4 * len(nodes)),
+            )
+        if p == ['ceph', 'flags']:
+            if method == 'set':
+                # runs as a task, which fails as configured
+                status = st.get('flags_task_status', 'OK')
+                if status == 'OK':
+                    for (k, v) in params.items():
+                        st['ceph_flags'][k] = v in ['1', 'true']
+                return self._upid(st['local_node'], 'setflags', '', status=status)
+            return [dict(name=f, value=st['ceph_flags'].get(f, False), description=f)
+                    for f in ['nobackfill', 'nodeep-scrub', 'nodown', 'noin', 'noout',
+                              'norebalance', 'norecover', 'noscrub', 'notieragent',
+                              'noup', 'pause']]
+        raise ApiError(501, "no '%s' handler for '/cluster/%s'\n" % (method, '/'.join(p)))
+
+    def _handle_node(self, method, node, p, params):
+        st = self.state
+
+        if p == ['status']:
+            (mem, cpu) = self._node_usage(node)
+            return dict(uptime=3600, cpu=cpu, memory=dict(total=st['nodes'][node]['maxmem'], used=mem))
+        if (len(p) == 3) and (p[:1] == ['services']) and (p[2] == 'state'):
+            return dict(name=p[1], service=p[1], state='running')
+        if p == ['ceph', 'osd']:
+            hosts = list()
+            for n in sorted(st['nodes']):
+                hosts.append(dict(type='host', name=n, children=[
+                    dict(id=o, name="osd.%d" % o, type='osd', status='up', **{'in': 1})
+                    for o in st['nodes'][n]['osds']
+                ]))
+            return dict(root=dict(name='default', type='root', children=hosts))
+        if p == ['version']:
+            return self.handle('get', '/version')
+        if p == ['storage']:
+            return self.handle('get', '/storage')
+        if (len(p) >= 3) and (p[0] == 'storage') and (p[2] == 'content'):
+            return self._storage_content(method, p[1], p[3:], params)
+        if p == ['migrateall']:
+            upid = self._upid(node, 'migrateall', '')
+            for vmid in [v for v in re.split(r'[,;\s]+', params.get('vms', '')) if v != ""]:
+                guest = self._guest(vmid)
+                if guest['node'] == node:
+                    self._migrate(guest, params['target'])
+            return upid
+        if (len(p) >= 2) and (p[0] == 'tasks'):
+            task = [t for t in st['tasks'] if t['upid'] == p[1]]
+            if len(task) == 0:
+                raise ApiError(500, "no such task\n")
+            if p[2:] == ['status']:
+                return dict(task[0], status='stopped', exitstatus=task[0]['status'])
+            if p[2:] == ['log']:
+                return [dict(n=1, t="task started"), dict(n=2, t="TASK OK")]
+        if (len(p) == 1) and (p[0] in ['qemu', 'lxc']):
+            return [dict(g, cpus=g['maxcpu']) for g in sorted(
+                st['guests'].values(), key=lambda x: x['vmid']
+            ) if (g['node'] == node) and (g['type'] == p[0])]
+        if (len(p) >= 2) and (p[0] in ['qemu', 'lxc']):
+            guest = self._guest(p[1], node=node, vm_type=p[0])
+            if p[2:] == ['config']:
+                if method in ['create', 'set']:
+                    return self._set_config(guest, params)
+                config = self.config(guest)
+                config['digest'] = self._digest(config)
+                return config
+            if p[2:] == ['status', 'current']:
+                return dict(guest, qmpstatus=guest['status'])
+            if p[2:] == ['migrate']:
+                return self._migrate(guest, params['target'])
+            if p[2:] == ['rrddata']:
+                now = int(time.time())
+                rnd = random.Random(guest['vmid'])
+                return [dict(time=now - 60 * i, maxmem=guest['maxmem'],
+                             mem=guest['mem'] * rnd.uniform(0.9, 1.1), cpu=guest['cpu'])
+                        for i in range(70)]
+        raise ApiError(501, "no '%s' handler for '/nodes/%s/%s'\n" % (method, node, '/'.join(p)))
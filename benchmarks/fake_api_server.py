@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Stand-in for pveproxy answering from a synthetic cluster
+
+usage: fake_api_server.py STATE_FILE PORT [LATENCY]
+
+The state is loaded once and kept in memory. A self-signed certificate is
+created with openssl on startup. Calls are logged to PVE_BENCH_LOG.
+"""
+
+import http.server
+import json
+import os
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cluster_model import ApiError, ClusterModel, log_call  # noqa: E402
+
+methods = dict(GET='get', POST='create', PUT='set', DELETE='delete')
+
+
+class ApiHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    model = None
+    lock = threading.Lock()
+    latency = 0.0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, reason, obj):
+        body = json.dumps(obj).encode('utf8')
+        self.send_response(status, reason)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        start = time.time()
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get('Content-Length', '0'))
+        if length > 0:
+            params.update(parse_qsl(self.rfile.read(length).decode('utf8'), keep_blank_values=True))
+        path = unquote(url.path)
+        if not path.startswith('/api2/json/'):
+            self._reply(404, "Not Found", dict(data=None))
+            return
+        path = path[len('/api2/json'):]
+        method = methods[self.command]
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        if path == '/access/ticket':
+            self._reply(200, "OK", dict(data=dict(
+                username=params.get('username', 'root@pam'),
+                ticket='PVE:root@pam:00000000::bench', CSRFPreventionToken='00000000:bench',
+            )))
+            return
+
+        with self.lock:
+            try:
+                data = self.model.handle(method, path, params)
+                status = 200
+            except ApiError as e:
+                status = e.status
+                message = e.message.strip()
+        log_call('http', method, path, start, 0 if status == 200 else status)
+        if status == 200:
+            self._reply(200, "OK", dict(data=data))
+        else:
+            self._reply(status, message, dict(data=None))
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_DELETE = _handle
+
+
+class ThreadingHTTPSServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+def self_signed_context(directory):
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.check_call(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+    return ctx
+
+
+def main():
+    (state_file, port) = sys.argv[1:3]
+    with open(state_file, 'r') as f:
+        ApiHandler.model = ClusterModel(json.load(f))
+    if len(sys.argv) > 3:
+        ApiHandler.latency = float(sys.argv[3])
+
+    server = ThreadingHTTPSServer(('127.0.0.1', int(port)), ApiHandler)
+    with tempfile.TemporaryDirectory() as directory:
+        ctx = self_signed_context(directory)
+    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    sys.stdout.write("listening on %d\n" % server.server_address[1])
+    sys.stdout.flush()
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Stand-in for the Perl API helper used by access=coprocess
+
+usage: fake_coprocess.py SOCKET IDLE_TIMEOUT
+
+Started by the modules through the coprocess_command option. Speaks the
+same line based JSON protocol as the helper in pve_coprocess.py and answers
+from the cluster state named by PVE_BENCH_STATE, which is loaded once.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cluster_model import ApiError, ClusterModel, log_call  # noqa: E402
+
+
+class HelperHandler(socketserver.StreamRequestHandler):
+    model = None
+    lock = threading.Lock()
+    latency = 0.0
+    last_activity = time.monotonic()
+
+    def handle(self):
+        for line in self.rfile:
+            start = time.time()
+            HelperHandler.last_activity = time.monotonic()
+            req = json.loads(line.decode('utf8'))
+            if self.latency > 0:
+                time.sleep(self.latency)
+            with self.lock:
+                try:
+                    resp = dict(rc=0, data=self.model.handle(
+                        req['method'], req['path'], req.get('params', dict())
+                    ))
+                except ApiError as e:
+                    resp = dict(rc=255, err=e.message)
+            log_call('coprocess', req['method'], req['path'], start, resp['rc'])
+            self.wfile.write((json.dumps(resp) + "\n").encode('utf8'))
+
+
+class ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    (path, idle) = sys.argv[1:3]
+    with open(os.environ['PVE_BENCH_STATE'], 'r') as f:
+        HelperHandler.model = ClusterModel(json.load(f))
+    HelperHandler.latency = float(os.environ.get('PVE_BENCH_LATENCY', '0'))
+
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return 0
+        except OSError:
+            os.unlink(path)
+        finally:
+            probe.close()
+
+    os.umask(0o077)
+    server = ThreadingUnixServer(path, HelperHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    while time.monotonic() - HelperHandler.last_activity < float(idle):
+        time.sleep(0.5)
+    server.shutdown()
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Stand-in for pvesh answering from a synthetic cluster
+
+Environment:
+    PVE_BENCH_STATE    JSON file holding the cluster state (required)
+    PVE_BENCH_LATENCY  seconds added to every call (default: 0)
+    PVE_BENCH_LOG      file every call is appended to as a JSON line
+"""
+
+import fcntl
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cluster_model import ApiError, ClusterModel, log_call  # noqa: E402
+
+
+def parse_args(argv):
+    """Parses 'pvesh <method> <path> [--key [value]]...'"""
+
+    if len(argv) < 2:
+        raise ApiError(255, "usage: pvesh <method> <path> [OPTIONS]\n")
+    (method, path) = argv[:2]
+    params = dict()
+    rest = argv[2:]
+    i = 0
+    while i < len(rest):
+        key = rest[i][2:]
+        if (i + 1 < len(rest)) and not rest[i + 1].startswith('--'):
+            params[key] = rest[i + 1]
+            i += 2
+        else:
+            params[key] = '1'
+            i += 1
+    params.pop('output-format', None)
+    return method, path, params
+
+
+def main():
+    start = time.time()
+    latency = float(os.environ.get('PVE_BENCH_LATENCY', '0'))
+    state_file = os.environ['PVE_BENCH_STATE']
+
+    rc = 0
+    try:
+        (method, path, params) = parse_args(sys.argv[1:])
+    except ApiError as e:
+        sys.stderr.write(e.message)
+        return 255
+
+    if latency > 0:
+        time.sleep(latency)
+
+    with open(state_file, 'r+') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if method == 'get' else fcntl.LOCK_EX)
+        model = ClusterModel(json.load(f))
+        try:
+            data = model.handle(method, path, params)
+        except ApiError as e:
+            sys.stderr.write(e.message)
+            rc = 255
+        if model.changed:
+            f.seek(0)
+            f.truncate()
+            json.dump(model.state, f)
+
+    log_call('pvesh', method, path, start, rc)
+    if (rc == 0) and (data is not None):
+        sys.stdout.write(json.dumps(data) + "\n")
+    return rc
+
+
+if __name__ == '__main__':
+    sys.exit(main())
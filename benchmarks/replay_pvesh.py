@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Stand-in for pvesh answering with recorded output of the real one
+
+Calls are matched by method, path and parameters; calls which were not
+recorded fail like a failed API call. With PVE_PVESH_RECORD set, the real
+pvesh is called instead and its output appended to the recording.
+
+Environment:
+    PVE_PVESH_REPLAY   JSON file holding the recorded calls (required)
+    PVE_PVESH_RECORD   path of the real pvesh to record calls of
+    PVE_BENCH_LOG      file every call is appended to as a JSON line
+"""
+
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cluster_model import log_call  # noqa: E402
+
+
+def call_key(argv):
+    """Returns arguments of a call without the output format"""
+
+    ret = list()
+    i = 0
+    while i < len(argv):
+        if argv[i] == '--output-format':
+            i += 2
+            continue
+        ret.append(argv[i])
+        i += 1
+    return ret
+
+
+def record(pvesh, recording, argv):
+    proc = subprocess.run(
+        [pvesh] + argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    with open(recording, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        content = f.read()
+        calls = json.loads(content) if content.strip() != "" else list()
+        key = call_key(argv)
+        calls = [c for c in calls if c['args'] != key]
+        calls.append(dict(args=key, rc=proc.returncode, stdout=proc.stdout, stderr=proc.stderr))
+        f.seek(0)
+        f.truncate()
+        json.dump(sorted(calls, key=lambda c: c['args']), f, indent=1)
+        f.write("\n")
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+def replay(recording, argv):
+    with open(recording, 'r') as f:
+        calls = json.load(f)
+    key = call_key(argv)
+    for c in calls:
+        if c['args'] == key:
+            return c['rc'], c['stdout'], c['stderr']
+    return 255, "", "call not recorded: pvesh %s\n" % ' '.join(key)
+
+
+def main():
+    start = time.time()
+    argv = sys.argv[1:]
+    recording = os.environ['PVE_PVESH_REPLAY']
+    pvesh = os.environ.get('PVE_PVESH_RECORD', None)
+
+    if pvesh is not None:
+        (rc, out, err) = record(pvesh, recording, argv)
+    else:
+        (rc, out, err) = replay(recording, argv)
+
+    log_call('pvesh', argv[0] if len(argv) > 0 else "", argv[1] if len(argv) > 1 else "", start, rc)
+    sys.stdout.write(out)
+    sys.stderr.write(err)
+    return rc
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Runs modules of this collection against a synthetic cluster
+
+Every scenario is executed as a separate module run, the same way Ansible
+would run it on a node. API calls are counted on the side of the fake
+pvesh/pveproxy/helper, so the numbers do not depend on the module reporting
+them itself.
+
+Examples:
+    ./run_benchmarks.py
+    ./run_benchmarks.py --nodes 3 --guests 100 --access pvesh,http -v
+    ./run_benchmarks.py --json current.json --baseline previous.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from cluster_model import generate  # noqa: E402
+from plugins.module_utils.pve_stats import url_template  # noqa: E402
+
+
+def _last_guest(state):
+    return dict(vmid=max([int(v) for v in state['guests']]))
+
+
+# name -> (module, function returning module arguments for a cluster state)
+SCENARIOS = dict(
+    vm_locate=('vm_get_node', _last_guest),
+    vm_get_config=('vm_get_config', _last_guest),
+    # synthetic clusters are overcommitted, only the API calls are of interest
+    vm_migrate_plan=('vm_migrate', lambda state: dict(
+        src_node_name=state['local_node'], allow_overcommit=True, _ansible_check_mode=True,
+    )),
+    node_facts=('node_facts', lambda state: dict()),
+    cluster_await_running_tasks=('cluster_await_running_tasks', lambda state: dict(delay=0)),
+)
+
+
+def _csv(value, conv=str):
+    return [conv(v) for v in value.split(',') if v != ""]
+
+
+class Bench:
+    def __init__(self, workdir, latency, verbose=False):
+        self.workdir = workdir
+        self.latency = latency
+        self.verbose = verbose
+        self.log = os.path.join(workdir, 'calls.log')
+        self.state_file = os.path.join(workdir, 'state.json')
+        self.server = None
+        self.port = None
+
+        # Collection as Ansible would find it
+        collections = os.path.join(workdir, 'collections')
+        os.makedirs(os.path.join(collections, 'ansible_collections', 'inett'))
+        os.symlink(REPO_DIR, os.path.join(collections, 'ansible_collections', 'inett', 'pve'))
+
+        # pvesh on PATH
+        bindir = os.path.join(workdir, 'bin')
+        os.makedirs(bindir)
+        with open(os.path.join(bindir, 'pvesh'), 'w') as f:
+            f.write("#!/bin/sh\nexec '%s' '%s' \"$@\"\n" % (
+                sys.executable, os.path.join(BENCH_DIR, 'fake_pvesh.py')
+            ))
+        os.chmod(os.path.join(bindir, 'pvesh'), 0o755)
+
+        self.env = dict(os.environ)
+        self.env.update(
+            PATH=bindir + os.pathsep + os.environ.get('PATH', ''),
+            PYTHONPATH=collections,
+            PVE_BENCH_STATE=self.state_file,
+            PVE_BENCH_LOG=self.log,
+            PVE_BENCH_LATENCY=str(latency),
+        )
+        self.env.pop('PVE_API_PROFILE', None)
+
+    def setup_cluster(self, n_nodes, n_guests):
+        self.stop_server()
+        state = generate(n_nodes=n_nodes, n_guests=n_guests)
+        with open(self.state_file, 'w') as f:
+            json.dump(state, f)
+        self.cluster = "%dn-%dg" % (n_nodes, n_guests)
+        return state
+
+    def start_server(self):
+        if self.server is not None:
+            return
+        self.server = subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, 'fake_api_server.py'),
+             self.state_file, '0', str(self.latency)],
+            env=self.env, stdout=subprocess.PIPE, universal_newlines=True,
+        )
+        self.port = int(self.server.stdout.readline().split()[-1])
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.terminate()
+            self.server.wait()
+            self.server = None
+
+    def access_args(self, access):
+        if access == 'http':
+            self.start_server()
+            return dict(access='http', api_host='127.0.0.1', api_port=self.port,
+                        api_password='not-a-real-password', validate_certs=False)
+        if access == 'coprocess':
+            return dict(
+                access='coprocess',
+                coprocess_socket=os.path.join(self.workdir, 'run', "%s.sock" % self.cluster),
+                coprocess_command=[sys.executable, os.path.join(BENCH_DIR, 'fake_coprocess.py')],
+                coprocess_idle_timeout=10,
+            )
+        return dict()
+
+    def run(self, module, args):
+        """Runs a module once
+
+        :returns: (wall time, result, list of calls)
+        """
+
+        args_file = os.path.join(self.workdir, 'args.json')
+        with open(args_file, 'w') as f:
+            json.dump(dict(ANSIBLE_MODULE_ARGS=args), f)
+        open(self.log, 'w').close()
+
+        start = time.monotonic()
+        proc = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, 'plugins', 'modules', "%s.py" % module), args_file],
+            env=self.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        wall = time.monotonic() - start
+        try:
+            result = json.loads(proc.stdout)
+        except ValueError:
+            result = dict(failed=True, msg=(proc.stdout + proc.stderr).strip()[-500:])
+        with open(self.log, 'r') as f:
+            calls = [json.loads(line) for line in f if line.strip() != ""]
+        return wall, result, calls
+
+
+def run_matrix(opts):
+    results = list()
+    with tempfile.TemporaryDirectory(prefix='pve-bench-') as workdir:
+        bench = Bench(workdir, opts.latency, verbose=opts.verbose)
+        try:
+            for n_nodes in opts.nodes:
+                for n_guests in opts.guests:
+                    state = bench.setup_cluster(n_nodes, n_guests)
+                    for access in opts.access:
+                        for name in opts.scenarios:
+                            (module, make_args) = SCENARIOS[name]
+                            args = dict(make_args(state), **bench.access_args(access))
+                            walls = list()
+                            for _i in range(opts.repeat):
+                                (wall, result, calls) = bench.run(module, args)
+                                walls.append(wall)
+                            r = dict(
+                                scenario=name, access=access, nodes=n_nodes, guests=n_guests,
+                                calls=len(calls), wall=round(statistics.median(walls), 4),
+                                api_time=round(sum([c['elapsed'] for c in calls]), 4),
+                                cached=result.get('pve_api_cache', dict()).get('hits', 0),
+                                failed=bool(result.get('failed', False)),
+                                endpoints=dict(),
+                            )
+                            for c in calls:
+                                key = "%s %s" % (c['method'], url_template(c['path']))
+                                r['endpoints'][key] = r['endpoints'].get(key, 0) + 1
+                            if r['failed']:
+                                r['msg'] = result.get('msg', '')
+                            results.append(r)
+                            print_result(r, opts.verbose)
+        finally:
+            bench.stop_server()
+    return results
+
+
+def print_header():
+    print("%-28s %-9s %5s %6s %6s %6s %9s %9s" % (
+        'scenario', 'access', 'nodes', 'guests', 'calls', 'cached', 'api[s]', 'wall[s]'
+    ))
+
+
+def print_result(r, verbose=False):
+    print("%-28s %-9s %5d %6d %6d %6d %9.3f %9.3f%s" % (
+        r['scenario'], r['access'], r['nodes'], r['guests'], r['calls'], r['cached'],
+        r['api_time'], r['wall'], "  FAILED: %s" % r['msg'][:80] if r['failed'] else "",
+    ))
+    if verbose:
+        for (k, v) in sorted(r['endpoints'].items()):
+            print("    %5d  %s" % (v, k))
+    sys.stdout.flush()
+
+
+def compare(results, baseline_file):
+    """Reports scenarios needing more API calls than in the baseline
+
+    :returns: number of regressions
+    """
+
+    with open(baseline_file, 'r') as f:
+        baseline = dict()
+        for r in json.load(f):
+            baseline[(r['scenario'], r['access'], r['nodes'], r['guests'])] = r
+
+    regressions = 0
+    for r in results:
+        b = baseline.get((r['scenario'], r['access'], r['nodes'], r['guests']), None)
+        if (b is None) or (r['calls'] <= b['calls']):
+            continue
+        regressions += 1
+        print("REGRESSION %s/%s at %d nodes, %d guests: %d -> %d calls" % (
+            r['scenario'], r['access'], r['nodes'], r['guests'], b['calls'], r['calls']
+        ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--nodes', type=lambda v: _csv(v, int), default=[3, 16, 64],
+                        help="comma separated cluster sizes (default: 3,16,64)")
+    parser.add_argument('--guests', type=lambda v: _csv(v, int), default=[100, 1000, 10000],
+                        help="comma separated guest counts (default: 100,1000,10000)")
+    parser.add_argument('--access', type=_csv, default=['pvesh'],
+                        help="comma separated access methods: pvesh, http, coprocess")
+    parser.add_argument('--scenarios', type=_csv, default=list(SCENARIOS.keys()),
+                        help="comma separated scenarios (default: all of %s)" % ', '.join(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds added to every API call (default: 0)")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="runs per scenario, the median wall time is reported")
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--baseline', help="compare call counts with results of an earlier run")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="print calls per endpoint")
+    opts = parser.parse_args()
+
+    for name in opts.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario %s" % name)
+    for access in opts.access:
+        if access not in ['pvesh', 'http', 'coprocess']:
+            parser.error("unknown access method %s" % access)
+
+    print_header()
+    results = run_matrix(opts)
+    if opts.json is not None:
+        with open(opts.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    rc = 0
+    if any([r['failed'] for r in results]):
+        rc = 1
+    if (opts.baseline is not None) and (compare(results, opts.baseline) > 0):
+        rc = 2
+    return rc
+
+
+if __name__ == '__main__':
+    sys.exit(main())
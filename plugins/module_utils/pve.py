@@ -4,10 +4,24 @@
 # GNU General Public License v3.0+
 # (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
 
+import concurrent.futures
 import json
-import sys
+import os
+import threading
+import time
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_coprocess import PveCoprocessClient
+from ansible_collections.inett.pve.plugins.module_utils.pve_diff import changes_to_diff, config_diff, split_keys
+from ansible_collections.inett.pve.plugins.module_utils.pve_ha import HA_QUERIES, PveHaState
+from ansible_collections.inett.pve.plugins.module_utils.pve_http import PveHttpClient
+from ansible_collections.inett.pve.plugins.module_utils.pve_pmxcfs import PmxcfsReader
+from ansible_collections.inett.pve.plugins.module_utils.pve_property import (
+    DISK_KEYS, NET_KEYS, NIC_MODELS, format_value, parse_config, parse_value,
+)
+from ansible_collections.inett.pve.plugins.module_utils.pve_resources import PveResourceIndex
+from ansible_collections.inett.pve.plugins.module_utils.pve_stats import ApiCallStats
+from ansible_collections.inett.pve.plugins.module_utils.pve_tasks import parse_upid, wait_for_task
 
 
 class PveApiModule(AnsibleModule):
@@ -15,15 +29,48 @@ class PveApiModule(AnsibleModule):
     def __init__(self, argument_spec=dict(), **kwargs):
         arc_spec = dict(
             access=dict(
-                choices=['pvesh', 'http'],
+                choices=['pvesh', 'http', 'coprocess'],
                 required=False,
                 default='pvesh'),
+            api_host=dict(type='str', required=False, default='localhost'),
+            api_port=dict(type='int', required=False, default=8006),
+            api_user=dict(type='str', required=False, default='root@pam'),
+            api_password=dict(type='str', required=False, default=None, no_log=True),
+            api_token_id=dict(type='str', required=False, default=None),
+            api_token_secret=dict(type='str', required=False, default=None, no_log=True),
+            api_auth=dict(type='dict', required=False, default=None, no_log=True),
+            validate_certs=dict(type='bool', required=False, default=True),
+            coprocess_socket=dict(type='path', required=False, default='/run/inett-pve/api.sock'),
+            coprocess_idle_timeout=dict(type='int', required=False, default=300),
+            coprocess_command=dict(type='list', elements='str', required=False, default=None),
+            cache_ttl=dict(type='float', required=False, default=30),
+            max_parallel_queries=dict(type='int', required=False, default=4),
+            pmxcfs=dict(type='bool', required=False, default=False),
+            pmxcfs_path=dict(type='str', required=False, default='/etc/pve'),
+            profile=dict(type='bool', required=False, default=False),
         )
         arc_spec.update(argument_spec)
         kwargs['supports_check_mode'] = True
+        # AnsibleModule calls fail_json while validating the arguments,
+        # which reports the cache statistics
+        self._http = None
+        self._coprocess = None
+        self._pmxcfs = None
+        # clients are created on first use, possibly by parallel_map workers
+        self._client_lock = threading.Lock()
+        self._resources = None
+        self._ha = None
+        self._ha_stale = False
+        self._cache = dict()
+        self._cache_lock = threading.Lock()
+        self._cache_stats = dict(hits=0, misses=0, invalidations=0)
+        self._api_stats = None
         super(PveApiModule, self).__init__(
             argument_spec=arc_spec, **kwargs
         )
+        if self.params['profile'] or \
+                os.environ.get('PVE_API_PROFILE', '').lower() in ['1', 'true', 'yes', 'on']:
+            self._api_stats = ApiCallStats()
 
     @staticmethod
     def _get_cmd(method, url, https_proxy=None, params=dict()):
@@ -55,35 +102,88 @@ class PveApiModule(AnsibleModule):
             if v is None:
                 ret += ["--%s" % k]
             if type(v) is list:
-                ret += ["--%s" % k, ','.join(v)]
+                ret += ["--%s" % k, ','.join([str(e) for e in v])]
             if type(v) is dict:
-                ret += ["--%s" % k, PveApiModule.params_dict_to_string(v)]
+                ret += ["--%s" % k, format_value(k, v)]
         ret += ["--output-format", "json"]
         return ret
 
     @staticmethod
-    def params_dict_to_string(in_dict):
-        """Converts dictionary to string
+    def _get_http_params(params=dict()):
+        """Converts parameters to their string representation for HTTP requests
 
-        :param in_dict: dict
-        :rtype: str
+        :param params: arguments (key: name of argument; value: bool, dict, int, list, str)
+        :type params: dict
+        :rtype: dict
         """
 
-        ret_a = list()
-
-        for (k, v) in in_dict.items():
+        ret = dict()
+        for (k, v) in params.items():
             if isinstance(v, str):
-                ret_a += ["%s=%s" % (k, v)]
+                ret[k] = v
             if type(v) is int:
-                ret_a += ["%s=%d" % (k, v)]
+                ret[k] = str(v)
             if type(v) is bool:
-                ret_a += ["%s=%d" % (k, int(v))]
+                ret[k] = str(int(v))
             if type(v) is list:
-                ret_a += ["%s=%s" % (k, ';'.join(v))]
-            if v is None:
-                ret_a += [k]
+                ret[k] = ','.join([str(e) for e in v])
+            if type(v) is dict:
+                ret[k] = format_value(k, v)
+        return ret
+
+    def _get_http_client(self):
+        """Returns the HTTP client configured by the module parameters
+
+        :rtype: PveHttpClient
+        """
+
+        with self._client_lock:
+            if self._http is None:
+                auth = self.params.get('api_auth', None) or dict()
+                self._http = PveHttpClient(
+                    self.params['api_host'],
+                    port=self.params['api_port'],
+                    validate_certs=self.params['validate_certs'],
+                    user=auth.get('username', self.params['api_user']),
+                    password=self.params['api_password'],
+                    token_id=self.params['api_token_id'],
+                    token_secret=self.params['api_token_secret'],
+                    ticket=auth.get('ticket', None),
+                    csrf_token=auth.get('CSRFPreventionToken', None),
+                )
+            return self._http
+
+    def _get_coprocess_client(self):
+        """Returns the client of the API helper process
+
+        :rtype: PveCoprocessClient
+        """
+
+        with self._client_lock:
+            if self._coprocess is None:
+                self._coprocess = PveCoprocessClient(
+                    self.params['coprocess_socket'],
+                    idle_timeout=self.params['coprocess_idle_timeout'],
+                    command=self.params['coprocess_command'],
+                )
+            return self._coprocess
+
+    def _get_pmxcfs_reader(self):
+        """Returns reader for the cluster filesystem if enabled and mounted
+
+        :returns: reader or None if reads have to go through the API
+        :rtype: PmxcfsReader
+        """
 
-        return ','.join(ret_a)
+        if not self.params['pmxcfs']:
+            return None
+        with self._client_lock:
+            if self._pmxcfs is None:
+                reader = PmxcfsReader(self.params['pmxcfs_path'])
+                self._pmxcfs = reader if reader.available() else False
+        if self._pmxcfs is False:
+            return None
+        return self._pmxcfs
 
     @staticmethod
     def valid_nets():
@@ -93,10 +193,7 @@ class PveApiModule(AnsibleModule):
         :returns: valid nic names
         """
 
-        ret = []
-        for x in range(32):
-            ret.append("net%d" % x)
-        return ret
+        return list(NET_KEYS)
 
     @staticmethod
     def valid_nic_models():
@@ -106,11 +203,7 @@ class PveApiModule(AnsibleModule):
         :returns: valid nic models
         """
 
-        return [
-            "e1000", "e1000-82540em", "e1000-82544gc", "e1000-82545em",
-            "e1000e", "i82551", "i82557b", "i82559er", "ne2k_isa", "ne2k_pci",
-            "pcnet", "rtl8139", "virtio", "vmxnet3",
-        ]
+        return list(NIC_MODELS)
 
     @staticmethod
     def valid_storages():
@@ -120,25 +213,105 @@ class PveApiModule(AnsibleModule):
         :returns: valid config keys for storage devices
         """
 
-        ret = []
-        for x in range(4):
-            ret.append("ide%d" % x)
-        for x in range(6):
-            ret.append("sata%d" % x)
-        for x in range(31):
-            ret.append("scsi%d" % x)
-        for x in range(16):
-            ret.append("virtio%d" % x)
-        ret.append("efidisk0")
-        ret.append("tpmstate0")
-        return ret
+        return list(DISK_KEYS)
+
+    # Views aggregating state of the whole cluster, which are affected by
+    # writes to (almost) any path
+    cache_aggregates = [
+        '/cluster/resources', '/cluster/tasks', '/cluster/ha/status',
+        '/cluster/nextid',
+    ]
+
+    def parallel_map(self, func, items):
+        """Call func for every item using up to max_parallel_queries threads
+
+        func must not call fail_json, but return errors to the caller.
+
+        :param func: function to call with each item
+        :type func: callable
+        :param items: items to pass to func
+        :type items: list
+        :returns: return values of func in the order of items
+        :rtype: list
+        """
+
+        items = list(items)
+        workers = min(self.params['max_parallel_queries'], len(items))
+        if workers <= 1:
+            return [func(i) for i in items]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    @staticmethod
+    def _paths_overlap(a, b):
+        """Return true if one path is a prefix of the other one
+
+        :type a: str
+        :type b: str
+        :rtype: bool
+        """
+
+        s_a = [e for e in a.split('/') if e != ""]
+        s_b = [e for e in b.split('/') if e != ""]
+        n = min(len(s_a), len(s_b))
+        return s_a[:n] == s_b[:n]
+
+    def cache_invalidate(self, url=None):
+        """Drop cached responses affected by a write to url
+
+        :param url: path written to; drops the whole cache if None
+        :type url: str
+        """
+
+        with self._cache_lock:
+            if url is None:
+                drop = list(self._cache.keys())
+            else:
+                drop = [
+                    k for k in self._cache
+                    if self._paths_overlap(k[1], url) or any([
+                        self._paths_overlap(k[1], a) for a in self.cache_aggregates
+                    ])
+                ]
+            for k in drop:
+                del self._cache[k]
+            self._cache_stats['invalidations'] += len(drop)
+            if self._resources is not False:
+                # guests might have been created, removed or migrated
+                self._resources = None
+            self._ha_stale = True
+
+    def cache_stats(self):
+        """Return cache hit and miss counters
+
+        :rtype: dict
+        """
+
+        with self._cache_lock:
+            return dict(self._cache_stats, entries=len(self._cache))
+
+    def _result_stats(self, kwargs):
+        kwargs.setdefault('pve_api_cache', self.cache_stats())
+        if getattr(self, '_api_stats', None) is not None:
+            kwargs.setdefault('pve_api_stats', self._api_stats.summary())
+
+    def exit_json(self, **kwargs):
+        self._result_stats(kwargs)
+        super(PveApiModule, self).exit_json(**kwargs)
+
+    def fail_json(self, msg, **kwargs):
+        self._result_stats(kwargs)
+        super(PveApiModule, self).fail_json(msg, **kwargs)
 
     def query_api(
             self, method, url,
-            access=None, https_proxy=None, fail=None, params=dict()
+            access=None, https_proxy=None, fail=None, params=dict(), cache=True
     ):
         """Query API and return raw stdout and stderr only
 
+       Successful 'get' requests are cached for cache_ttl seconds. Any other
+       method drops cached responses of overlapping paths.
+
        :param method: Proxmox VE CLI method ('get', 'create' or 'delete')
        :type method: str
        :param url: Proxmox VE CLI path
@@ -147,27 +320,68 @@ class PveApiModule(AnsibleModule):
        :type fail: str
        :param params: Parameters to pass
        :type params: dict
+       :param cache: Whether a cached response may be returned
+       :type cache: bool
 
        :returns: tuple: (int: rc, str: stdout, str: stderr)
        :rtype: tuple
        """
 
+        key = None
+        if (method == "get") and (self.params['cache_ttl'] > 0):
+            key = (method, url, json.dumps(params, sort_keys=True, default=str))
+            with self._cache_lock:
+                hit = self._cache.get(key, None)
+                if cache and (hit is not None) and \
+                        (time.monotonic() - hit[0] <= self.params['cache_ttl']):
+                    self._cache_stats['hits'] += 1
+                    if self._api_stats is not None:
+                        self._api_stats.record(
+                            method, url, hit[1][0], len(hit[1][1]), 0.0, cached=True
+                        )
+                    return hit[1]
+                self._cache_stats['misses'] += 1
+
         if access is None:
             access = self.params['access'].lower()
-        if (access != "pvesh") and (https_proxy is not None):
+        if (access not in ["pvesh", "coprocess"]) and (https_proxy is not None):
             self.fail_json(msg="https_proxy can only be used with pvesh")
-        if access == "pvesh":
+        start = time.monotonic()
+        ret = None
+        if access == "coprocess":
+            ret = self._get_coprocess_client().request(
+                method, url, params=self._get_http_params(params)
+            )
+            if ret is None:
+                # helper not available or request needs to be proxied
+                access = "pvesh"
+        if ret is not None:
+            rc, out, err = ret
+        elif access == "pvesh":
             c_params = self._get_cmd(method, url, params=params)
             rc, out, err = self.run_command(c_params)
+        elif access == "http":
+            rc, out, err = self._get_http_client().request(
+                method, url, params=self._get_http_params(params)
+            )
         else:
             rc, out, err = 1, "", "Access method %s not supported yet" % access
+        if self._api_stats is not None:
+            self._api_stats.record(
+                method, url, rc, len(out or ""), time.monotonic() - start
+            )
+        if method != "get":
+            self.cache_invalidate(url)
+        elif (key is not None) and (rc == 0):
+            with self._cache_lock:
+                self._cache[key] = (time.monotonic(), (rc, out, err))
         if (rc != 0) and (fail is not None):
             self.fail_json(msg=fail, rc=rc, stdout=out, stderr=err)
         return rc, out, err
 
     def query_json(
             self, method, url,
-            access=None, https_proxy=None, fail=None, params=dict()
+            access=None, https_proxy=None, fail=None, params=dict(), cache=True
     ):
         """Query API and return raw stdout, raw stderr and parsed json stdout
 
@@ -179,6 +393,8 @@ class PveApiModule(AnsibleModule):
         :type fail: str
         :param params: Parameters to pass
         :type params: dict
+        :param cache: Whether a cached response may be returned
+        :type cache: bool
 
         :returns: tuple: (int: rc, str: stdout, str: stderr, Any: object)
         :rtype: tuple
@@ -186,17 +402,110 @@ class PveApiModule(AnsibleModule):
 
         rc, out, err = self.query_api(
             method, url,
-            access=access, https_proxy=https_proxy, fail=None, params=params
+            access=access, https_proxy=https_proxy, fail=None, params=params,
+            cache=cache,
         )
         try:
             obj = json.loads(out)
-            if (rc != 0) and (fail is not None):
-                self.fail_json(msg=fail, rc=rc, stdout=out, stderr=err, obj=obj)
-                return rc, out, err, obj
-        except:
+        except ValueError:
             obj = None
+        if (rc != 0) and (fail is not None):
+            self.fail_json(msg=fail, rc=rc, stdout=out, stderr=err, obj=obj)
         return rc, out, err, obj
 
+    def query_many(self, queries, access=None, fail=None, fail_fast=False, cache=True):
+        """Issue independent queries concurrently
+
+        :param queries: list of (method, url) or (method, url, params) tuples
+        :type queries: list
+        :param fail: Fail message; fail if any query failed
+        :type fail: str
+        :param fail_fast: Don't issue further queries after the first failure
+        :type fail_fast: bool
+        :param cache: Whether cached responses may be returned
+        :type cache: bool
+
+        :returns: list of tuples (int: rc, str: stdout, str: stderr, Any: object)
+            in the order of queries. Queries skipped because of fail_fast
+            return (None, None, None, None)
+        :rtype: list
+        """
+
+        stop = threading.Event()
+
+        def _query(q):
+            if fail_fast and stop.is_set():
+                return None, None, None, None
+            params = q[2] if len(q) > 2 else dict()
+            ret = self.query_json(q[0], q[1], access=access, params=params, cache=cache)
+            if ret[0] != 0:
+                stop.set()
+            return ret
+
+        results = self.parallel_map(_query, queries)
+
+        if fail is not None:
+            failed = [
+                dict(method=q[0], url=q[1], rc=r[0], stderr=r[2])
+                for (q, r) in zip(queries, results)
+                if (r[0] is not None) and (r[0] != 0)
+            ]
+            if len(failed) > 0:
+                self.fail_json(msg=fail, failed_queries=failed)
+        return results
+
+    def task_wait(self, upid, timeout=None, fail=None, log_lines=20):
+        """Wait for a task to stop
+
+        :param upid: ID of task as returned by 'create' calls
+        :type upid: str
+        :param timeout: seconds to wait at most; None waits forever
+        :type timeout: float
+        :param fail: Fail message; fail if the task did not stop with OK or
+            warnings in time
+        :type fail: str
+        :param log_lines: number of lines to return from the end of the task log
+        :type log_lines: int
+        :returns: dict(upid, node, type, id, user, status, exitstatus, ok,
+            timed_out, elapsed, log)
+        :rtype: dict
+        """
+
+        def _query(url, params):
+            rc, _out, _err, obj = self.query_json("get", url, params=params, cache=False)
+            return rc, obj
+
+        task = wait_for_task(_query, upid, timeout=timeout, log_lines=log_lines)
+        if (not task['ok']) and (fail is not None):
+            self.fail_json(msg=fail, task=task)
+        return task
+
+    def query_task(self, method, url, params=dict(), timeout=None, fail=None, log_lines=20):
+        """Query API and wait for the task it started
+
+        :param method: Proxmox VE CLI method ('create', 'set' or 'delete')
+        :type method: str
+        :param url: Proxmox VE CLI path
+        :type url: str
+        :param params: Parameters to pass
+        :type params: dict
+        :param timeout: seconds to wait for the task at most
+        :type timeout: float
+        :param fail: Fail message; fail if the query or the task failed
+        :type fail: str
+        :param log_lines: number of lines to return from the end of the task log
+        :type log_lines: int
+        :returns: tuple: (int: rc, str: stdout, str: stderr, dict: task).
+            task is None if the query did not return a UPID
+        :rtype: tuple
+        """
+
+        rc, out, err, obj = self.query_json(method, url, params=params, fail=fail)
+        task = None
+        if (rc == 0) and (parse_upid(obj) is not None):
+            task = self.task_wait(obj, timeout=timeout, fail=fail, log_lines=log_lines)
+        return rc, out, err, task
+
     def get_local_node(self):
         """Return node this module is run on
 
@@ -204,6 +513,12 @@ class PveApiModule(AnsibleModule):
         :rtype: str
         """
 
+        reader = self._get_pmxcfs_reader()
+        if reader is not None:
+            node = reader.local_node()
+            if node is not None:
+                return node
+
         rc, out, err, obj = self.query_json("get", "/cluster/status")
         if rc != 0:
             self.fail_json(
@@ -226,6 +541,12 @@ class PveApiModule(AnsibleModule):
         :rtype: list
         """
 
+        reader = self._get_pmxcfs_reader()
+        if reader is not None:
+            nodes = reader.nodes()
+            if nodes is not None:
+                return nodes
+
         rc, out, err, obj = self.query_json("get", "/nodes")
         if rc != 0:
             self.fail_json(
@@ -237,6 +558,40 @@ class PveApiModule(AnsibleModule):
             ret.append(node["node"])
         return ret
 
+    def get_ha_state(self, refresh=False, full=False):
+        """Return snapshot of the HA stack of the cluster
+
+        The snapshot is built from a single batch of HA status, groups and
+        resources and kept for the rest of the module run. Any write drops
+        it, so the next call fetches all of it again.
+
+        :param refresh: fetch the HA status again even if it is already known
+        :type refresh: bool
+        :param full: fetch groups and resources again as well
+        :type full: bool
+        :returns: HA snapshot; changes of the last refresh are in last_changes
+        :rtype: PveHaState
+        """
+
+        if (self._ha is None) or self._ha_stale or full:
+            queries = HA_QUERIES
+        elif refresh:
+            # groups and resources only change with writes
+            queries = HA_QUERIES[:1]
+        else:
+            return self._ha
+
+        results = self.query_many(queries, cache=not (refresh or full))
+        parts = [obj if (rc == 0) and isinstance(obj, list) else None for (rc, _out, _err, obj) in results]
+        if len(parts) < len(HA_QUERIES):
+            parts += [self._ha.groups, self._ha.resources]
+        if self._ha is None:
+            self._ha = PveHaState(*parts)
+        else:
+            self._ha.update(*parts)
+        self._ha_stale = False
+        return self._ha
+
     def get_node_lrm_idle(self, node):
         """Return true if node lrm is idle
 
@@ -246,12 +601,10 @@ class PveApiModule(AnsibleModule):
         :rtype: bool
         """
 
-        rc, _out, _err, obj = self.query_json("get", "/cluster/ha/status/current")
-        if rc != 0:
+        ha = self.get_ha_state()
+        if not ha.available('status'):
             self.fail_json("Unable to get cluster HA status")
-        for e in obj:
-            if e["type"] == "lrm" and e["node"] == node:
-                return "idle" in e["status"]
+        return ha.lrm_idle(node)
 
     def get_node_lrm_maintenance(self, node):
         """Return true if node lrm is in maintenance mode
@@ -261,12 +614,66 @@ class PveApiModule(AnsibleModule):
         :returns: true if node lrm is in maintenance mode
         :rtype: bool
         """
-        rc, _out, _err, obj = self.query_json("get", "/cluster/ha/status/current")
-        if rc != 0:
+
+        ha = self.get_ha_state()
+        if not ha.available('status'):
             self.fail_json("Unable to get cluster HA status")
-        for e in obj:
-            if e["type"] == "lrm" and e["node"] == node:
-                return "maintenance mode" in e["status"]
+        return ha.lrm_maintenance(node)
+
+    def get_resource_index(self, refresh=False):
+        """Return index of all guests in the cluster
+
+        The index is built from a single /cluster/resources call and kept
+        for the rest of the module run.
+
+        :param refresh: fetch the index again even if it is already known
+        :type refresh: bool
+        :returns: index of guests or None if /cluster/resources is not available
+        :rtype: PveResourceIndex
+        """
+
+        if (self._resources is None) or refresh:
+            rc, _out, _err, obj = self.query_json(
+                "get", "/cluster/resources", params=dict(type='vm'), cache=not refresh
+            )
+            if (rc == 0) and isinstance(obj, list):
+                self._resources = PveResourceIndex(obj)
+            else:
+                self._resources = False
+        if self._resources is False:
+            return None
+        return self._resources
+
+    def _get_nodes_vms(self, nodes):
+        """Return guests on given nodes by querying the nodes themselves
+
+        The nodes are queried in parallel, but results and failures are
+        handled in the order of nodes.
+
+        :param nodes: Names of nodes
+        :type nodes: list
+        :return: list of guests
+        :rtype: list
+        """
+
+        queries = list()
+        for node in nodes:
+            queries.append((node, "qemu", "failed to query qemu vms for node %s" % node))
+            queries.append((node, "lxc", "failed to query lxc containers for node %s" % node))
+        results = self.query_many(
+            [("get", "/nodes/%s/%s" % (q[0], q[1])) for q in queries]
+        )
+
+        ret = list()
+        for ((node, vm_type, fail), (rc, out, err, obj)) in zip(queries, results):
+            if rc != 0:
+                self.fail_json(msg=fail, rc=rc, stdout=out, stderr=err, obj=obj)
+            if obj is not None:
+                for vm in obj:
+                    vm['node'] = node
+                    vm['type'] = vm_type
+                    ret.append(vm)
+        return ret
 
     def get_vmids(self, node=None):
         """Return list of guest VMIDs on given node.
@@ -279,29 +686,10 @@ class PveApiModule(AnsibleModule):
         :rtype: set
         """
 
-        ret = list()
-        if node is None:
-            for node in self.get_nodes():
-                ret.extend(self.get_vmids(node=node))
-            return ret
-        else:
-            rc, out, err, qemu = self.query_json("get", "/nodes/" + node + "/qemu")
-            if rc != 0:
-                self.fail_json(
-                    msg="failed to query qemu vms for node %s" % node,
-                    rc=rc, stdout=out, stderr=err, obj=qemu,
-                )
-            rc, out, err, lxc = self.query_json("get", "/nodes/" + node + "/lxc")
-            if rc != 0:
-                self.fail_json(
-                    msg="failed to query lxc containers for node %s" % node,
-                    rc=rc, stdout=out, stderr=err, obj=lxc,
-                )
-            for vm in qemu:
-                ret.append(vm["vmid"])
-            for vm in lxc:
-                ret.append(vm["vmid"])
-        return set(ret)
+        index = self.get_resource_index()
+        if index is not None:
+            return index.vmids(node=node)
+        return set([int(vm['vmid']) for vm in self.get_vms(node=node)])
 
     def get_vms(self, node=None):
         """Return list of guest VMIDs on given node.
@@ -314,29 +702,14 @@ class PveApiModule(AnsibleModule):
         :rtype: list
         """
 
-        if node is None:
-            for node in self.get_nodes():
-                for vm in self.get_vms(node=node):
-                    yield vm
+        index = self.get_resource_index()
+        if index is not None:
+            for vm in index.vms(node=node):
+                yield vm
         else:
-            _rc, _out, _err, qemu = self.query_json(
-                "get", "/nodes/%s/qemu" % node,
-                fail="failed to query qemu vms for node %s" % node
-            )
-            _rc, _out, _err, lxc = self.query_json(
-                "get", "/nodes/%s/lxc" % node,
-                fail="failed to query lxc containers for node %s" % node
-            )
-            if qemu is not None:
-                for vm in qemu:
-                    vm['node'] = node
-                    vm['type'] = "qemu"
-                    yield vm
-            if lxc is not None:
-                for vm in lxc:
-                    vm['node'] = node
-                    vm['type'] = "lxc"
-                    yield vm
+            nodes = self.get_nodes() if node is None else [node]
+            for vm in self._get_nodes_vms(nodes):
+                yield vm
 
     def set_node_lrm_maintenance(self, node, enabled):
         """Set maintenance mode on node
@@ -354,6 +727,7 @@ class PveApiModule(AnsibleModule):
         cmd = ["ha-manager", "crm-command", "node-maintenance", action, node]
         s_cmd = ' '.join(cmd)
         rc, out, err = self.run_command(cmd)
+        self.cache_invalidate("/cluster/ha")
         if rc != 0:
             self.fail_json("failed to set maintenance mode", rc=rc, out=out, err=err, cmd=cmd, s_cmd=s_cmd)
 
@@ -387,6 +761,9 @@ class PveApiModule(AnsibleModule):
     def vm_info(self, f_vmid, node=None):
         """Get basic info about a guest
 
+        Answered from pmxcfs if enabled and possible (see
+        PmxcfsReader.vm_resource()), from /cluster/resources otherwise.
+
         :param f_vmid: ID of guest information is requested about
         :type f_vmid: int
         :param node: node to search. Defaults to all nodes.
@@ -395,11 +772,48 @@ class PveApiModule(AnsibleModule):
         :rtype: dict
         """
 
+        reader = self._get_pmxcfs_reader()
+        if reader is not None:
+            vm = reader.vm_resource(f_vmid)
+            if (vm is not None) and ((node is None) or (vm['node'] == node)):
+                return vm
+
+        index = self.get_resource_index()
+        if index is not None:
+            vm = index.get(f_vmid)
+            if vm is None:
+                # guest might have been created after the index was built
+                index = self.get_resource_index(refresh=True)
+                vm = index.get(f_vmid) if index is not None else None
+            if (vm is not None) and ((node is None) or (vm.get('node') == node)):
+                return vm
+            self.fail_json(msg="Unable to locate VM")
         for vm in self.get_vms(node):
             if int(vm['vmid']) == int(f_vmid):
                 return vm
         self.fail_json(msg="Unable to locate VM")
 
+    def _vm_ref(self, f_vmid, node=None):
+        """Get VMID, node and type of a guest
+
+        Unlike vm_info this can be answered by pmxcfs without any API call
+        for every guest, including HA managed ones.
+
+        :param f_vmid: ID of guest
+        :type f_vmid: int
+        :param node: node to search. Defaults to all nodes.
+        :type node: str
+        :returns: dict containing at least vmid, node and type
+        :rtype: dict
+        """
+
+        reader = self._get_pmxcfs_reader()
+        if reader is not None:
+            vm = reader.vm_ref(f_vmid)
+            if (vm is not None) and ((node is None) or (vm['node'] == node)):
+                return vm
+        return self.vm_info(f_vmid, node=node)
+
     def vm_locate(self, f_vmid):
         """Locate VM in cluster
 
@@ -409,96 +823,152 @@ class PveApiModule(AnsibleModule):
         :rtype: str
         """
 
-        vm = self.vm_info(f_vmid)
+        vm = self._vm_ref(f_vmid)
         if vm.get('node', None) is not None:
             return vm.get('node')
         self.fail_json(msg="VM %s found but seems to have no node" % f_vmid)
 
-    def vm_config_get(self, f_vmid, node=None, vm=None):
-        """Returns fully parsed config
-
-        resolves lists seperated by commas and semicolon as well as
-        dictionaries in which key and value are seperated by '='
+    def vm_config_get_raw(self, f_vmid, node=None, vm=None):
+        """Returns config as returned by the API
 
         :param f_vmid: id of guest to fetch config of
+        :type f_vmid: int
         :param node: node on which to look up VMID
-        :param vm:
-        :returna:
+        :type node: str
+        :param vm: basic vm info
+        :type vm: dict
+        :returns: (basic vm info, config)
+        :rtype: tuple
         """
 
         if (node is None) or (vm is None):
-            vm = self.vm_info(f_vmid, node=node)
-            # node = vm['node']
+            vm = self._vm_ref(f_vmid, node=node)
+        reader = self._get_pmxcfs_reader()
+        if reader is not None:
+            vm_config = reader.vm_config(vm['node'], vm['type'], vm['vmid'])
+            if vm_config is not None:
+                return vm, vm_config
         _rc, _out, _err, vm_config = self.query_json(
             'get', "/nodes/%s/%s/%s/config" % (vm['node'], vm['type'], vm['vmid']),
             fail="error fetching config for VM %s" % vm['vmid']
         )
-        ret_config = dict()
-        for k in vm_config:
-            v = vm_config[k]
-            if isinstance(v, str):
-                if k == "tags":
-                    ret_config.update({k: v.split(";")})
-                elif '=' in v:
-                    n_v = dict()
-                    for l in v.split(','):
-                        l_s = l.split('=')
-                        try:
-                            if len(l_s) == 1 and k == "agent":
-                                n_v.update({"enabled": bool(int(l_s[0]))})
-                            elif len(l_s) == 1 and k in self.valid_storages():
-                                n_v.update({"volume": l_s[0]})
-                            elif len(l_s) == 2 and k in self.valid_nets():
-                                if l_s[0] == "firewall":
-                                    n_v.update({"firewall": bool(int(l_s[1]))})
-                                elif l_s[0] == "trunks":
-                                    n_v.update({
-                                        "trunks": [int(t) for t in l_s[1].split(";")]
-                                    })
-                                elif l_s[0] in self.valid_nic_models():
-                                    n_v.update({"model": l_s[0], "macaddr": l_s[1]})
-                                else:
-                                    n_v.update({l_s[0]: l_s[1]})
-                            elif k == "agent" and l_s[0] in ["fstrim_cloned_disks"]:
-                                n_v.update({l_s[0]: bool(int(l_s[1]))})
-                            else:
-                                n_v.update({l_s[0]: l_s[1]})
-                        except:
-                            self.fail_json(msg="failed to parse config",
-                                    vm_config=vm_config, key=k, value=v,
-                                    lst=l, lst_el_split=l_s, lst_sp_len=len(l_s),
-                                    exception=sys.exc_info(),
-                            )
-                    ret_config.update({k: n_v})
-                elif ',' in v:
-                    ret_config.update({k: v.split(',')})
-        return vm, ret_config
-
-    def vm_config_set(self, f_vmid, node=None, digest=None, config=dict(), vm=None):
+        return vm, vm_config
+
+    def vm_config_get(self, f_vmid, node=None, vm=None):
+        """Returns fully parsed config
+
+        Property strings are parsed into dicts according to the class of
+        their key (see pve_property), tags into lists. All other values are
+        returned as they are.
+
+        :param f_vmid: id of guest to fetch config of
+        :param node: node on which to look up VMID
+        :param vm: guest as returned by vm_info(); looked up if not given
+        :returns: tuple: (dict: guest, dict: parsed config)
+        """
+
+        vm, vm_config = self.vm_config_get_raw(f_vmid, node=node, vm=vm)
+        return vm, parse_config(vm_config)
+
+    def vm_config_set(
+            self, f_vmid, node=None, digest=None, config=dict(), vm=None,
+            verify=False, current=None, on_failure=None
+    ):
         """Configure Proxmox VE guest
 
+        Without verify, the new configuration is merged locally from current
+        and the options set, unless the API started a task (e.g. allocating
+        a volume asynchronously); then it is fetched again after the task.
+
         :param f_vmid: ID of guest to configure
         :type f_vmid: int
         :param node: node to look up guest in. Defaults to all nodes
         :type node: str
         :param digest: optional digest of current config
         :type digest: str
-        :param config: options to set.
+        :param config: options to set, 'delete' lists options to remove
         :type config: dict
         :param vm: basic vm info
         :type vm: dict
-        :returns: new configuration
+        :param verify: always fetch the new configuration from the API
+        :type verify: bool
+        :param current: config as returned by vm_config_get(); fetched if
+            not given
+        :type current: dict
+        :param on_failure: called before failing if the update or the task
+            it started failed, e.g. to free volumes allocated beforehand
+        :type on_failure: callable
+        :returns: tuple: (dict: guest, dict: new parsed configuration). The
+            locally merged configuration has no digest.
         :rtype: tuple
         """
-        if (node is None) or (digest is None) or (vm is None):
-            vm, vm_config = self.vm_config_get(f_vmid, node)
-            digest = vm_config.get('digest', None)
-            node = vm['node']
+        if (vm is None) or (current is None and ((digest is None) or not verify)):
+            vm, current = self.vm_config_get(f_vmid, node=node, vm=vm)
+        if digest is None:
+            digest = current.get('digest', None)
+        params = dict(config)
         if digest is not None:
-            config.update(dict(digest=digest))
-        self.query_api(
+            params['digest'] = digest
+        fail = "error updating config for VM %s" % vm['vmid']
+        rc, out, err, obj = self.query_json(
             'create', "/nodes/%s/%s/%s/config" % (vm['node'], vm['type'], vm['vmid']),
-            params=config,
-            fail="error updating config for VM %s" % vm['vmid']
+            params=params,
         )
-        return self.vm_config_get(f_vmid, node=node, vm=vm)
+        if rc != 0:
+            if on_failure is not None:
+                on_failure()
+            self.fail_json(msg=fail, rc=rc, stdout=out, stderr=err, obj=obj)
+        if parse_upid(obj) is not None:
+            task = self.task_wait(obj)
+            if not task['ok']:
+                if on_failure is not None:
+                    on_failure()
+                self.fail_json(msg=fail, task=task)
+            verify = True
+        if verify:
+            return self.vm_config_get(f_vmid, node=vm['node'], vm=vm)
+
+        delete = split_keys(config.get('delete', None))
+        new_config = dict([
+            (k, v) for (k, v) in current.items() if (k not in delete) and (k != 'digest')
+        ])
+        for (k, v) in config.items():
+            if k != 'delete':
+                new_config[k] = parse_value(k, v)
+        return vm, new_config
+
+    def vm_config_update(self, f_vmid, desired, delete=None, node=None, vm=None, current=None):
+        """Apply desired config with a single request if it differs
+
+        Values are compared semantically (see pve_diff), only changed keys are
+        sent. Nothing is sent in check mode.
+
+        :param f_vmid: ID of guest to configure
+        :type f_vmid: int
+        :param desired: desired values; None deletes the key
+        :type desired: dict
+        :param delete: keys to delete; list or string like "ide0,net1"
+        :type delete: list
+        :param node: node to look up guest in. Defaults to all nodes
+        :type node: str
+        :param vm: basic vm info
+        :type vm: dict
+        :param current: config as returned by vm_config_get(); fetched if not given
+        :type current: dict
+        :returns: tuple: (bool: changed, dict: diff with before and after
+            values of changed keys)
+        :rtype: tuple
+        """
+
+        if (vm is None) or (current is None):
+            vm, current = self.vm_config_get(f_vmid, node=node, vm=vm)
+        update, to_delete, changes = config_diff(current, desired, delete=delete)
+        if (len(changes) > 0) and not self.check_mode:
+            params = dict(update)
+            if len(to_delete) > 0:
+                params['delete'] = to_delete
+            self.vm_config_set(
+                f_vmid, node=vm['node'], digest=current.get('digest', None),
+                config=params, vm=vm, current=current
+            )
+        return len(changes) > 0, changes_to_diff(changes)
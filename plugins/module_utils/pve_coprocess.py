@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+
+
+# Helper keeping the Proxmox VE API loaded. It serves requests the same way
+# pvesh does, but only loads the Perl API stack once. Every connection is
+# handled by a forked child; the helper exits after being idle for a while.
+#
+# Protocol: one JSON object per line in both directions
+#   request:  {"method": "get", "path": "/version", "params": {...}}
+#   response: {"rc": 0, "data": ...} | {"rc": 255, "err": "..."}
+#             | {"fallback": 1} if the request has to be proxied to another
+#               node, which is left to pvesh
+PERL_HELPER = r'''
+use strict;
+use warnings;
+
+use IO::Select;
+use IO::Socket::UNIX;
+use JSON;
+use POSIX qw(WNOHANG);
+use Socket qw(SOCK_STREAM);
+
+use PVE::API2;
+use PVE::INotify;
+use PVE::RPCEnvironment;
+
+my ($path, $idle) = @ARGV;
+$idle //= 300;
+
+my $methods = { get => 'GET', create => 'POST', set => 'PUT', delete => 'DELETE' };
+
+if (-S $path) {
+    # another helper is already serving
+    exit(0) if IO::Socket::UNIX->new(Type => SOCK_STREAM(), Peer => $path);
+    unlink($path);
+}
+
+umask(0077);
+my $server = IO::Socket::UNIX->new(Type => SOCK_STREAM(), Local => $path, Listen => 16)
+    or exit(1);
+
+PVE::RPCEnvironment->setup_default_cli_env();
+my $rpcenv = PVE::RPCEnvironment::get();
+my $json = JSON->new->utf8->allow_nonref->allow_blessed->convert_blessed->canonical;
+
+sub handle_request {
+    my ($req) = @_;
+
+    my $method = $methods->{$req->{method} // ''};
+    return { rc => 1, err => "unknown method\n" } if !$method;
+    my $param = $req->{params} // {};
+    my $uri_param = {};
+
+    $rpcenv->init_request();
+    my ($handler, $info) = PVE::API2->find_handler($method, $req->{path}, $uri_param);
+    return { rc => 255, err => "no '$req->{method}' handler for '$req->{path}'\n" }
+        if !$handler || !$info;
+
+    return { fallback => 1 } if $info->{proxyto_callback};
+    if (my $proxyto = $info->{proxyto}) {
+        my $node = $uri_param->{$proxyto} // $param->{$proxyto};
+        return { fallback => 1 }
+            if defined($node) && $node ne 'localhost' && $node ne PVE::INotify::nodename();
+    }
+
+    $param->{$_} = $uri_param->{$_} for keys %$uri_param;
+    my $data = eval { $handler->handle($info, $param) };
+    return { rc => 255, err => "$@" } if $@;
+    return { rc => 0, data => $data };
+}
+
+sub serve_connection {
+    my ($conn) = @_;
+    while (defined(my $line = <$conn>)) {
+        my $resp = eval { handle_request($json->decode($line)) };
+        $resp = { rc => 255, err => "$@" } if !$resp;
+        print $conn $json->encode($resp) . "\n";
+    }
+}
+
+my $select = IO::Select->new($server);
+my $children = 0;
+while (1) {
+    while (waitpid(-1, WNOHANG) > 0) {
+        $children--;
+    }
+    if (!$select->can_read($idle)) {
+        next if $children > 0;
+        last;
+    }
+    my $conn = $server->accept() or next;
+    my $pid = fork();
+    if (!defined($pid)) {
+        close($conn);
+        next;
+    }
+    if ($pid == 0) {
+        close($server);
+        $conn->autoflush(1);
+        serve_connection($conn);
+        POSIX::_exit(0);
+    }
+    $children++;
+    close($conn);
+}
+unlink($path);
+'''
+
+
+class PveCoprocessClient:
+    """Client for a long-lived helper process serving API requests
+
+    The helper is started on first use and reused by later requests and by
+    later module runs until it has been idle for idle_timeout seconds.
+    """
+
+    # socket path -> list of idle (socket, file) tuples
+    _pools = dict()
+    _lock = threading.Lock()
+
+    def __init__(self, socket_path, idle_timeout=300, command=None, startup_timeout=30):
+        """
+        :param socket_path: Unix socket the helper listens on
+        :type socket_path: str
+        :param idle_timeout: seconds the helper keeps running without requests
+        :type idle_timeout: int
+        :param command: command starting a helper; socket path and idle
+            timeout are appended. Defaults to the built-in Perl helper
+        :type command: list
+        :param startup_timeout: seconds to wait for a new helper to listen
+        :type startup_timeout: int
+        """
+
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.command = command
+        self.startup_timeout = startup_timeout
+        self.broken = False
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock, sock.makefile('rb')
+
+    def _spawn(self):
+        """Starts a new helper detached from this process
+
+        :returns: true if the helper accepts connections
+        :rtype: bool
+        """
+
+        directory = os.path.dirname(self.socket_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700)
+        if self.command is None:
+            cmd = ['perl', '-e', PERL_HELPER, '--']
+        else:
+            cmd = list(self.command)
+        cmd += [self.socket_path, str(self.idle_timeout)]
+        subprocess.Popen(
+            cmd, start_new_session=True, close_fds=True,
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            try:
+                conn = self._connect()
+            except OSError:
+                time.sleep(0.1)
+                continue
+            self._release(conn)
+            return True
+        return False
+
+    def _acquire(self):
+        """Returns an idle pooled connection or a new one
+
+        :returns: ((socket, file), whether the connection was reused)
+        :rtype: tuple
+        """
+
+        with self._lock:
+            idle = self._pools.setdefault(self.socket_path, list())
+            if len(idle) > 0:
+                return idle.pop(), True
+        try:
+            return self._connect(), False
+        except OSError:
+            pass
+        if not self._spawn():
+            raise OSError("helper did not start listening on %s" % self.socket_path)
+        return self._connect(), False
+
+    def _release(self, conn):
+        with self._lock:
+            self._pools.setdefault(self.socket_path, list()).append(conn)
+
+    @staticmethod
+    def _close(conn):
+        conn[1].close()
+        conn[0].close()
+
+    def request(self, method, url, params=None):
+        """Queries the API through the helper
+
+        :param method: 'get', 'create', 'set' or 'delete'
+        :type method: str
+        :param url: path according to Proxmox VE API
+        :type url: str
+        :param params: parameters, already converted to strings
+        :type params: dict
+        :returns: tuple: (int: rc, str: stdout, str: stderr) or None if the
+            request has to be sent by other means
+        :rtype: tuple
+        """
+
+        if self.broken:
+            return None
+        line = json.dumps(dict(method=method, path=url, params=params or dict())) + "\n"
+        while True:
+            try:
+                conn, reused = self._acquire()
+            except OSError:
+                self.broken = True
+                return None
+            try:
+                conn[0].sendall(line.encode('utf8'))
+                resp = conn[1].readline()
+                if resp == b"":
+                    raise ConnectionResetError("helper closed the connection")
+                resp = json.loads(resp.decode('utf8'))
+            except (OSError, ValueError):
+                self._close(conn)
+                if reused:
+                    # helper exited after being idle; try a new one
+                    continue
+                self.broken = True
+                return None
+            self._release(conn)
+            break
+
+        if resp.get('fallback', False):
+            return None
+        if resp.get('rc', 1) != 0:
+            return resp.get('rc', 1), "", resp.get('err', "")
+        return 0, json.dumps(resp.get('data', None)), ""
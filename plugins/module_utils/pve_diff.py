@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Semantic diff between current and desired guest config
+
+Values are compared after normalisation, so e.g. ``firewall=1`` equals
+``firewall: true``, a missing ``cache`` equals ``cache=none`` and MAC
+addresses compare case-insensitively. Options of property strings not given
+in the desired config are kept, including server-assigned ones like the MAC
+address of a NIC or the size of a disk.
+"""
+
+import re
+
+from ansible_collections.inett.pve.plugins.module_utils.pve_property import (
+    NIC_MODELS, format_value, key_class, parse_value,
+)
+from ansible_collections.inett.pve.plugins.module_utils.pve_resources import split_tags
+
+
+# (class, option) -> default value in canonical form
+OPTION_DEFAULTS = {
+    ('disk', 'backup'): '1',
+    ('disk', 'cache'): 'none',
+    ('disk', 'discard'): 'ignore',
+    ('disk', 'iothread'): '0',
+    ('disk', 'media'): 'disk',
+    ('disk', 'replicate'): '1',
+    ('disk', 'ro'): '0',
+    ('disk', 'ssd'): '0',
+    ('net', 'firewall'): '0',
+    ('net', 'link_down'): '0',
+    ('agent', 'enabled'): '0',
+    ('agent', 'fstrim_cloned_disks'): '0',
+}
+
+# config key -> default value in canonical form
+KEY_DEFAULTS = dict(
+    acpi='1', kvm='1', numa='0', onboot='0', protection='0', tablet='1',
+    template='0',
+)
+
+# options assigned by Proxmox VE, only compared if given in the desired config
+SERVER_ASSIGNED = dict(disk=('size',), net=('macaddr', 'hwaddr'))
+
+_MAC_OPTIONS = ('macaddr', 'hwaddr')
+_TRUE = frozenset(['1', 'on', 'yes', 'true'])
+_FALSE = frozenset(['0', 'off', 'no', 'false'])
+
+# new volume to allocate: <storage>:<size in GiB>
+_re_allocation = re.compile(r'^([^:]+):(\d+(?:\.\d+)?)$')
+
+
+def _canon(option, value, sep=';'):
+    """Canonical string form of a scalar value
+
+    Lists are joined with sep: ';' within property strings, ',' for config
+    keys.
+    """
+
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, list):
+        return sep.join([_canon(option, v) for v in value])
+    ret = str(value)
+    low = ret.lower()
+    if low in _TRUE:
+        return '1'
+    if low in _FALSE:
+        return '0'
+    if option in _MAC_OPTIONS:
+        return ret.upper()
+    return ret
+
+
+def _as_set(key, value):
+    """Elements of a comma separated list option, e.g. hotplug"""
+
+    if value is None:
+        return set()
+    if isinstance(value, str):
+        value = parse_value(key, value)
+    if not isinstance(value, list):
+        value = [value]
+    return set([_canon(key, v) for v in value])
+
+
+def _as_dict(key, value):
+    """Parsed property string with aliases resolved, None for scalars"""
+
+    if isinstance(value, str):
+        value = parse_value(key, value)
+    if not isinstance(value, dict):
+        return None
+    ret = dict()
+    for (k, v) in value.items():
+        if k in NIC_MODELS:
+            # {"virtio": "BC:24:11:..."}
+            ret['model'] = k
+            if v not in [None, ""]:
+                ret['macaddr'] = v
+        elif k == 'file':
+            ret['volume'] = v
+        else:
+            ret[k] = v
+    return ret
+
+
+def _same_volume(current, desired):
+    """True if desired is the current volume or an allocation on its storage"""
+
+    if current == desired:
+        return True
+    m = _re_allocation.match(desired)
+    return (m is not None) and current.startswith(m.group(1) + ':')
+
+
+def _dict_differs(cls, current, desired):
+    for (k, v) in desired.items():
+        if k in SERVER_ASSIGNED.get(cls, ()):
+            continue
+        d = _canon(k, v)
+        c = current.get(k, None)
+        c = OPTION_DEFAULTS.get((cls, k), None) if c is None else _canon(k, c)
+        if (k == 'volume') and (c is not None):
+            if _same_volume(c, d):
+                continue
+        if c != d:
+            return True
+    return False
+
+
+def _merge(cls, current, desired):
+    """Desired options on top of the current ones"""
+
+    ret = dict(current)
+    for (k, v) in desired.items():
+        if (k == 'volume') and ('volume' in current) and \
+                _same_volume(_canon(k, current['volume']), _canon(k, v)):
+            continue
+        if (k == 'volume') and ('volume' in current):
+            # another volume, its size is unknown
+            ret.pop('size', None)
+        ret[k] = v
+    return ret
+
+
+def value_differs(key, current, desired):
+    """Compares a single config value semantically
+
+    :param key: config key, e.g. 'net0'
+    :type key: str
+    :param current: current value as returned by the API or parsed; None if unset
+    :param desired: desired value as string, dict, list, bool or int
+    :rtype: bool
+    """
+
+    cls = key_class(key)
+    if cls == 'tags':
+        return sorted(set(split_tags(current))) != sorted(set(split_tags(desired)))
+    if cls == 'list':
+        return (current is None) or (_as_set(key, current) != _as_set(key, desired))
+    if cls == 'plain':
+        return (current is None) or (str(current) != str(desired))
+
+    c_dict = _as_dict(key, current)
+    d_dict = _as_dict(key, desired)
+    if (c_dict is not None) and (d_dict is not None):
+        return _dict_differs(cls, c_dict, d_dict)
+    if d_dict is not None:
+        desired = format_value(key, d_dict)
+
+    c = KEY_DEFAULTS.get(key, None) if current is None else _canon(key, current, sep=',')
+    if c is None:
+        return True
+    return c != _canon(key, desired, sep=',')
+
+
+def split_keys(keys):
+    """Splits a list of config keys as accepted by the 'delete' parameter
+
+    :param keys: list or string separated by commas, semicolons or spaces,
+        e.g. "ide0" or "ide0,net1"
+    :returns: keys in the given order
+    :rtype: list
+    """
+
+    if keys is None:
+        return list()
+    if isinstance(keys, (list, tuple)):
+        return [str(k) for k in keys if str(k) != ""]
+    return [k for k in re.split(r'[,;\s]+', str(keys)) if k != ""]
+
+
+def config_diff(current, desired, delete=None):
+    """Computes the minimal update turning current into desired config
+
+    :param current: current config as returned by the API or vm_config_get()
+    :type current: dict
+    :param desired: desired values; None deletes the key
+    :type desired: dict
+    :param delete: keys to delete, see split_keys()
+    :type delete: list
+    :returns: tuple: (dict: options to set as canonical strings, list: keys
+        to delete, dict: key -> dict(before, after) for every changed key)
+    :rtype: tuple
+    """
+
+    update = dict()
+    to_delete = list()
+    changes = dict()
+
+    for k in split_keys(delete) + [k for (k, v) in desired.items() if v is None]:
+        if (current.get(k, None) is not None) and (k not in to_delete):
+            to_delete.append(k)
+            changes[k] = dict(before=format_value(k, current[k]), after=None)
+
+    for (k, v) in desired.items():
+        if (v is None) or (k in to_delete):
+            continue
+        c = current.get(k, None)
+        if not value_differs(k, c, v):
+            continue
+        cls = key_class(k)
+        c_dict = _as_dict(k, c) if (c is not None) and (cls != 'plain') else None
+        d_dict = _as_dict(k, v) if cls != 'plain' else None
+        if (c_dict is not None) and (d_dict is not None):
+            update[k] = format_value(k, _merge(cls, c_dict, d_dict))
+        elif d_dict is not None:
+            update[k] = format_value(k, d_dict)
+        else:
+            update[k] = format_value(k, v)
+        changes[k] = dict(
+            before=None if c is None else format_value(k, c),
+            after=update[k],
+        )
+
+    return update, to_delete, changes
+
+
+def changes_to_diff(changes):
+    """Converts changes returned by config_diff() to Ansible's diff format
+
+    :param changes: key -> dict(before, after)
+    :type changes: dict
+    :returns: dict(before=dict, after=dict)
+    :rtype: dict
+    """
+
+    return dict(
+        before=dict([(k, c['before']) for (k, c) in sorted(changes.items())]),
+        after=dict([(k, c['after']) for (k, c) in sorted(changes.items())]),
+    )
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+# Queries a complete snapshot is built from, issued as one batch
+HA_QUERIES = [
+    ("get", "/cluster/ha/status/current"),
+    ("get", "/cluster/ha/groups"),
+    ("get", "/cluster/ha/resources"),
+]
+
+
+def parse_ha_group_nodes(nodes):
+    """Parses the node list of an HA group
+
+    :param nodes: nodes as returned by /cluster/ha/groups, e.g. "pve01:2,pve02"
+    :type nodes: str
+    :returns: dict: node -> priority (0 if not given)
+    :rtype: dict
+    """
+
+    ret = dict()
+    for e in str(nodes or "").split(','):
+        (name, _sep, prio) = e.strip().partition(':')
+        if name == "":
+            continue
+        try:
+            ret[name] = int(prio) if prio != "" else 0
+        except ValueError:
+            ret[name] = 0
+    return ret
+
+
+def sid_vmid(sid):
+    """Returns the VMID of an HA service
+
+    :param sid: service ID, e.g. "vm:100" or "ct:101"
+    :type sid: str
+    :rtype: int
+    """
+
+    return int(str(sid).split(':', 1)[-1])
+
+
+def lrm_mode(status):
+    """Returns the mode of an LRM without its timestamp
+
+    :param status: status as returned by /cluster/ha/status/current,
+        e.g. "pve01 (active, Mon Jan  1 00:00:00 2024)"
+    :type status: str
+    :returns: e.g. "active", "idle" or "maintenance mode"
+    :rtype: str
+    """
+
+    status = str(status or "")
+    if '(' in status:
+        status = status.split('(', 1)[1].split(',', 1)[0].rstrip(')')
+    return status.strip()
+
+
+class PveHaState:
+    """Snapshot of the HA stack of a cluster
+
+    Built from /cluster/ha/status/current, /cluster/ha/groups and
+    /cluster/ha/resources. LRMs are indexed by node, services by service ID,
+    node and group, so lookups do not need any further API call. Parts which
+    could not be fetched are None and reported by available().
+    """
+
+    def __init__(self, status=None, groups=None, resources=None):
+        """
+        :param status: as returned by /cluster/ha/status/current
+        :type status: list
+        :param groups: as returned by /cluster/ha/groups
+        :type groups: list
+        :param resources: as returned by /cluster/ha/resources
+        :type resources: list
+        """
+
+        self.status = None
+        self.groups = None
+        self.resources = None
+        self.quorate = None
+        self.master = None
+        self.lrms = dict()
+        self.services = dict()
+        self.by_vmid = dict()
+        self.by_node = dict()
+        self.by_group = dict()
+        self.group_members = dict()
+        self.last_changes = dict()
+        self.update(status, groups, resources)
+
+    def update(self, status=None, groups=None, resources=None):
+        """Replaces the snapshot
+
+        Parts passed as None are considered unavailable.
+
+        :returns: changes since the previous snapshot, see changes()
+        :rtype: dict
+        """
+
+        previous = self.states()
+        self.status = status
+        self.groups = groups
+        self.resources = resources
+        self._index()
+        self.last_changes = self.changes(previous)
+        return self.last_changes
+
+    def _index(self):
+        self.quorate = None
+        self.master = None
+        self.lrms = dict()
+        self.services = dict()
+        self.by_vmid = dict()
+        self.by_node = dict()
+        self.by_group = dict()
+        self.group_members = dict()
+
+        for g in self.groups or list():
+            self.group_members[g['group']] = parse_ha_group_nodes(g.get('nodes', None))
+
+        # Configured resources, the status adds where they are and what they do
+        for r in self.resources or list():
+            self.services[r['sid']] = dict(r, vmid=sid_vmid(r['sid']))
+        for e in self.status or list():
+            if e.get('type', None) == 'quorum':
+                self.quorate = bool(int(e.get('quorate', 0) or 0))
+            elif e.get('type', None) == 'master':
+                self.master = e.get('node', None)
+            elif e.get('type', None) == 'lrm':
+                self.lrms[e['node']] = dict(e, mode=lrm_mode(e.get('status', None)))
+            elif e.get('type', None) == 'service':
+                s = self.services.setdefault(e['sid'], dict(sid=e['sid'], vmid=sid_vmid(e['sid'])))
+                s['node'] = e.get('node', None)
+                s['status_state'] = e.get('state', None)
+                s['crm_state'] = e.get('crm_state', None)
+                s['request_state'] = e.get('request_state', None)
+
+        for s in self.services.values():
+            self.by_vmid[s['vmid']] = s
+            if s.get('node', None) is not None:
+                self.by_node.setdefault(s['node'], list()).append(s)
+            if s.get('group', None) is not None:
+                self.by_group.setdefault(s['group'], list()).append(s)
+
+    def available(self, part):
+        """Returns true if a part of the snapshot could be fetched
+
+        :param part: 'status', 'groups' or 'resources'
+        :type part: str
+        :rtype: bool
+        """
+
+        return getattr(self, part) is not None
+
+    def lrm(self, node):
+        """Returns the LRM entry of a node
+
+        :param node: name of node
+        :type node: str
+        :returns: LRM entry with its mode or None if the node has no LRM
+        :rtype: dict
+        """
+
+        return self.lrms.get(node, None)
+
+    def lrm_idle(self, node):
+        """Returns true if the LRM of a node is idle
+
+        :param node: name of node
+        :type node: str
+        :rtype: bool
+        """
+
+        lrm = self.lrm(node)
+        return (lrm is not None) and ("idle" in lrm['mode'])
+
+    def lrm_maintenance(self, node):
+        """Returns true if the LRM of a node is in maintenance mode
+
+        :param node: name of node
+        :type node: str
+        :rtype: bool
+        """
+
+        lrm = self.lrm(node)
+        return (lrm is not None) and ("maintenance mode" in lrm['mode'])
+
+    def service(self, sid):
+        """Returns an HA service
+
+        :param sid: service ID, e.g. "vm:100", or VMID
+        :type sid: str
+        :returns: service or None if the guest is not HA managed
+        :rtype: dict
+        """
+
+        if sid in self.services:
+            return self.services[sid]
+        return self.by_vmid.get(sid_vmid(sid), None)
+
+    def node_services(self, node):
+        """Returns HA services currently on a node
+
+        :param node: name of node
+        :type node: str
+        :rtype: list
+        """
+
+        return sorted(self.by_node.get(node, list()), key=lambda s: s['vmid'])
+
+    def group_services(self, group):
+        """Returns HA services in a group
+
+        :param group: name of HA group
+        :type group: str
+        :rtype: list
+        """
+
+        return sorted(self.by_group.get(group, list()), key=lambda s: s['vmid'])
+
+    def managed_vmids(self):
+        """Returns VMIDs of all HA managed guests
+
+        :rtype: set
+        """
+
+        return set(self.by_vmid.keys())
+
+    def vm_group(self, vmid):
+        """Returns the HA group of a guest
+
+        :param vmid: VMID of guest
+        :type vmid: int
+        :returns: name of group or None
+        :rtype: str
+        """
+
+        s = self.service(vmid)
+        if s is None:
+            return None
+        return s.get('group', None)
+
+    def vm_group_members(self, vmid):
+        """Returns the nodes of the HA group of a guest
+
+        :param vmid: VMID of guest
+        :type vmid: int
+        :returns: node -> priority or None if the guest is not in a group
+        :rtype: dict
+        """
+
+        group = self.vm_group(vmid)
+        if group is None:
+            return None
+        return self.group_members.get(group, None)
+
+    def states(self):
+        """Returns the state of every LRM and service
+
+        LRMs are keyed "lrm:<node>" with their mode, services by service ID
+        with a tuple (node, state).
+
+        :rtype: dict
+        """
+
+        ret = dict()
+        for (node, lrm) in self.lrms.items():
+            ret["lrm:%s" % node] = lrm['mode']
+        for (sid, s) in self.services.items():
+            ret[sid] = (s.get('node', None), s.get('status_state', None) or s.get('state', None))
+        return ret
+
+    def changes(self, previous):
+        """Returns what changed compared to states() of an earlier snapshot
+
+        :param previous: as returned by states()
+        :type previous: dict
+        :returns: key -> (previous, current); None if missing in either
+        :rtype: dict
+        """
+
+        current = self.states()
+        ret = dict()
+        for k in set(previous.keys()) | set(current.keys()):
+            if previous.get(k, None) != current.get(k, None):
+                ret[k] = (previous.get(k, None), current.get(k, None))
+        return ret
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import http.client
+import json
+import ssl
+import threading
+
+from urllib.parse import quote, urlencode
+
+
+class PveHttpClient:
+    """Minimal client for the Proxmox VE REST API served by pveproxy
+
+    Connections are kept alive and pooled per host, so a module run issuing
+    many requests only pays for a single TLS handshake per host and thread.
+    """
+
+    # (host, port, validate_certs) -> list of idle connections
+    _pools = dict()
+    # (host, port, user) -> (ticket, CSRFPreventionToken)
+    _tickets = dict()
+    _lock = threading.Lock()
+
+    methods = dict(get='GET', create='POST', set='PUT', delete='DELETE')
+
+    def __init__(
+            self, host, port=8006, validate_certs=True,
+            user=None, password=None, token_id=None, token_secret=None,
+            ticket=None, csrf_token=None, timeout=300,
+    ):
+        """
+        :param host: Proxmox VE node to connect to
+        :type host: str
+        :param port: port pveproxy listens on
+        :type port: int
+        :param validate_certs: whether to validate the TLS certificate
+        :type validate_certs: bool
+        :param user: user to authenticate as (e.g. root@pam)
+        :type user: str
+        :param password: password used to request a ticket
+        :type password: str
+        :param token_id: API token ID; used together with user
+        :type token_id: str
+        :param token_secret: API token secret
+        :type token_secret: str
+        :param ticket: existing authentication ticket
+        :type ticket: str
+        :param csrf_token: CSRF prevention token belonging to ticket
+        :type csrf_token: str
+        :param timeout: socket timeout in seconds
+        :type timeout: int
+        """
+
+        self.host = host
+        self.port = port
+        self.validate_certs = validate_certs
+        self.user = user
+        self.password = password
+        self.token_id = token_id
+        self.token_secret = token_secret
+        self.timeout = timeout
+        if ticket is not None:
+            self._tickets[(host, port, user)] = (ticket, csrf_token)
+
+    def _ssl_context(self):
+        ctx = ssl.create_default_context()
+        if not self.validate_certs:
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+        return ctx
+
+    def _acquire(self):
+        """Returns an idle pooled connection or a new one
+
+        :returns: (connection, whether the connection was reused)
+        :rtype: tuple
+        """
+
+        key = (self.host, self.port, self.validate_certs)
+        with self._lock:
+            idle = self._pools.setdefault(key, list())
+            if len(idle) > 0:
+                return idle.pop(), True
+        conn = http.client.HTTPSConnection(
+            self.host, self.port,
+            timeout=self.timeout, context=self._ssl_context(),
+        )
+        return conn, False
+
+    def _release(self, conn):
+        key = (self.host, self.port, self.validate_certs)
+        with self._lock:
+            self._pools.setdefault(key, list()).append(conn)
+
+    @classmethod
+    def close_all(cls):
+        """Closes all pooled connections"""
+
+        with cls._lock:
+            for idle in cls._pools.values():
+                for conn in idle:
+                    conn.close()
+            cls._pools.clear()
+
+    def _auth_headers(self, http_method):
+        if self.token_id is not None:
+            return {
+                'Authorization': 'PVEAPIToken=%s!%s=%s' % (
+                    self.user, self.token_id, self.token_secret
+                ),
+            }
+        ticket = self._tickets.get((self.host, self.port, self.user), None)
+        if ticket is None:
+            return dict()
+        headers = {'Cookie': 'PVEAuthCookie=' + quote(ticket[0], safe='')}
+        if (http_method != 'GET') and (ticket[1] is not None):
+            headers['CSRFPreventionToken'] = ticket[1]
+        return headers
+
+    def _send(self, http_method, path, body=None, headers=None):
+        """Sends a single request over a pooled connection
+
+        A reused keep-alive connection closed by pveproxy in the meantime is
+        replaced by a fresh one once.
+
+        :returns: (int: status, str: reason, bytes: body)
+        :rtype: tuple
+        """
+
+        s_headers = dict(headers or dict())
+        if body is not None:
+            s_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        while True:
+            conn, reused = self._acquire()
+            try:
+                conn.request(http_method, path, body=body, headers=s_headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError,
+                    BrokenPipeError, http.client.CannotSendRequest):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return resp.status, resp.reason, data
+
+    def login(self):
+        """Requests a new ticket using user and password
+
+        :returns: (int: rc, str: error message)
+        :rtype: tuple
+        """
+
+        if (self.user is None) or (self.password is None):
+            return 1, "no credentials to request a ticket"
+        status, reason, data = self._send(
+            'POST', '/api2/json/access/ticket',
+            body=urlencode(dict(username=self.user, password=self.password)),
+        )
+        if status != 200:
+            return status, "%d %s" % (status, reason)
+        try:
+            auth = json.loads(data.decode('utf8'))['data']
+            ticket = (auth['ticket'], auth['CSRFPreventionToken'])
+        except (ValueError, KeyError, TypeError):
+            return 1, "invalid ticket response"
+        with self._lock:
+            self._tickets[(self.host, self.port, self.user)] = ticket
+        return 0, ""
+
+    def request(self, method, url, params=None):
+        """Queries the API like pvesh would
+
+        :param method: 'get', 'create', 'set' or 'delete'
+        :type method: str
+        :param url: path according to Proxmox VE API
+        :type url: str
+        :param params: parameters, already converted to strings
+        :type params: dict
+        :returns: tuple: (int: rc, str: stdout, str: stderr)
+        :rtype: tuple
+        """
+
+        http_method = self.methods.get(method, None)
+        if http_method is None:
+            return 1, "", "unknown method %s" % method
+
+        path = '/api2/json/' + quote(url.lstrip('/'), safe="/:@!$&'()*+,;=-._~")
+        query = urlencode(params or dict())
+        body = None
+        if http_method in ['GET', 'DELETE']:
+            if query != "":
+                path += '?' + query
+        else:
+            body = query
+
+        try:
+            if (self.token_id is None) and \
+                    ((self.host, self.port, self.user) not in self._tickets):
+                rc, err = self.login()
+                if rc != 0:
+                    return rc, "", err
+            status, reason, data = self._send(
+                http_method, path, body=body,
+                headers=self._auth_headers(http_method),
+            )
+            if (status == 401) and (self.token_id is None) and (self.password is not None):
+                rc, err = self.login()
+                if rc != 0:
+                    return rc, "", err
+                status, reason, data = self._send(
+                    http_method, path, body=body,
+                    headers=self._auth_headers(http_method),
+                )
+        except (OSError, http.client.HTTPException) as e:
+            return 1, "", "%s: %s" % (type(e).__name__, e)
+
+        try:
+            obj = json.loads(data.decode('utf8'))
+        except ValueError:
+            obj = None
+
+        if status != 200:
+            err = "%d %s" % (status, reason)
+            if isinstance(obj, dict) and obj.get('errors', None) is not None:
+                err += ": " + json.dumps(obj['errors'])
+            return status, "", err
+
+        if not isinstance(obj, dict):
+            return 1, data.decode('utf8', 'replace'), "invalid response"
+        return 0, json.dumps(obj.get('data', None)), ""
@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Placement of guests evacuated from a node
+
+Guests are placed largest first on the node with the lowest memory
+pressure after placement (worst fit decreasing), which keeps the peak
+memory pressure of all targets low. Ties are broken by CPU pressure and
+node name, so the same cluster state always gives the same plan.
+
+The planned migrations are run one task per guest, with the number of
+concurrent migrations limited in total and per target node. Guests moved
+away from their node are tagged with parked-from-<node>, so they can be
+returned even if the play moving them got lost.
+"""
+
+import time
+
+from ansible_collections.inett.pve.plugins.module_utils.pve_resources import split_tags
+from ansible_collections.inett.pve.plugins.module_utils.pve_tasks import parse_upid, task_succeeded
+from ansible_collections.inett.pve.plugins.module_utils.pve_wait import Backoff
+
+
+PARK_TAG_PREFIX = 'parked-from-'
+
+
+def park_tag(node):
+    """Returns the tag marking guests parked away from a node
+
+    :param node: name of node the guest belongs on
+    :type node: str
+    :rtype: str
+    """
+
+    return PARK_TAG_PREFIX + node.lower()
+
+
+def parked_from(tags):
+    """Returns the node a guest is parked away from
+
+    :param tags: tags as returned by the API
+    :type tags: str
+    :returns: node name in lower case or None if the guest isn't parked
+    :rtype: str
+    """
+
+    for t in split_tags(tags):
+        if t.lower().startswith(PARK_TAG_PREFIX):
+            return t.lower()[len(PARK_TAG_PREFIX):]
+    return None
+
+
+def set_park_tag(tags, node=None):
+    """Returns tags with the park tag replaced
+
+    :param tags: tags as returned by the API
+    :type tags: str
+    :param node: node the guest belongs on; None removes the park tag
+    :type node: str
+    :returns: tags as ';' separated string
+    :rtype: str
+    """
+
+    ret = [t for t in split_tags(tags) if not t.lower().startswith(PARK_TAG_PREFIX)]
+    if node is not None:
+        ret.append(park_tag(node))
+    return ';'.join(ret)
+
+
+def ha_candidates(members, available):
+    """Returns the members of an HA group a guest may be placed on
+
+    The HA manager moves guests to the online member with the highest
+    priority, so only the available members with the highest priority are
+    candidates.
+
+    :param members: node -> priority as returned by parse_ha_group_nodes() of pve_ha
+    :type members: dict
+    :param available: nodes able to receive guests
+    :type available: list
+    :rtype: list
+    """
+
+    members = dict([(n, p) for (n, p) in members.items() if n in available])
+    if len(members) == 0:
+        return list()
+    prio = max(members.values())
+    return sorted([n for (n, p) in members.items() if p == prio])
+
+
+def guest_demand(guest, memory='maxmem'):
+    """Returns the resources a guest needs on its target
+
+    :param guest: guest as returned by /cluster/resources
+    :type guest: dict
+    :param memory: 'maxmem' for configured memory, 'mem' for current usage
+    :type memory: str
+    :returns: tuple: (int: memory in bytes, float: CPU cores in use)
+    :rtype: tuple
+    """
+
+    mem = guest.get(memory, None)
+    if mem is None:
+        mem = guest.get('maxmem', 0)
+    cpus = guest.get('maxcpu', guest.get('cpus', 1)) or 1
+    return int(mem or 0), float(guest.get('cpu', 0) or 0) * cpus
+
+
+def node_load(node):
+    """Returns the current load of a node
+
+    :param node: node as returned by /cluster/resources?type=node
+    :type node: dict
+    :returns: dict(maxmem, mem, maxcpu, cpu) with cpu in cores
+    :rtype: dict
+    """
+
+    maxcpu = node.get('maxcpu', 1) or 1
+    return dict(
+        maxmem=int(node.get('maxmem', 0) or 0),
+        mem=int(node.get('mem', 0) or 0),
+        maxcpu=maxcpu,
+        cpu=float(node.get('cpu', 0) or 0) * maxcpu,
+    )
+
+
+def _ratios(load, mem, cpu):
+    mem_ratio = (load['mem'] + mem) / float(load['maxmem']) if load['maxmem'] > 0 else 1.0
+    cpu_ratio = (load['cpu'] + cpu) / float(load['maxcpu'])
+    return mem_ratio, cpu_ratio
+
+
+def plan_placement(
+        guests, nodes, candidates,
+        max_memory_ratio=0.9, max_cpu_ratio=1.0, memory='maxmem',
+        allow_overcommit=False
+):
+    """Places guests on target nodes
+
+    :param guests: guests to place as returned by /cluster/resources
+    :type guests: list
+    :param nodes: node -> load as returned by node_load()
+    :type nodes: dict
+    :param candidates: vmid -> list of nodes the guest may be placed on
+    :type candidates: dict
+    :param max_memory_ratio: memory usage of a target must stay below this
+        fraction of its memory
+    :type max_memory_ratio: float
+    :param max_cpu_ratio: CPU usage of a target must stay below this
+        fraction of its cores
+    :type max_cpu_ratio: float
+    :param memory: memory value of guests to plan with, 'maxmem' or 'mem'
+    :type memory: str
+    :param allow_overcommit: place guests exceeding the limits on the least
+        loaded candidate instead of leaving them unplaced
+    :type allow_overcommit: bool
+    :returns: dict(placement=dict: vmid -> node, unplaced=list of vmids
+        without a target having enough headroom, no_target=list of vmids
+        without any candidate among nodes, load=dict: node ->
+        dict(mem_ratio, cpu_ratio) before and after placement)
+    :rtype: dict
+    """
+
+    load = dict([(n, dict(l)) for (n, l) in nodes.items()])
+    before = dict([(n, _ratios(l, 0, 0.0)) for (n, l) in load.items()])
+    placement = dict()
+    unplaced = list()
+    no_target = list()
+
+    def _key(g):
+        (mem, cpu) = guest_demand(g, memory)
+        return -mem, -cpu, int(g['vmid'])
+
+    for guest in sorted(guests, key=_key):
+        vmid = int(guest['vmid'])
+        (mem, cpu) = guest_demand(guest, memory)
+        scored = list()
+        for n in candidates.get(vmid, list()):
+            if n not in load:
+                continue
+            (mem_ratio, cpu_ratio) = _ratios(load[n], mem, cpu)
+            fits = (mem_ratio <= max_memory_ratio) and (cpu_ratio <= max_cpu_ratio)
+            scored.append((not fits, mem_ratio, cpu_ratio, n))
+        if len(scored) == 0:
+            no_target.append(vmid)
+            continue
+        best = min(scored)
+        if best[0] and not allow_overcommit:
+            unplaced.append(vmid)
+            continue
+        placement[vmid] = best[3]
+        load[best[3]]['mem'] += mem
+        load[best[3]]['cpu'] += cpu
+
+    return dict(
+        placement=placement,
+        unplaced=unplaced,
+        no_target=no_target,
+        load=dict([(n, dict(
+            mem_ratio_before=round(before[n][0], 4),
+            cpu_ratio_before=round(before[n][1], 4),
+            mem_ratio=round(_ratios(l, 0, 0.0)[0], 4),
+            cpu_ratio=round(_ratios(l, 0, 0.0)[1], 4),
+        )) for (n, l) in sorted(load.items())]),
+    )
+
+
+# Errors worth retrying a migration for
+TRANSIENT_ERRORS = (
+    'locked', 'timeout', 'timed out', 'temporarily', 'try again',
+    'connection refused', 'connection reset', 'broken pipe', 'got no response',
+    'unable to connect',
+)
+
+
+def is_transient(error):
+    """Returns true if a failed migration may succeed when retried
+
+    :param error: error message or exit status of the task
+    :type error: str
+    :rtype: bool
+    """
+
+    error = str(error or "").lower()
+    return any([e in error for e in TRANSIENT_ERRORS])
+
+
+def run_migrations(
+        jobs, start, status_many, locate=None, task_log=None,
+        max_workers=1, max_per_target=1, retries=2, retry_delay=5.0, timeout=None,
+        backoff=None
+):
+    """Migrates guests one task per guest with limited concurrency
+
+    A new migration is started whenever less than max_workers are running
+    in total and less than max_per_target to its target node. Running tasks
+    are polled together. Tasks of HA managed guests only request the
+    migration from the HA manager, so these guests are done once locate()
+    finds them on their target.
+
+    :param jobs: dict(vmid, type, source, target, ha) per guest, in the
+        order to start them
+    :type jobs: list
+    :param start: function(job) returning a tuple (int: rc, str: UPID,
+        str: error) for starting the migration of a guest
+    :type start: callable
+    :param status_many: function(list of UPIDs) returning a list of tuples
+        (int: rc, dict: task status) in the same order
+    :type status_many: callable
+    :param locate: function returning dict: vmid -> node; required for HA
+        managed guests
+    :type locate: callable
+    :param task_log: function(UPID) returning the last lines of the log of
+        a failed task
+    :type task_log: callable
+    :param max_workers: migrations running at most at the same time
+    :type max_workers: int
+    :param max_per_target: migrations to the same node running at most at
+        the same time
+    :type max_per_target: int
+    :param retries: retries of migrations failing with a transient error,
+        started retry_delay seconds times the number of attempts later
+    :type retries: int
+    :param retry_delay: seconds to wait before the first retry
+    :type retry_delay: float
+    :param timeout: seconds to wait for a single migration at most; None
+        waits forever
+    :type timeout: float
+    :param backoff: delays between polls without progress. Defaults to 0.5s
+        up to 5s
+    :type backoff: Backoff
+    :returns: dict(vmid, type, source, target, node, ok, attempts, duration,
+        upid, exitstatus, error, log) per job, in the order of jobs
+    :rtype: list
+    """
+
+    if backoff is None:
+        backoff = Backoff(initial=0.5, maximum=5.0)
+    max_workers = max(int(max_workers), 1)
+    max_per_target = max(int(max_per_target), 1)
+
+    results = [dict(
+        vmid=j['vmid'], type=j['type'], source=j['source'], target=j['target'],
+        node=j['source'], ok=False, attempts=0, duration=None, upid=None,
+        exitstatus=None, error=None, log=list(),
+    ) for j in jobs]
+    pending = list(range(len(jobs)))
+    # index of job -> time it may be started again
+    not_before = dict()
+    # index of job -> dict(started, state) with state 'task' or 'ha'
+    running = dict()
+
+    def _finish(i, ok, error=None):
+        r = results[i]
+        r['ok'] = ok
+        r['error'] = error
+        r['duration'] = round(time.monotonic() - running[i]['started'], 3)
+        if ok:
+            r['node'] = r['target']
+        elif (r['upid'] is not None) and (task_log is not None):
+            r['log'] = task_log(r['upid'])
+        del running[i]
+
+    def _fail(i, error):
+        """Retries a failed migration if possible"""
+
+        if (results[i]['attempts'] <= retries) and is_transient(error):
+            del running[i]
+            pending.insert(0, i)
+            not_before[i] = time.monotonic() + retry_delay * results[i]['attempts']
+            return
+        _finish(i, False, error)
+
+    while (len(pending) > 0) or (len(running) > 0):
+        progress = False
+
+        # Start migrations as far as the limits allow
+        for i in list(pending):
+            if len(running) >= max_workers:
+                break
+            if not_before.get(i, 0) > time.monotonic():
+                continue
+            target = jobs[i]['target']
+            if len([k for k in running if jobs[k]['target'] == target]) >= max_per_target:
+                continue
+            pending.remove(i)
+            results[i]['attempts'] += 1
+            running[i] = dict(started=time.monotonic(), state='task')
+            progress = True
+            rc, upid, err = start(jobs[i])
+            results[i]['upid'] = upid
+            if rc != 0:
+                _fail(i, err)
+            elif parse_upid(upid) is None:
+                # no task to wait for
+                if jobs[i].get('ha', False) and (locate is not None):
+                    running[i]['state'] = 'ha'
+                else:
+                    _finish(i, True)
+
+        # Poll running tasks
+        polled = [i for i in running if running[i]['state'] == 'task']
+        if len(polled) > 0:
+            for (i, (rc, status)) in zip(polled, status_many([results[i]['upid'] for i in polled])):
+                if (rc != 0) or not isinstance(status, dict) or (status.get('status', None) != 'stopped'):
+                    continue
+                progress = True
+                results[i]['exitstatus'] = status.get('exitstatus', None)
+                if not task_succeeded(results[i]['exitstatus']):
+                    _fail(i, results[i]['exitstatus'])
+                elif jobs[i].get('ha', False) and (locate is not None):
+                    running[i]['state'] = 'ha'
+                else:
+                    _finish(i, True)
+
+        # HA managed guests are done once they run on their target
+        if len([i for i in running if running[i]['state'] == 'ha']) > 0:
+            nodes = locate()
+            for i in [i for i in running if running[i]['state'] == 'ha']:
+                node = nodes.get(jobs[i]['vmid'], None)
+                if node is not None:
+                    results[i]['node'] = node
+                if node == jobs[i]['target']:
+                    progress = True
+                    _finish(i, True)
+
+        for i in list(running):
+            if (timeout is not None) and (time.monotonic() - running[i]['started'] >= timeout):
+                progress = True
+                _finish(i, False, "timed out after %ds" % timeout)
+
+        if progress:
+            backoff.reset()
+        elif (len(running) > 0) or (len(pending) > 0):
+            time.sleep(backoff.next())
+
+    return results
+
+
+# Fixed seconds a migration takes besides the transfer (setup, switchover)
+QEMU_OVERHEAD = 5.0
+# Fixed seconds of a restart migration of a container (shutdown, start)
+LXC_RESTART_OVERHEAD = 15.0
+
+_SIZE_UNITS = dict(K=1024, M=1024 ** 2, G=1024 ** 3, T=1024 ** 4)
+
+
+def parse_size(value):
+    """Converts a disk size like '32G' into bytes
+
+    :param value: size as used in disk property strings, or bytes
+    :type value: str
+    :rtype: int
+    """
+
+    value = str(value or "0").strip().upper()
+    if (value != "") and (value[-1] in _SIZE_UNITS):
+        return int(float(value[:-1]) * _SIZE_UNITS[value[-1]])
+    try:
+        return int(float(value))
+    except ValueError:
+        return 0
+
+
+def memory_activity(rrddata, samples=10):
+    """Estimates how fast the memory of a guest changes
+
+    :param rrddata: data as returned by /nodes/{node}/{type}/{vmid}/rrddata
+    :type rrddata: list
+    :param samples: number of most recent samples to look at
+    :type samples: int
+    :returns: mean absolute change of used memory in bytes per second
+    :rtype: float
+    """
+
+    points = sorted(
+        [(p['time'], p['mem']) for p in rrddata or [] if p.get('mem', None) is not None],
+    )[-samples:]
+    changed = 0.0
+    for ((t0, m0), (t1, m1)) in zip(points, points[1:]):
+        if t1 > t0:
+            changed += abs(m1 - m0)
+    if len(points) < 2 or points[-1][0] <= points[0][0]:
+        return 0.0
+    return changed / (points[-1][0] - points[0][0])
+
+
+def migration_cost(guest, bandwidth, local_disk=0, activity=0.0):
+    """Estimates the seconds a guest takes to migrate
+
+    Memory of running VMs is copied while the VM keeps changing it, so only
+    the bandwidth left over by the memory activity counts. Running
+    containers are restarted on the target instead.
+
+    :param guest: guest as returned by /cluster/resources
+    :type guest: dict
+    :param bandwidth: bytes per second available to the migration
+    :type bandwidth: float
+    :param local_disk: bytes of local disks to copy
+    :type local_disk: int
+    :param activity: memory activity as returned by memory_activity()
+    :type activity: float
+    :rtype: float
+    """
+
+    bandwidth = float(max(bandwidth, 1))
+    running = guest.get('status', None) == 'running'
+    cost = local_disk / bandwidth
+    if guest.get('type', None) == 'lxc':
+        return cost + (LXC_RESTART_OVERHEAD if running else 0.0)
+    if running:
+        effective = bandwidth - min(activity, 0.8 * bandwidth)
+        cost += int(guest.get('mem', 0) or 0) / effective
+    return cost + QEMU_OVERHEAD
+
+
+def order_jobs(jobs, order='largest_first'):
+    """Sorts migrations by the strategy to start them in
+
+    largest_first starts the most expensive migrations first, which keeps
+    the total time short when migrating in parallel. shortest_first moves
+    the most guests off the node early. ha_first migrates HA managed guests
+    first, largest first, then all others.
+
+    :param jobs: jobs with 'cost' and 'ha' keys
+    :type jobs: list
+    :param order: 'largest_first', 'shortest_first' or 'ha_first'
+    :type order: str
+    :rtype: list
+    """
+
+    if order == 'shortest_first':
+        return sorted(jobs, key=lambda j: (j['cost'], j['vmid']))
+    if order == 'ha_first':
+        return sorted(jobs, key=lambda j: (not j.get('ha', False), -j['cost'], j['vmid']))
+    return sorted(jobs, key=lambda j: (-j['cost'], j['vmid']))
+
+
+def predict_makespan(jobs, max_workers=1, max_per_target=1):
+    """Predicts start and end of migrations run by run_migrations()
+
+    :param jobs: jobs with 'cost' key in the order to start them
+    :type jobs: list
+    :param max_workers: migrations running at most at the same time
+    :type max_workers: int
+    :param max_per_target: migrations to the same node running at most at
+        the same time
+    :type max_per_target: int
+    :returns: tuple: (float: seconds until all migrations are done, list of
+        dict(vmid, target, start, end) in the order of jobs)
+    :rtype: tuple
+    """
+
+    max_workers = max(int(max_workers), 1)
+    max_per_target = max(int(max_per_target), 1)
+    pending = list(range(len(jobs)))
+    running = list()
+    schedule = [None] * len(jobs)
+    now = 0.0
+
+    while len(pending) > 0:
+        for i in list(pending):
+            if len(running) >= max_workers:
+                break
+            if len([k for k in running if jobs[k]['target'] == jobs[i]['target']]) >= max_per_target:
+                continue
+            pending.remove(i)
+            running.append(i)
+            schedule[i] = dict(vmid=jobs[i]['vmid'], target=jobs[i]['target'],
+                               start=now, end=now + jobs[i]['cost'])
+        # advance to the next migration to finish
+        now = min([schedule[k]['end'] for k in running])
+        running = [k for k in running if schedule[k]['end'] > now]
+
+    for s in schedule:
+        s['start'] = round(s['start'], 1)
+        s['end'] = round(s['end'], 1)
+    return max([s['end'] for s in schedule] + [0.0]), schedule
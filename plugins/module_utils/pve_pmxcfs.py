@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import hashlib
+import json
+import os
+import re
+
+
+class PmxcfsReader:
+    """Reads cluster state directly from the Proxmox VE cluster filesystem
+
+    Every method returns None if it cannot answer the question, so callers
+    can fall back to the API.
+    """
+
+    config_paths = dict(qemu='qemu-server', lxc='lxc')
+
+    # options with a numerical value, which are still returned as string by
+    # the API
+    string_options = [
+        'agent', 'args', 'bootdisk', 'cipassword', 'ciuser', 'description',
+        'hostname', 'hotplug', 'lock', 'name', 'nameserver', 'parent',
+        'searchdomain', 'sshkeys', 'tags',
+    ]
+    # same, but only for one type of guest; memory of QEMU VMs is a
+    # property string
+    type_string_options = dict(qemu=['memory'])
+
+    # fields of the status broadcast by pvestatd as pve2.3-vm/<vmid>, the
+    # same /cluster/resources is built from
+    rrd_vm_fields = [
+        ('uptime', int), ('name', str), ('status', str), ('template', int),
+        ('ctime', int), ('maxcpu', int), ('cpu', float), ('maxmem', int),
+        ('mem', int), ('maxdisk', int), ('disk', int), ('netin', int),
+        ('netout', int), ('diskread', int), ('diskwrite', int),
+    ]
+
+    _re_option = re.compile(r'^([a-z][a-z0-9_\-]*(?:\.[a-z0-9_\-\.]+)?):\s*(.*?)\s*$')
+    _re_int = re.compile(r'^-?\d+$')
+    _re_float = re.compile(r'^-?\d+\.\d+$')
+    _re_encoded = re.compile(r'%([0-9a-fA-F]{2})')
+
+    def __init__(self, root='/etc/pve'):
+        """
+        :param root: mount point of pmxcfs
+        :type root: str
+        """
+
+        self.root = root
+
+    def available(self):
+        """Return true if pmxcfs is mounted at root
+
+        :rtype: bool
+        """
+
+        return os.path.isfile(os.path.join(self.root, '.vmlist')) and \
+            os.path.isfile(os.path.join(self.root, '.members'))
+
+    def _read_json(self, name):
+        try:
+            with open(os.path.join(self.root, name), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def members(self):
+        """Return content of .members
+
+        :rtype: dict
+        """
+
+        return self._read_json('.members')
+
+    def local_node(self):
+        """Return name of the node pmxcfs is mounted on
+
+        :rtype: str
+        """
+
+        members = self.members()
+        if members is None:
+            return None
+        return members.get('nodename', None)
+
+    def nodes(self):
+        """Return names of all nodes in the cluster
+
+        :rtype: list
+        """
+
+        members = self.members()
+        if members is None:
+            return None
+        nodelist = members.get('nodelist', None)
+        if nodelist is None:
+            if members.get('nodename', None) is None:
+                return None
+            return [members['nodename']]
+        return sorted(nodelist.keys())
+
+    def vmlist(self):
+        """Return all guests in the cluster
+
+        :returns: VMID (int) -> dict(vmid, node, type)
+        :rtype: dict
+        """
+
+        vmlist = self._read_json('.vmlist')
+        if (vmlist is None) or ('ids' not in vmlist):
+            return None
+        ret = dict()
+        for (vmid, e) in vmlist['ids'].items():
+            ret[int(vmid)] = dict(vmid=int(vmid), node=e['node'], type=e['type'])
+        return ret
+
+    def vm_ref(self, vmid):
+        """Return node and type of a guest
+
+        :param vmid: VMID of guest
+        :type vmid: int
+        :returns: dict(vmid, node, type)
+        :rtype: dict
+        """
+
+        vmlist = self.vmlist()
+        if vmlist is None:
+            return None
+        return vmlist.get(int(vmid), None)
+
+    def rrd_dump(self):
+        """Return the status data last broadcast by every node
+
+        Parsed from .rrd like PVE::Cluster::rrd_dump() does.
+
+        :returns: key (e.g. "pve2.3-vm/100") -> list of values, None for
+            unknown ones
+        :rtype: dict
+        """
+
+        try:
+            with open(os.path.join(self.root, '.rrd'), 'r') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        ret = dict()
+        for line in raw.split('\n'):
+            e = line.split(':')
+            if (e[0] == "") or (len(e) < 3):
+                continue
+            ret[e[0]] = [None if v == 'U' else v for v in e[1:]]
+        return ret
+
+    def pools(self):
+        """Return the pool of every guest in a pool
+
+        :returns: VMID (int) -> name of pool
+        :rtype: dict
+        """
+
+        try:
+            with open(os.path.join(self.root, 'user.cfg'), 'r') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        ret = dict()
+        for line in raw.split('\n'):
+            e = line.strip().split(':')
+            if (e[0] != 'pool') or (len(e) < 4):
+                continue
+            for vmid in e[3].split(','):
+                if vmid.strip() != "":
+                    ret[int(vmid)] = e[1]
+        return ret
+
+    def ha_sids(self):
+        """Return IDs of all HA managed services
+
+        :returns: e.g. ["vm:100", "ct:102"]; empty if HA is not configured
+        :rtype: list
+        """
+
+        try:
+            with open(os.path.join(self.root, 'ha', 'resources.cfg'), 'r') as f:
+                raw = f.read()
+        except OSError:
+            if os.path.isdir(self.root):
+                return list()
+            return None
+        ret = list()
+        for line in raw.split('\n'):
+            m = re.match(r'^(vm|ct):\s*(\d+)\s*$', line)
+            if m is not None:
+                ret.append("%s:%s" % m.groups())
+        return ret
+
+    def vm_resource(self, vmid):
+        """Return a guest as /cluster/resources does
+
+        Guests managed by HA are not answered, their state is only known to
+        the CRM; neither are guests no status was broadcast for yet.
+
+        :param vmid: VMID of guest
+        :type vmid: int
+        :returns: dict(id, type, vmid, node, name, status, uptime, maxcpu,
+            cpu, maxmem, mem, maxdisk, disk, ...) or None
+        :rtype: dict
+        """
+
+        ref = self.vm_ref(vmid)
+        if ref is None:
+            return None
+        sids = self.ha_sids()
+        if (sids is None) or \
+                ("%s:%d" % ('ct' if ref['type'] == 'lxc' else 'vm', ref['vmid']) in sids):
+            return None
+        rrd = self.rrd_dump()
+        pools = self.pools()
+        config = self.vm_config(ref['node'], ref['type'], ref['vmid'])
+        if (rrd is None) or (pools is None) or (config is None):
+            return None
+        data = rrd.get("pve2.3-vm/%d" % ref['vmid'], None)
+        if data is None:
+            return None
+
+        ret = dict(ref, id="%s/%d" % (ref['type'], ref['vmid']))
+        for ((k, conv), v) in zip(self.rrd_vm_fields, data):
+            if k == 'ctime':
+                continue
+            if conv is str:
+                ret[k] = v
+            else:
+                try:
+                    ret[k] = conv(v or 0)
+                except ValueError:
+                    ret[k] = conv(float(v))
+        if not ret.get('template', 0):
+            ret.pop('template', None)
+        if ref['vmid'] in pools:
+            ret['pool'] = pools[ref['vmid']]
+        for k in ['lock', 'tags']:
+            if k in config:
+                ret[k] = config[k]
+        return ret
+
+    def _decode_text(self, text):
+        return self._re_encoded.sub(lambda m: chr(int(m.group(1), 16)), text)
+
+    def _option_value(self, key, value, vm_type=None):
+        if (key in self.string_options) or (key in self.type_string_options.get(vm_type, [])):
+            return value
+        if self._re_int.match(value):
+            return int(value)
+        if self._re_float.match(value):
+            return float(value)
+        return value
+
+    def parse_config(self, raw, vm_type=None):
+        """Parse guest config file the way the API returns it
+
+        Snapshots and pending changes are ignored.
+
+        :param raw: content of the config file
+        :type raw: bytes
+        :param vm_type: 'qemu' or 'lxc'
+        :type vm_type: str
+        :rtype: dict
+        """
+
+        config = dict()
+        description = list()
+        raw_lxc = list()
+        for line in raw.decode('utf8').split('\n'):
+            if line.startswith('['):
+                break
+            if line.startswith('#'):
+                description.append(self._decode_text(line[1:]))
+                continue
+            m = self._re_option.match(line)
+            if m is None:
+                continue
+            (k, v) = m.groups()
+            if k.startswith('lxc.'):
+                raw_lxc.append([k, v])
+            else:
+                config[k] = self._option_value(k, v, vm_type=vm_type)
+        if len(description) > 0:
+            config['description'] = "\n".join(description)
+        if len(raw_lxc) > 0:
+            config['lxc'] = raw_lxc
+        config['digest'] = hashlib.sha1(raw).hexdigest()
+        return config
+
+    def vm_config(self, node, vm_type, vmid):
+        """Return current config of a guest
+
+        :param node: node the guest is on
+        :type node: str
+        :param vm_type: 'qemu' or 'lxc'
+        :type vm_type: str
+        :param vmid: VMID of guest
+        :type vmid: int
+        :rtype: dict
+        """
+
+        if vm_type not in self.config_paths:
+            return None
+        path = os.path.join(
+            self.root, 'nodes', node, self.config_paths[vm_type], "%s.conf" % vmid
+        )
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        return self.parse_config(raw, vm_type=vm_type)
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Parser and serializer for Proxmox VE property strings
+
+Property strings are config values like
+``virtio=BC:24:11:00:00:01,bridge=vmbr0,firewall=1``. They are parsed into
+dicts according to the class of their key, and serialized back into the
+canonical form Proxmox VE writes itself, so parse and format round-trip.
+"""
+
+from ansible_collections.inett.pve.plugins.module_utils.pve_resources import split_tags
+
+
+NIC_MODELS = (
+    "e1000", "e1000-82540em", "e1000-82544gc", "e1000-82545em",
+    "e1000e", "i82551", "i82557b", "i82559er", "ne2k_isa", "ne2k_pci",
+    "pcnet", "rtl8139", "virtio", "vmxnet3",
+)
+
+DISK_KEYS = tuple(
+    ["ide%d" % x for x in range(4)]
+    + ["sata%d" % x for x in range(6)]
+    + ["scsi%d" % x for x in range(31)]
+    + ["virtio%d" % x for x in range(16)]
+    + ["efidisk0", "tpmstate0"]
+)
+
+NET_KEYS = tuple(["net%d" % x for x in range(32)])
+
+# Options with a value which is never a property string
+PLAIN_KEYS = (
+    'args', 'bootdisk', 'cipassword', 'ciuser', 'description', 'digest',
+    'hookscript', 'hostname', 'lock', 'lxc', 'name', 'nameserver', 'parent',
+    'searchdomain', 'sshkeys', 'vmgenid',
+)
+
+# Options with a comma separated list of plain values
+LIST_KEYS = ('hotplug',)
+
+_TRUE = frozenset(['1', 'on', 'yes', 'true'])
+
+# class -> default key (value of a leading element without '='), aliases of
+# keys, keys with boolean values, keys with ';' separated lists (-> type)
+_CLASS_SPECS = dict(
+    disk=dict(default='volume', aliases=dict(file='volume'), bools=(), lists=dict()),
+    net=dict(default=None, aliases=dict(), bools=('firewall', 'link_down'), lists=dict(trunks=int)),
+    ipconfig=dict(default=None, aliases=dict(), bools=(), lists=dict()),
+    agent=dict(default='enabled', aliases=dict(),
+               bools=('enabled', 'fstrim_cloned_disks', 'freeze-fs-on-backup'), lists=dict()),
+    boot=dict(default='legacy', aliases=dict(), bools=(), lists=dict(order=str)),
+    property=dict(default=None, aliases=dict(), bools=(), lists=dict()),
+)
+
+# Default keys of other options with property string values
+_DEFAULT_KEYS = dict(cpu='cputype', vga='type', watchdog='model', rng0='source', audio0='device')
+_DEFAULT_KEYS.update([("hostpci%d" % x, 'host') for x in range(16)])
+_DEFAULT_KEYS.update([("usb%d" % x, 'host') for x in range(5)])
+
+
+def _build_key_classes():
+    ret = dict()
+    for k in DISK_KEYS:
+        ret[k] = 'disk'
+    for x in range(256):
+        ret["mp%d" % x] = 'disk'
+        ret["unused%d" % x] = 'plain'
+    for k in NET_KEYS:
+        ret[k] = 'net'
+    for x in range(32):
+        ret["ipconfig%d" % x] = 'ipconfig'
+    for k in PLAIN_KEYS:
+        ret[k] = 'plain'
+    for k in LIST_KEYS:
+        ret[k] = 'list'
+    ret.update(rootfs='disk', agent='agent', boot='boot', tags='tags')
+    return ret
+
+
+# config key -> class of its value; keys not listed are generic property
+# strings
+KEY_CLASSES = _build_key_classes()
+
+
+def key_class(key):
+    """Returns the class of a config key
+
+    :param key: config key, e.g. 'scsi0'
+    :type key: str
+    :returns: 'disk', 'net', 'ipconfig', 'agent', 'boot', 'tags', 'list',
+        'plain' or 'property'
+    :rtype: str
+    """
+
+    return KEY_CLASSES.get(key, 'property')
+
+
+def _split(value):
+    """Splits a property string at commas outside of double quotes"""
+
+    if '"' not in value:
+        return value.split(',')
+
+    ret = list()
+    cur = list()
+    quoted = False
+    escaped = False
+    for c in value:
+        if escaped:
+            cur.append(c)
+            escaped = False
+        elif quoted and (c == '\\'):
+            escaped = True
+        elif c == '"':
+            quoted = not quoted
+        elif (c == ',') and not quoted:
+            ret.append(''.join(cur))
+            cur = list()
+        else:
+            cur.append(c)
+    ret.append(''.join(cur))
+    return ret
+
+
+def _quote(value):
+    if (',' in value) or ('"' in value):
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return value
+
+
+def _convert(spec, k, v):
+    if k in spec['bools']:
+        return v.lower() in _TRUE
+    conv = spec['lists'].get(k, None)
+    if conv is not None:
+        ret = list()
+        for e in v.split(';'):
+            if e == "":
+                continue
+            try:
+                ret.append(conv(e))
+            except ValueError:
+                ret.append(e)
+        return ret
+    return v
+
+
+def _format_scalar(v, sep=';'):
+    if isinstance(v, bool):
+        return str(int(v))
+    if isinstance(v, list):
+        return sep.join([_format_scalar(e) for e in v])
+    return str(v)
+
+
+def parse_value(key, value):
+    """Parses a single config value according to the class of its key
+
+    Values which are no strings and plain values are returned unchanged.
+    Values of keys without default key which have no '=' are split into a
+    list at commas if they contain any (e.g. hotplug), other ones are
+    returned unchanged. Elements without '=' which are not the default key
+    are stored with value None.
+
+    :param key: config key, e.g. 'net0'
+    :type key: str
+    :param value: value as returned by the API
+    :rtype: dict or list or str
+    """
+
+    if not isinstance(value, str):
+        return value
+    cls = KEY_CLASSES.get(key, 'property')
+    if cls == 'plain':
+        return value
+    if cls == 'tags':
+        return split_tags(value)
+    if cls == 'list':
+        return [e for e in value.split(',') if e != ""]
+
+    spec = _CLASS_SPECS[cls]
+    default = spec['default']
+    if cls == 'property':
+        default = _DEFAULT_KEYS.get(key, None)
+        if (default is None) and ('=' not in value):
+            if ',' in value:
+                return [e for e in _split(value) if e != ""]
+            return value
+
+    ret = dict()
+    first = True
+    for e in _split(value):
+        if e == "":
+            continue
+        (k, sep, v) = e.partition('=')
+        if (cls == 'net') and (k in NIC_MODELS):
+            ret['model'] = k
+            if v != "":
+                ret['macaddr'] = v
+        elif not sep:
+            if first and (default is not None):
+                ret[default] = _convert(spec, default, k)
+            else:
+                ret[k] = None
+        else:
+            k = spec['aliases'].get(k, k)
+            ret[k] = _convert(spec, k, v)
+        first = False
+    return ret
+
+
+def format_value(key, value):
+    """Serializes a config value in canonical form
+
+    Inverse of parse_value(). Accepts the aliases of keys, e.g. 'file' for
+    the volume of a disk. Lists are joined with ',', tags and lists within
+    property strings (e.g. trunks of a NIC) with ';'.
+
+    :param key: config key, e.g. 'net0'
+    :type key: str
+    :param value: parsed value
+    :rtype: str
+    """
+
+    cls = KEY_CLASSES.get(key, 'property')
+    if not isinstance(value, dict):
+        return _format_scalar(value, sep=';' if cls == 'tags' else ',')
+
+    spec = _CLASS_SPECS.get(cls, _CLASS_SPECS['property'])
+    default = spec['default'] if cls != 'property' else _DEFAULT_KEYS.get(key, None)
+
+    parts = list()
+    skip = set()
+    if (cls == 'net') and (value.get('model', None) is not None):
+        if value.get('macaddr', None) is not None:
+            parts.append("%s=%s" % (value['model'], value['macaddr']))
+        else:
+            parts.append(value['model'])
+        skip.update(['model', 'macaddr'])
+    if default is not None:
+        for k in [default] + [a for (a, d) in spec['aliases'].items() if d == default]:
+            if value.get(k, None) is not None:
+                parts.append(_quote(_format_scalar(value[k])))
+                skip.update([default] + list(spec['aliases'].keys()))
+                break
+    for (k, v) in value.items():
+        if k in skip:
+            continue
+        if v is None:
+            parts.append(k)
+        else:
+            parts.append("%s=%s" % (k, _quote(_format_scalar(v))))
+    return ','.join(parts)
+
+
+def parse_config(config):
+    """Parses all values of a guest config
+
+    :param config: config as returned by the API
+    :type config: dict
+    :rtype: dict
+    """
+
+    return dict([(k, parse_value(k, v)) for (k, v) in config.items()])
+
+
+def format_config(config):
+    """Serializes all values of a parsed guest config in canonical form
+
+    :param config: parsed config
+    :type config: dict
+    :rtype: dict
+    """
+
+    return dict([(k, format_value(k, v)) for (k, v) in config.items()])
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+def split_tags(tags):
+    """Splits a Proxmox VE tag string
+
+    :param tags: tags as returned by the API (e.g. "a;b")
+    :type tags: str
+    :rtype: list
+    """
+
+    if tags is None:
+        return list()
+    if isinstance(tags, list):
+        return tags
+    return [t for t in str(tags).replace(',', ';').replace(' ', ';').split(';') if t != ""]
+
+
+class PveResourceIndex:
+    """Index of all guests in a cluster as returned by /cluster/resources
+
+    Guests are indexed by vmid, node, type, pool and tag, so lookups do not
+    need any further API call.
+    """
+
+    def __init__(self, resources=None):
+        """
+        :param resources: list of resources as returned by /cluster/resources
+        :type resources: list
+        """
+
+        self.by_vmid = dict()
+        self.by_node = dict()
+        self.by_type = dict()
+        self.by_pool = dict()
+        self.by_tag = dict()
+        for r in resources or list():
+            if r.get('type', None) in ['qemu', 'lxc']:
+                self.add(r)
+
+    def add(self, vm):
+        """Adds a guest to the index
+
+        :param vm: guest as returned by /cluster/resources
+        :type vm: dict
+        """
+
+        vm['vmid'] = int(vm['vmid'])
+        self.by_vmid[vm['vmid']] = vm
+        self.by_node.setdefault(vm.get('node', None), list()).append(vm)
+        self.by_type.setdefault(vm['type'], list()).append(vm)
+        if vm.get('pool', None) is not None:
+            self.by_pool.setdefault(vm['pool'], list()).append(vm)
+        for t in split_tags(vm.get('tags', None)):
+            self.by_tag.setdefault(t, list()).append(vm)
+
+    def get(self, vmid):
+        """Returns guest with given VMID
+
+        :param vmid: VMID of guest
+        :type vmid: int
+        :returns: guest or None if there is no such guest
+        :rtype: dict
+        """
+
+        return self.by_vmid.get(int(vmid), None)
+
+    def vms(self, node=None, vm_type=None, pool=None, tag=None):
+        """Returns guests matching all given criteria
+
+        :param node: name of node
+        :type node: str
+        :param vm_type: 'qemu' or 'lxc'
+        :type vm_type: str
+        :param pool: name of resource pool
+        :type pool: str
+        :param tag: tag assigned to the guest
+        :type tag: str
+        :rtype: list
+        """
+
+        candidates = None
+        for (index, key) in [
+            (self.by_node, node), (self.by_type, vm_type),
+            (self.by_pool, pool), (self.by_tag, tag),
+        ]:
+            if key is None:
+                continue
+            found = index.get(key, list())
+            if (candidates is None) or (len(found) < len(candidates)):
+                candidates = found
+        if candidates is None:
+            candidates = list(self.by_vmid.values())
+
+        ret = list()
+        for vm in candidates:
+            if (node is not None) and (vm.get('node', None) != node):
+                continue
+            if (vm_type is not None) and (vm['type'] != vm_type):
+                continue
+            if (pool is not None) and (vm.get('pool', None) != pool):
+                continue
+            if (tag is not None) and (tag not in split_tags(vm.get('tags', None))):
+                continue
+            ret.append(vm)
+        return sorted(ret, key=lambda v: v['vmid'])
+
+    def vmids(self, node=None):
+        """Returns VMIDs of guests on given node or the whole cluster
+
+        :param node: name of node
+        :type node: str
+        :rtype: set
+        """
+
+        if node is None:
+            return set(self.by_vmid.keys())
+        return set([vm['vmid'] for vm in self.by_node.get(node, list())])
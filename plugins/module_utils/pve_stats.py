@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import threading
+
+
+# path element -> placeholder for the following path element
+_placeholders = {
+    'nodes': '{node}',
+    'storage': '{storage}',
+    'groups': '{group}',
+    'pools': '{pool}',
+    'services': '{service}',
+    'snapshot': '{snapname}',
+}
+
+
+def url_template(url):
+    """Replaces node names, VMIDs, UPIDs etc. in an API path by placeholders
+
+    :param url: path according to Proxmox VE API
+    :type url: str
+    :returns: e.g. /nodes/{node}/qemu/{vmid}/config
+    :rtype: str
+    """
+
+    ret = list()
+    prev = None
+    for e in [e for e in url.split('/') if e != ""]:
+        if prev in _placeholders:
+            ret.append(_placeholders[prev])
+        elif e.startswith('UPID:'):
+            ret.append('{upid}')
+        elif e.isdigit():
+            ret.append('{vmid}')
+        elif (prev == 'resources') and (':' in e):
+            ret.append('{sid}')
+        else:
+            ret.append(e)
+        prev = e
+    return '/' + '/'.join(ret)
+
+
+def _percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+
+    if len(values) == 0:
+        return None
+    rank = max(int(-(-p * len(values) // 100)), 1)
+    return round(values[rank - 1], 6)
+
+
+class ApiCallStats:
+    """Records timing of API calls and aggregates them per endpoint"""
+
+    def __init__(self):
+        self.calls = list()
+        self._lock = threading.Lock()
+
+    def record(self, method, url, rc, nbytes, elapsed, cached=False):
+        """Records a single API call
+
+        :param method: 'get', 'create', 'set' or 'delete'
+        :type method: str
+        :param url: path according to Proxmox VE API
+        :type url: str
+        :param rc: return code of the call
+        :type rc: int
+        :param nbytes: length of stdout
+        :type nbytes: int
+        :param elapsed: seconds the call took
+        :type elapsed: float
+        :param cached: whether the response came from the cache
+        :type cached: bool
+        """
+
+        with self._lock:
+            self.calls.append(dict(
+                method=method, url=url_template(url), rc=rc,
+                bytes=nbytes, elapsed=elapsed, cached=cached,
+            ))
+
+    def summary(self):
+        """Returns counts, total, p50 and p95 per endpoint
+
+        :rtype: dict
+        """
+
+        with self._lock:
+            calls = list(self.calls)
+
+        endpoints = dict()
+        for c in calls:
+            e = endpoints.setdefault("%s %s" % (c['method'], c['url']), dict(
+                count=0, cached=0, errors=0, bytes=0, times=list(),
+            ))
+            e['count'] += 1
+            if c['cached']:
+                e['cached'] += 1
+                continue
+            if c['rc'] != 0:
+                e['errors'] += 1
+            e['bytes'] += c['bytes']
+            e['times'].append(c['elapsed'])
+
+        for e in endpoints.values():
+            times = sorted(e.pop('times'))
+            e['total'] = round(sum(times), 6)
+            e['p50'] = _percentile(times, 50)
+            e['p95'] = _percentile(times, 95)
+            e['max'] = round(times[-1], 6) if len(times) > 0 else None
+
+        return dict(
+            calls=len(calls),
+            cached=len([c for c in calls if c['cached']]),
+            total=round(sum([c['elapsed'] for c in calls if not c['cached']]), 6),
+            endpoints=endpoints,
+        )
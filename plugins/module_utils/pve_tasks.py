@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import re
+
+from ansible_collections.inett.pve.plugins.module_utils.pve_wait import Backoff, wait_for
+
+
+_re_upid = re.compile(
+    r'^UPID:([a-zA-Z0-9](?:[a-zA-Z0-9\-]*[a-zA-Z0-9])?):([0-9A-Fa-f]{8}):([0-9A-Fa-f]{8,9}):'
+    r'([0-9A-Fa-f]{8}):([^:\s]+):([^:\s]*):([^:\s]+):$'
+)
+
+
+def parse_upid(upid):
+    """Splits a task ID (UPID) into its parts
+
+    :param upid: e.g. UPID:pve01:0000A1B2:0012C3D4:65A1B2C3:qmigrate:100:root@pam:
+    :type upid: str
+    :returns: dict(upid, node, pid, pstart, starttime, type, id, user) or
+        None if upid is no UPID
+    :rtype: dict
+    """
+
+    if not isinstance(upid, str):
+        return None
+    m = _re_upid.match(upid.strip())
+    if m is None:
+        return None
+    return dict(
+        upid=upid.strip(),
+        node=m.group(1),
+        pid=int(m.group(2), 16),
+        pstart=int(m.group(3), 16),
+        starttime=int(m.group(4), 16),
+        type=m.group(5),
+        id=m.group(6),
+        user=m.group(7),
+    )
+
+
+def task_succeeded(exitstatus):
+    """Returns true if a task ended with OK or with warnings only
+
+    :param exitstatus: exitstatus as returned by /nodes/{node}/tasks/{upid}/status
+    :type exitstatus: str
+    :rtype: bool
+    """
+
+    if exitstatus is None:
+        return False
+    return (exitstatus == "OK") or exitstatus.startswith("WARNINGS")
+
+
+def wait_for_task(query, upid, timeout=None, backoff=None, log_lines=20):
+    """Polls the status of a task until it stopped
+
+    Failing status requests are retried until the timeout, since the node
+    running the task may be busy (e.g. pveproxy restarting).
+
+    :param query: function(url, params) returning a tuple (int: rc, object)
+        for GET requests against the API
+    :type query: callable
+    :param upid: ID of task
+    :type upid: str
+    :param timeout: seconds to wait at most; None waits forever
+    :type timeout: float
+    :param backoff: delays between status requests. Defaults to 0.5s up to 5s
+    :type backoff: Backoff
+    :param log_lines: number of lines to return from the end of the task log
+    :type log_lines: int
+    :returns: dict(upid, node, type, id, user, status, exitstatus, ok,
+        timed_out, elapsed, log)
+    :rtype: dict
+    """
+
+    task = parse_upid(upid)
+    if task is None:
+        return dict(upid=upid, status=None, exitstatus=None, ok=False,
+                    timed_out=False, elapsed=0.0, log=list(),
+                    error="invalid UPID")
+    url = "/nodes/%s/tasks/%s" % (task['node'], task['upid'])
+
+    def _check():
+        rc, obj = query(url + "/status", dict())
+        if (rc != 0) or not isinstance(obj, dict):
+            return False, None
+        return obj.get('status', None) == 'stopped', obj
+
+    if backoff is None:
+        backoff = Backoff(initial=0.5, maximum=5.0)
+    (done, status, elapsed) = wait_for(_check, timeout=timeout, backoff=backoff)
+
+    task['status'] = 'stopped' if done else 'running'
+    task['exitstatus'] = status.get('exitstatus', None) if done else None
+    task['ok'] = done and task_succeeded(task['exitstatus'])
+    task['timed_out'] = not done
+    task['elapsed'] = round(elapsed, 3)
+    task['log'] = list()
+    if log_lines > 0:
+        rc, obj = query(url + "/log", dict(start=0, limit=100000))
+        if (rc == 0) and isinstance(obj, list):
+            task['log'] = [e.get('t', "") for e in obj[-log_lines:]]
+    return task
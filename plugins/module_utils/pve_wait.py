@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import time
+
+
+class Backoff:
+    """Delays growing exponentially from initial up to maximum"""
+
+    def __init__(self, initial=0.5, maximum=5.0, factor=2.0):
+        """
+        :param initial: first delay in seconds
+        :type initial: float
+        :param maximum: upper bound of delays in seconds
+        :type maximum: float
+        :param factor: factor the delay grows by after every call of next()
+        :type factor: float
+        """
+
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.delay = initial
+
+    def reset(self):
+        """Starts over with the initial delay, e.g. after progress was seen"""
+
+        self.delay = self.initial
+
+    def next(self):
+        """Returns the current delay and grows it for the next call
+
+        :rtype: float
+        """
+
+        ret = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return ret
+
+
+def wait_for(check, timeout=None, backoff=None):
+    """Calls check until it reports to be done or the timeout is reached
+
+    :param check: function returning a tuple (bool: done, value)
+    :type check: callable
+    :param timeout: seconds to wait at most; None waits forever
+    :type timeout: float
+    :param backoff: delays between calls. Defaults to Backoff()
+    :type backoff: Backoff
+    :returns: tuple: (bool: done, value of last check, float: seconds waited)
+    :rtype: tuple
+    """
+
+    if backoff is None:
+        backoff = Backoff()
+    start = time.monotonic()
+    while True:
+        (done, value) = check()
+        elapsed = time.monotonic() - start
+        if done:
+            return True, value, elapsed
+        delay = backoff.next()
+        if timeout is not None:
+            if elapsed >= timeout:
+                return False, value, elapsed
+            delay = min(delay, timeout - elapsed)
+        time.sleep(delay)
@@ -19,48 +19,58 @@ version_added: "2.9"
 
 description:
     - "Sets global ceph flags"
+    - "Only flags given are changed, only flags differing from their current
+      state are sent"
+    - "With hosts or osds, noup, nodown, noin and noout are set for these
+      CRUSH hosts or OSDs only (ceph osd set-group), so the rest of the
+      cluster keeps recovering normally; this needs the ceph CLI"
 
 options:
     nobackfill:
         required: false
         type: bool
-        default: false
     nodeep-scrub:
         required: false
         type: bool
-        default: false
     nodown:
         required: false
         type: bool
-        default: false
+    noin:
+        required: false
+        type: bool
     noout:
         required: false
         type: bool
-        default: false
     norebalance:
         required: false
         type: bool
-        default: false
     norecover:
         required: false
         type: bool
-        default: false
     noscrub:
         required: false
         type: bool
-        default: false
     notieragent:
         required: false
         type: bool
-        default: false
     noup:
         required: false
         type: bool
-        default: false
     pause:
         required: false
         type: bool
-        default: false
+    hosts:
+        description:
+            - CRUSH hosts to set noup, nodown, noin and noout for instead of
+              the whole cluster
+        required: false
+        type: list
+    osds:
+        description:
+            - IDs of OSDs to set noup, nodown, noin and noout for instead of
+              the whole cluster
+        required: false
+        type: list
 
 author:
     - Maximilian Hill <mhill@inett.de>
@@ -73,64 +83,156 @@ EXAMPLES = r'''
     noin: true
     nodown: true
     noup: true
+
+- name: Keep the OSDs of this node in while it reboots
+  inett.pve.ceph_flags:
+    noout: true
+    hosts:
+      - "{{ inventory_hostname }}"
 '''
 
 RETURN = r'''
 changed:
     description: Returns true if the module execution changed anything
     type: boolean
+message:
+    description: Flags (key) changed and their new state (value); per host or OSD if scoped
+    type: dict
+    returned: always
+original_message:
+    description: Flags (key) changed and their previous state (value); per host or OSD if scoped
+    type: dict
+    returned: always
 '''
 
 
+import json
+
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
 
 
+FLAGS = [
+    'nobackfill', 'nodeep-scrub', 'nodown', 'noin', 'noout', 'norebalance', 'norecover',
+    'noscrub', 'notieragent', 'noup', 'pause'
+]
+
+# Flags ceph osd set-group supports
+GROUP_FLAGS = ['noup', 'nodown', 'noin', 'noout']
+
+
 def _filter_params(module, data, param_list):
     for k in param_list:
         if module.params[k] is not None:
-         data[k] = bool(int(module.params[k]))
+            data[k] = bool(int(module.params[k]))
+
+
+def _cluster_flags(mod, wanted):
+    """Sets cluster wide flags differing from their current state
+
+    :returns: tuple: (dict: changed flags, dict: their previous state)
+    """
+
+    _rc, _out, _err, obj = mod.query_json(
+        "get", "/cluster/ceph/flags", cache=False, fail="Failed to get Ceph flags"
+    )
+    current = dict([(f['name'], bool(int(f.get('value', 0) or 0))) for f in obj])
+    update = dict([(k, v) for (k, v) in wanted.items() if current.get(k, False) != v])
+
+    if (len(update) > 0) and not mod.check_mode:
+        # all changes with a single request; it runs as a task, the flags
+        # are only set once it stopped
+        mod.query_task("set", "/cluster/ceph/flags", params=update, fail="Failed to set Ceph flags")
+    return update, dict([(k, current.get(k, False)) for k in update])
+
+
+def _ceph(mod, args):
+    cmd = ['ceph'] + args
+    rc, out, err = mod.run_command(cmd)
+    if rc != 0:
+        mod.fail_json(msg="ceph %s failed" % ' '.join(args[:2]), rc=rc, stdout=out, stderr=err, cmd=cmd)
+    return out
+
+
+def _group_flags(mod, wanted, hosts, osds):
+    """Sets flags of CRUSH hosts and OSDs differing from their current state
+
+    :returns: tuple: (dict: who -> changed flags, dict: who -> their previous state)
+    """
+
+    dump = json.loads(_ceph(mod, ['osd', 'dump', '--format', 'json']))
+    current = dict()
+    for h in hosts:
+        current[h] = set(dump.get('crush_node_flags', dict()).get(h, []))
+    osd_state = dict([("osd.%s" % o['osd'], set(o.get('state', []))) for o in dump.get('osds', [])])
+    for o in osds:
+        who = "osd.%s" % o
+        if who not in osd_state:
+            mod.fail_json(msg="no such OSD %s" % who)
+        current[who] = osd_state[who]
+
+    update = dict()
+    original = dict()
+    # flag, state -> targets
+    commands = dict()
+    for (who, flags) in current.items():
+        for (k, v) in wanted.items():
+            if (k in flags) != v:
+                update.setdefault(who, dict())[k] = v
+                original.setdefault(who, dict())[k] = not v
+                commands.setdefault((k, v), list()).append(who)
+
+    if not mod.check_mode:
+        for ((k, v), targets) in sorted(commands.items()):
+            _ceph(mod, ['osd', 'set-group' if v else 'unset-group', k] + sorted(targets))
+    return update, original
 
 
 def run_module():
     module_args = dict(
         # Ceph Flags
-        nobackfill=dict(type='bool', required=False, default=False),
-        nodeep_scrub=dict(type='bool', required=False, default=False),
-        nodown=dict(type='bool', required=False, default=False),
-        noin=dict(type='bool', required=False, default=False),
-        noout=dict(type='bool', required=False, default=False),
-        norebalance=dict(type='bool', required=False, default=False),
-        norecover=dict(type='bool', required=False, default=False),
-        noscrub=dict(type='bool', required=False, default=False),
-        notieragent=dict(type='bool', required=False, default=False),
-        noup=dict(type='bool', required=False, default=False),
-        pause=dict(type='bool', required=False, default=False)
-    )
-
-    result = dict(
-        changed=True,
+        nobackfill=dict(type='bool', required=False, default=None),
+        nodeep_scrub=dict(type='bool', required=False, default=None),
+        nodown=dict(type='bool', required=False, default=None),
+        noin=dict(type='bool', required=False, default=None),
+        noout=dict(type='bool', required=False, default=None),
+        norebalance=dict(type='bool', required=False, default=None),
+        norecover=dict(type='bool', required=False, default=None),
+        noscrub=dict(type='bool', required=False, default=None),
+        notieragent=dict(type='bool', required=False, default=None),
+        noup=dict(type='bool', required=False, default=None),
+        pause=dict(type='bool', required=False, default=None),
+        # Scope
+        hosts=dict(type='list', required=False, default=None, elements='str'),
+        osds=dict(type='list', required=False, default=None, elements='int'),
     )
 
     mod = PveApiModule(
         argument_spec=module_args,
-        supports_check_mode=False
+        supports_check_mode=True
     )
 
     mod.params['nodeep-scrub'] = mod.params['nodeep_scrub']
 
     data = {}
-    _filter_params(mod, data, [
-        'nobackfill', 'nodeep-scrub', 'nodown', 'noin', 'noout', 'norebalance', 'norecover',
-        'noscrub', 'notieragent', 'noup', 'pause'
-    ])
-
-    rc, _out, _err = mod.query_api("set", "/cluster/ceph/flags", params=data)
-
-    if rc == 0:
-        mod.exit_json(**result)
-        return
-
-    mod.fail_json(msg="Failed to query API")
+    _filter_params(mod, data, FLAGS)
+
+    hosts = mod.params['hosts'] or []
+    osds = mod.params['osds'] or []
+    if (len(hosts) > 0) or (len(osds) > 0):
+        unsupported = [k for k in data if k not in GROUP_FLAGS]
+        if len(unsupported) > 0:
+            mod.fail_json(msg="flags %s can't be set for hosts or OSDs, only %s" % (
+                ', '.join(unsupported), ', '.join(GROUP_FLAGS)
+            ))
+        update, original = _group_flags(mod, data, hosts, osds)
+    else:
+        update, original = _cluster_flags(mod, data)
+
+    mod.exit_json(
+        changed=(len(update) > 0),
+        message=update,
+        original_message=original,
+    )
 
 
 def main():
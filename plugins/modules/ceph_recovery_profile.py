@@ -0,0 +1,283 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2026, inett GmbH <mhill@inett.de>
+# GNU General Public License v3.0+
+# (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+ANSIBLE_METADATA = {
+    'metadata_version': '0.1',
+    'status': ['preview'],
+    'supported_by': 'Maximilian Hill'
+}
+
+DOCUMENTATION = '''
+---
+module: ceph_recovery_profile
+short_description: Temporarily speeds up Ceph recovery and backfill
+version_added: "2.9"
+
+description:
+    - "Applies a named set of OSD recovery options to the Ceph config
+      database and restores the previous values afterwards"
+    - "The previous values are recorded in the config-key store of the
+      monitors before anything is changed, so they can be restored even if
+      the play applying the profile got interrupted"
+    - "If setting an option fails, the options already set and the record
+      are rolled back"
+    - "Options of the profile the running Ceph release does not know (e.g.
+      osd_mclock_override_recovery_settings before Reef) are skipped"
+    - "Has to be run on a node with the ceph CLI and admin keyring"
+
+options:
+    state:
+        description:
+            - present applies the profile, absent restores the recorded
+              values and removes the record
+            - Applying a profile again keeps the values recorded first
+        type: str
+        required: false
+        default: present
+        choices: ['present', 'absent']
+    recovery_profile:
+        description:
+            - fast - mclock profile high_recovery_ops, up to 8 backfills and
+              8 active recovery ops per OSD
+            - balanced - mclock profile balanced, up to 3 backfills and 4
+              active recovery ops per OSD
+        type: str
+        required: false
+        default: fast
+        choices: ['fast', 'balanced']
+    settings:
+        description:
+            - Options to set in addition to or instead of those of the profile
+            - Fails without changing anything if the running Ceph release
+              does not know one of them
+        type: dict
+        required: false
+        default: {}
+    section:
+        description:
+            - Section of the config database the options are set in
+        type: str
+        required: false
+        default: osd
+    record_key:
+        description:
+            - config-key the previous values are recorded in
+        type: str
+        required: false
+        default: inett/pve/recovery_profile
+
+author:
+    - Maximilian Hill <mhill@inett.de>
+'''
+
+EXAMPLES = r'''
+- name: Speed up recovery
+  inett.pve.ceph_recovery_profile:
+    recovery_profile: fast
+
+- name: Wait for healthy ceph
+  inett.pve.ceph_wait_for_health:
+
+- name: Restore recovery settings
+  inett.pve.ceph_recovery_profile:
+    state: absent
+'''
+
+RETURN = r'''
+changed:
+    description: Returns true if the module execution changed anything
+    type: boolean
+    returned: always
+message:
+    description: Options (key) and the values they are set to (value); null if removed from the config database
+    type: dict
+    returned: always
+original_message:
+    description: Options (key) and their values before (value); null if not set in the config database
+    type: dict
+    returned: always
+skipped:
+    description: Options of the profile the running Ceph release does not know
+    type: list
+    returned: when applying a profile
+'''
+
+
+import json
+
+from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+
+
+PROFILES = dict(
+    fast=dict(
+        osd_mclock_profile='high_recovery_ops',
+        # mclock ignores the limits below unless told otherwise
+        osd_mclock_override_recovery_settings='true',
+        osd_max_backfills='8',
+        osd_recovery_max_active='8',
+    ),
+    balanced=dict(
+        osd_mclock_profile='balanced',
+        osd_mclock_override_recovery_settings='true',
+        osd_max_backfills='3',
+        osd_recovery_max_active='4',
+    ),
+)
+
+
+def _ceph(mod, args, fail=True):
+    cmd = ['ceph'] + args
+    rc, out, err = mod.run_command(cmd)
+    if (rc != 0) and fail:
+        mod.fail_json(msg="ceph %s failed" % ' '.join(args[:2]), rc=rc, stdout=out, stderr=err, cmd=cmd)
+    return rc, out, err
+
+
+def _known_options(mod):
+    """Returns names of all options the running Ceph release knows
+
+    :returns: names or None if the release can't list them
+    :rtype: set
+    """
+
+    rc, out, _err = _ceph(mod, ['config', 'ls'], fail=False)
+    if rc != 0:
+        return None
+    return set([line.strip() for line in out.split("\n") if line.strip() != ""])
+
+
+def _config_dump(mod, section):
+    """Returns options set in a section of the config database"""
+
+    _rc, out, _err = _ceph(mod, ['config', 'dump', '--format', 'json'])
+    return dict([
+        (e['name'], str(e['value'])) for e in json.loads(out)
+        if (e.get('section', None) == section) and (e.get('mask', "") == "")
+    ])
+
+
+def _set(mod, section, k, v):
+    if v is None:
+        return _ceph(mod, ['config', 'rm', section, k], fail=False)
+    return _ceph(mod, ['config', 'set', section, k, str(v)], fail=False)
+
+
+def _write_record(mod, record):
+    """Sets the record; None removes it"""
+
+    if record is None:
+        return _ceph(mod, ['config-key', 'rm', mod.params['record_key']], fail=False)
+    return _ceph(mod, ['config-key', 'set', mod.params['record_key'], json.dumps(record)], fail=False)
+
+
+def _apply(mod, section, values, current, record, old_record):
+    """Sets options and the record, all or nothing
+
+    None removes an option from the config database or the record. If a
+    step fails, the steps done before are rolled back to current and
+    old_record and the module fails.
+    """
+
+    steps = list()
+    if record != old_record:
+        steps.append(('record', lambda: _write_record(mod, record), lambda: _write_record(mod, old_record)))
+    for (k, v) in sorted(values.items()):
+        steps.append((
+            k,
+            lambda k=k, v=v: _set(mod, section, k, v),
+            lambda k=k: _set(mod, section, k, current.get(k, None)),
+        ))
+    if record is None:
+        # the record goes last when restoring
+        steps.reverse()
+
+    done = list()
+    for (name, do, undo) in steps:
+        rc, out, err = do()
+        if rc != 0:
+            rolled_back = [n for (n, _do, u) in reversed(done) if u()[0] == 0]
+            mod.fail_json(
+                msg="setting %s failed" % name, rc=rc, stdout=out, stderr=err,
+                rolled_back=rolled_back,
+                not_rolled_back=[n for (n, _do, _u) in done if n not in rolled_back],
+            )
+        done.append((name, do, undo))
+
+
+def run_module():
+    module_args = dict(
+        state=dict(type='str', required=False, default='present', choices=['present', 'absent']),
+        recovery_profile=dict(type='str', required=False, default='fast', choices=list(PROFILES.keys())),
+        settings=dict(type='dict', required=False, default={}),
+        section=dict(type='str', required=False, default='osd'),
+        record_key=dict(type='str', required=False, default='inett/pve/recovery_profile'),
+    )
+
+    mod = PveApiModule(argument_spec=module_args, supports_check_mode=True)
+
+    rc, out, _err = _ceph(mod, ['config-key', 'get', mod.params['record_key']], fail=False)
+    record = json.loads(out) if (rc == 0) and (out.strip() != "") else None
+
+    if mod.params['state'] == 'absent':
+        if record is None:
+            mod.exit_json(changed=False, message=dict(), original_message=dict())
+        # restore into the section the values were recorded from
+        section = record.get('section', mod.params['section'])
+        current = _config_dump(mod, section)
+        previous = record['previous']
+        message = dict(previous)
+        original_message = dict([(k, current.get(k, None)) for k in previous])
+        if not mod.check_mode:
+            _apply(mod, section, dict([
+                (k, v) for (k, v) in previous.items() if current.get(k, None) != v
+            ]), current, None, record)
+        mod.exit_json(changed=True, message=message, original_message=original_message)
+
+    section = mod.params['section']
+    current = _config_dump(mod, section)
+    settings = dict(PROFILES[mod.params['recovery_profile']])
+    skipped = list()
+    known = _known_options(mod)
+    if known is not None:
+        unknown = sorted([k for k in mod.params['settings'] if k not in known])
+        if len(unknown) > 0:
+            mod.fail_json(msg="options %s are not known to this Ceph release" % ', '.join(unknown))
+        skipped = sorted([k for k in settings if k not in known])
+        for k in skipped:
+            settings.pop(k)
+    settings.update(dict([(k, str(v)) for (k, v) in mod.params['settings'].items()]))
+    original_message = dict([(k, current.get(k, None)) for k in settings])
+    update = dict([(k, v) for (k, v) in settings.items() if current.get(k, None) != v])
+
+    # Values recorded first are the ones to restore
+    new_record = None
+    if record is None:
+        new_record = dict(section=section, profile=mod.params['recovery_profile'], previous=original_message)
+    else:
+        missing = [k for k in settings if k not in record['previous']]
+        if len(missing) > 0:
+            new_record = dict(record, previous=dict(
+                record['previous'], **dict([(k, current.get(k, None)) for k in missing])
+            ))
+
+    if not mod.check_mode:
+        _apply(mod, section, update, current, new_record or record, record)
+
+    mod.exit_json(
+        changed=(len(update) > 0) or (new_record is not None),
+        message=settings,
+        original_message=original_message,
+        skipped=skipped,
+    )
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
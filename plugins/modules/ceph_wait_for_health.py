@@ -14,6 +14,7 @@ ANSIBLE_METADATA = {
 import time
 
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_wait import Backoff, wait_for
 
 DOCUMENTATION = '''
 ---
@@ -23,9 +24,27 @@ version_added: "2.9"
 
 description:
     - "Waits until ceph health is HEALTH_OK or no ceph is configured"
+    - "Health checks listed in tolerated_checks don't prevent the wait from
+      finishing"
+    - "Tracks degraded, misplaced and unfound objects, the recovery
+      throughput and ETA; polling backs off from 1s up to 10s, but not
+      beyond half the ETA"
     - "Sets fact has_ceph (bool) according to the presence of ceph on the node"
 
 options:
+    tolerated_checks:
+        description:
+            - Health check codes which don't prevent the wait from finishing,
+              e.g. AUTH_INSECURE_GLOBAL_ID_RECLAIM_ALLOWED
+        type: list
+        required: false
+        default: []
+    timeout:
+        description:
+            - Seconds to wait at most before failing; 0 waits forever
+        type: int
+        required: false
+        default: 3600
 
 author:
     - Maximilian Hill <mhill@inett.de>
@@ -36,43 +55,197 @@ EXAMPELS = '''
   delegate_to: localhost
   throttle: 1
   proxmox_ceph_wait_for_healthy:
+
+- name: Wait for ceph to recover, ignoring insecure global_id reclaim
+  inett.pve.ceph_wait_for_health:
+    tolerated_checks:
+      - AUTH_INSECURE_GLOBAL_ID_RECLAIM_ALLOWED
+    timeout: 7200
 '''
 
 RETURN = r'''
 changed:
     description: Returns true if the module execution changed anything
     type: boolean
+health:
+    description: Health status at the end of the wait
+    type: str
+    returned: when ceph is installed
+checks:
+    description: Health check codes present at the end of the wait
+    type: list
+    returned: when ceph is installed
+elapsed:
+    description: Seconds waited
+    type: float
+    returned: always
+throughput:
+    description: Objects recovered per second, measured over the last samples
+    type: float
+    returned: when ceph is installed
+eta:
+    description: Seconds until degraded and misplaced objects are recovered at the current throughput; null if unknown or nothing is recovering
+    type: float
+    returned: when ceph is installed
+timeline:
+    description:
+        - Samples of the recovery whenever it changed, with seconds since
+          the start (t), health status, degraded, misplaced and unfound
+          objects and the health check codes present
+    type: list
+    returned: when ceph is installed
+ansible_facts:
+    type: dict
+    returned: always
+    contains:
+        has_ceph:
+            type: bool
+            returned: always
 '''
 
 
+# Errors of /cluster/ceph/status if Ceph isn't installed or set up
+NO_CEPH_ERRORS = ('binary not installed', 'not initialized', 'not configured')
+
+# samples to measure the throughput over
+RATE_WINDOW = 10
+
+# samples kept in the timeline at most
+TIMELINE_SIZE = 500
+
+
+class _EtaBackoff(Backoff):
+    """Backoff not waiting much longer than recovery is expected to take"""
+
+    def __init__(self, state, **kwargs):
+        super(_EtaBackoff, self).__init__(**kwargs)
+        self.state = state
+
+    def next(self):
+        ret = super(_EtaBackoff, self).next()
+        if (self.state.get('eta', None) or 0) > 0:
+            ret = min(ret, max(self.state['eta'] / 2.0, self.initial))
+        return ret
+
+
 def _ceph_health_from_status(obj):
     for e in obj:
         if e == "health":
             return obj[e]["status"]
 
 
+def _sample(obj):
+    """Extracts recovery progress from /cluster/ceph/status"""
+
+    pgmap = obj.get('pgmap', dict())
+    return dict(
+        health=_ceph_health_from_status(obj),
+        checks=sorted(obj.get('health', dict()).get('checks', dict()).keys()),
+        degraded=int(pgmap.get('degraded_objects', 0) or 0),
+        misplaced=int(pgmap.get('misplaced_objects', 0) or 0),
+        unfound=int(pgmap.get('unfound_objects', 0) or 0),
+        recovering=float(pgmap.get('recovering_objects_per_sec', 0) or 0),
+    )
+
+
+def _throughput(samples):
+    """Objects recovered per second over the last samples"""
+
+    window = samples[-RATE_WINDOW:]
+    if len(window) < 2:
+        return 0.0
+    first = window[0]
+    last = window[-1]
+    if last['t'] <= first['t']:
+        return 0.0
+    recovered = (first['degraded'] + first['misplaced']) - (last['degraded'] + last['misplaced'])
+    return max(recovered / (last['t'] - first['t']), 0.0)
+
+
 def run_module():
+    module_args = dict(
+        tolerated_checks=dict(type='list', required=False, default=[], elements='str'),
+        timeout=dict(type='int', required=False, default=3600),
+    )
     result = dict(
         changed=False,
     )
 
     mod = PveApiModule(
+        argument_spec=module_args,
         supports_check_mode=True
     )
 
-    while True:
-        time.sleep(1)
+    tolerated = set(mod.params['tolerated_checks'])
+    start = time.monotonic()
+    samples = list()
+    timeline = list()
+    state = dict(eta=None, error=None, no_ceph=False)
+
+    def _check():
+        rc, _out, err, obj = mod.query_json("get", "/cluster/ceph/status", cache=False)
+        if (rc != 0) or not isinstance(obj, dict):
+            state['error'] = err
+            if any([e in str(err) for e in NO_CEPH_ERRORS]):
+                state['no_ceph'] = True
+                return True, None
+            # e.g. monitors electing a new leader
+            return False, None
+        state['error'] = None
+
+        sample = _sample(obj)
+        sample['t'] = round(time.monotonic() - start, 1)
+        samples.append(sample)
+        del samples[:-RATE_WINDOW]
+
+        # log changes only
+        entry = dict([(k, v) for (k, v) in sample.items() if k != 'recovering'])
+        if (len(timeline) == 0) or \
+                (dict(timeline[-1], t=None) != dict(entry, t=None)):
+            timeline.append(entry)
+            del timeline[:-TIMELINE_SIZE]
+
+        rate = sample['recovering'] or _throughput(samples)
+        remaining = sample['degraded'] + sample['misplaced']
+        state['rate'] = rate
+        # nothing to recover: other checks clear on their own time
+        state['eta'] = round(remaining / rate, 1) if (rate > 0) and (remaining > 0) else None
+
+        done = (sample['health'] == "HEALTH_OK") or \
+            all([c in tolerated for c in sample['checks']])
+        return done, sample
+
+    (done, sample, elapsed) = wait_for(
+        _check,
+        timeout=mod.params['timeout'] if mod.params['timeout'] > 0 else None,
+        backoff=_EtaBackoff(state, initial=1.0, maximum=10.0, factor=1.5),
+    )
+    result['elapsed'] = round(elapsed, 3)
+
+    if state['no_ceph']:
+        mod.exit_json(ansible_facts=dict(has_ceph=False), **result)
+
+    if sample is not None:
+        result.update(health=sample['health'], checks=sample['checks'])
+    result.update(
+        throughput=round(state.get('rate', 0.0), 1), eta=state['eta'], timeline=timeline,
+    )
 
-        # Get cluster status
-        rc, _out, _err, obj = mod.query_json("get", "/cluster/ceph/status")
-        if rc == 0:
-            if _ceph_health_from_status(obj) == "HEALTH_OK":
-                break
-        else:
-            mod.fail_json("Unable to get Ceph status")
-            break
+    if not done:
+        if sample is None:
+            mod.fail_json(
+                msg="Unable to get Ceph status: %s" % state['error'],
+                ansible_facts=dict(has_ceph=True), **result
+            )
+        mod.fail_json(
+            msg="Ceph not healthy after %ds: %s (%s)" % (
+                mod.params['timeout'], sample['health'],
+                ', '.join([c for c in sample['checks'] if c not in tolerated]),
+            ),
+            ansible_facts=dict(has_ceph=True), **result
+        )
 
-    mod.exit_json(**result)
+    mod.exit_json(ansible_facts=dict(has_ceph=True), **result)
 
 
 def main():
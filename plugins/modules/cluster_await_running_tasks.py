@@ -13,14 +13,61 @@ ANSIBLE_METADATA = {
 
 DOCUMENTATION = '''
 ---
-module: cluster_wait_for_running_tasks
+module: cluster_await_running_tasks
 short_description: Waits until there is no running task in the cluster
 version_added: "2.9"
 
 description:
     - "Waits until there is no running task in the cluster"
+    - "Polls /cluster/tasks with delays growing from 0.5s up to 10s while
+      tasks keep running, after waiting I(delay) seconds for tasks started
+      just before to show up there"
 
 options:
+    nodes:
+        description:
+            - Only wait for tasks running on these nodes
+            - Default: all nodes
+        type: list
+        required: false
+    types:
+        description:
+            - Only wait for tasks of these types, e.g. qmigrate or vzdump
+            - Default: all types
+        type: list
+        required: false
+    exclude_types:
+        description:
+            - Don't wait for tasks of these types
+        type: list
+        required: false
+        default: ['vncshell', 'vncproxy', 'termproxy', 'spiceproxy']
+    users:
+        description:
+            - Only wait for tasks started by these users, e.g. root@pam
+            - Default: all users
+        type: list
+        required: false
+    started_after:
+        description:
+            - Only wait for tasks started after this time (seconds since the
+              epoch)
+        type: int
+        required: false
+    delay:
+        description:
+            - Seconds to wait before the first poll, as tasks started right
+              before may take a moment to show up in /cluster/tasks
+        type: float
+        required: false
+        default: 5
+    timeout:
+        description:
+            - Seconds to wait at most before failing, including I(delay);
+              0 waits forever
+        type: int
+        required: false
+        default: 3600
 
 author:
     - Maximilian Hill <mhill@inett.de>
@@ -31,45 +78,129 @@ EXAMPLES = r'''
   delegate_to: localhost
   throttle: 1
   inett.pve.cluster_await_running_tasks:
+
+- name: Wait for migrations on this node only
+  inett.pve.cluster_await_running_tasks:
+    nodes:
+      - "{{ inventory_hostname }}"
+    types:
+      - qmigrate
+      - vzmigrate
+      - hamigrate
+    timeout: 1800
 '''
 
 RETURN = r'''
 changed:
     description: Returns true if the module execution changed anything
     type: boolean
+elapsed:
+    description: Seconds waited
+    type: float
+    returned: always
+blocked_by:
+    description:
+        - Tasks waited for with their UPID, node, type, id, user, start time,
+          the seconds they blocked the wait and whether they were still
+          running when the wait ended
+    type: list
+    returned: always
 '''
 
 
 import time
 
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_wait import Backoff, wait_for
+
+
+def task_matches(task, params):
+    """Returns true if a running task is to be waited for
+
+    :param task: task as returned by /cluster/tasks
+    :type task: dict
+    :param params: module parameters
+    :type params: dict
+    :rtype: bool
+    """
+
+    if 'status' in task:
+        # stopped
+        return False
+    if task.get('type', None) in (params['exclude_types'] or []):
+        return False
+    if params['types'] and (task.get('type', None) not in params['types']):
+        return False
+    if params['nodes'] and (task.get('node', None) not in params['nodes']):
+        return False
+    if params['users'] and (task.get('user', None) not in params['users']):
+        return False
+    if (params['started_after'] is not None) and \
+            (int(task.get('starttime', 0) or 0) <= params['started_after']):
+        return False
+    return True
 
 
 def wait_for_no_running_tasks(module):
-    exclude_types = [
-        'vncshell', 'vncproxy'
-    ]
-
-    while True:
-        time.sleep(5)
-
-        # Get cluster status
-        rc, _out, _err, cluster_tasks = module.query_json("get", "/cluster/tasks")
-        if rc != 0:
-            continue
-        try:
-            running = 0
-            for v in cluster_tasks:
-                if ('status' not in v) and (v['type'] not in exclude_types):
-                    running += 1
-            if running == 0:
-                break
-        except:
-            continue
+    """Waits until no matching task is running
+
+    :returns: tuple: (bool: done, float: seconds waited, list: tasks waited for)
+    :rtype: tuple
+    """
+
+    # upid -> task, with the time it was seen running first and the time it
+    # was seen gone
+    blocked = dict()
+
+    def _check():
+        rc, _out, _err, cluster_tasks = module.query_json("get", "/cluster/tasks", cache=False)
+        if (rc != 0) or not isinstance(cluster_tasks, list):
+            return False, None
+        now = time.monotonic()
+        running = dict([(v['upid'], v) for v in cluster_tasks if task_matches(v, module.params)])
+        for (upid, v) in running.items():
+            blocked.setdefault(upid, dict(task=v, first=now, gone=None))
+        for (upid, b) in blocked.items():
+            if (upid not in running) and (b['gone'] is None):
+                b['gone'] = now
+        return len(running) == 0, len(running)
+
+    start = time.monotonic()
+    if module.params['delay'] > 0:
+        time.sleep(module.params['delay'])
+    timeout = module.params['timeout'] if module.params['timeout'] > 0 else None
+    if timeout is not None:
+        timeout = max(timeout - (time.monotonic() - start), 0)
+    (done, _running, _elapsed) = wait_for(
+        _check, timeout=timeout, backoff=Backoff(initial=0.5, maximum=10.0)
+    )
+    end = time.monotonic()
+    elapsed = end - start
+
+    ret = list()
+    for (upid, b) in blocked.items():
+        ret.append(dict(
+            upid=upid, node=b['task'].get('node', None), type=b['task'].get('type', None),
+            id=b['task'].get('id', None), user=b['task'].get('user', None),
+            starttime=b['task'].get('starttime', None),
+            blocked=round((b['gone'] if b['gone'] is not None else end) - b['first'], 1),
+            running=b['gone'] is None,
+        ))
+    return done, elapsed, sorted(ret, key=lambda x: -x['blocked'])
 
 
 def run_module():
     module_args = dict(
+        nodes=dict(type='list', required=False, default=[], elements='str'),
+        types=dict(type='list', required=False, default=[], elements='str'),
+        exclude_types=dict(
+            type='list', required=False, elements='str',
+            default=['vncshell', 'vncproxy', 'termproxy', 'spiceproxy'],
+        ),
+        users=dict(type='list', required=False, default=[], elements='str'),
+        started_after=dict(type='int', required=False, default=None),
+        delay=dict(type='float', required=False, default=5),
+        timeout=dict(type='int', required=False, default=3600),
     )
 
     result = dict(
@@ -81,7 +212,18 @@ def run_module():
         supports_check_mode=True
     )
 
-    wait_for_no_running_tasks(module)
+    (done, elapsed, blocked_by) = wait_for_no_running_tasks(module)
+    result['elapsed'] = round(elapsed, 3)
+    result['blocked_by'] = blocked_by
+
+    if not done:
+        module.fail_json(
+            msg="tasks still running after %ds: %s" % (
+                module.params['timeout'],
+                ', '.join(["%s on %s" % (t['type'], t['node']) for t in blocked_by if t['running']]),
+            ),
+            **result
+        )
 
     module.exit_json(**result)
 
@@ -83,10 +83,6 @@ from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
 
 def run_module():
     arg_spec = dict(
-        access=dict(
-            choices=['pvesh', 'http'],
-            required=False,
-            default='pvesh'),
     )
 
     mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=True)
@@ -98,7 +94,14 @@ def run_module():
     has_ceph = False
     ceph_health = None
 
-    rc, out, err, obj = mod.query_json("get", "/cluster/status")
+    # independent queries, issued in parallel
+    (status, ceph_status, version) = mod.query_many([
+        ("get", "/cluster/status"),
+        ("get", "/cluster/ceph/status"),
+        ("get", "/version"),
+    ])
+
+    rc, out, err, obj = status
     if rc != 0:
         mod.fail_json(msg="API query failed", rc=rc, stdout=out, stderr=err)
 
@@ -112,7 +115,7 @@ def run_module():
 
     node_name = mod.get_local_node()
 
-    rc, out, err, obj = mod.query_json("get", "/cluster/ceph/status")
+    rc, out, err, obj = ceph_status
     if rc == 0:
         has_ceph = True
         for e in obj:
@@ -126,7 +129,7 @@ def run_module():
     ansible_facts["pve_ceph_installed"] = has_ceph
     if has_ceph and ceph_health is not None:
         ansible_facts["pve_ceph_health"] = ceph_health
-    rc, out, err, obj = mod.query_json("get", "/version")
+    rc, out, err, obj = version
     if rc == 0:
         ansible_facts["ansible_distribution"] = "Proxmox_VE"
         ansible_facts["ansible_distribution_major_release"] = obj["release"]
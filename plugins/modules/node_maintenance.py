@@ -19,11 +19,14 @@ version_added: "2.9"
 
 description:
     - "Enables/Disables PVE maintenance mode"
+    - "When enabling, waits until every HA service which was on the node is
+      started (or stopped, if requested so) on another node, not only until
+      the LRM reports maintenance mode"
 
 options:
     enabled:
         description:
-            - Weather maintenance mode should be enabled 
+            - Weather maintenance mode should be enabled
         required: false
         default: false
     node_name:
@@ -31,6 +34,18 @@ options:
             - Proxmox VE Node maintenance state should be set
         required: false
         default: Node the module is run on
+    timeout:
+        description:
+            - Seconds to wait for the LRM to enter or leave maintenance mode
+              and the HA services to leave the node
+        required: false
+        default: 600
+    wait_for_guests:
+        description:
+            - Wait for running guests not managed by HA to leave the node as
+              well, e.g. when they are migrated by another task
+        required: false
+        default: false
 
 author:
     - Maximilian Hill <mhill@inett.de>
@@ -57,20 +72,65 @@ original_message:
 message:
     description: State of maintenance mode after module execution
     type: boolean
-
+elapsed:
+    description: Seconds it took the LRM to reach the requested state and the node to drain
+    type: float
+drained:
+    description: HA services (key) which left the node, the node they are on now and seconds it took
+    type: dict
+    returned: when enabling
+    sample: {"vm:100": {"node": "pve02", "state": "started", "elapsed": 12.3}}
+pending:
+    description: HA services and guests still on the node when the timeout was reached
+    type: list
+    returned: on failure
 '''
 
 
 import time
 
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_wait import Backoff, wait_for
+
 
+# States of HA services the CRM moves off a node in maintenance mode
+DRAINED_STATES = ['started', 'stopped']
+
+
+def _drain_check(mod, node_name, ha, tracked, drained, start):
+    """Adds the tracked services which left the node to drained
+
+    :returns: service IDs still to leave the node
+    :rtype: list
+    """
+
+    pending = list()
+    for sid in tracked:
+        if sid in drained:
+            continue
+        s = ha.service(sid)
+        if s is None:
+            # not HA managed anymore, nothing left to wait for
+            drained[sid] = dict(node=None, state=None, elapsed=round(time.monotonic() - start, 3))
+            continue
+        if s.get('status_state', None) == 'error':
+            mod.fail_json(msg="HA service %s failed to leave %s" % (sid, node_name), service=s)
+        if (s.get('node', None) not in [None, node_name]) and \
+                (s.get('status_state', None) in DRAINED_STATES):
+            drained[sid] = dict(
+                node=s['node'], state=s['status_state'], elapsed=round(time.monotonic() - start, 3)
+            )
+        else:
+            pending.append(sid)
+    return pending
 
 
 def run_module():
     arg_spec = dict(
         enabled=dict(type='bool', required=False, default=False),
         node_name=dict(type='str', required=False, default=None),
+        timeout=dict(type='int', required=False, default=600),
+        wait_for_guests=dict(type='bool', required=False, default=False),
     )
 
     mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=True)
@@ -82,18 +142,66 @@ def run_module():
     enabled = mod.params["enabled"]
 
     changed = (active != enabled)
-
-    if changed and not mod.check_mode:
-        mod.set_node_lrm_maintenance(node_name, enabled)
-
-        time.sleep(20)
-        while mod.get_node_lrm_maintenance(node_name) != enabled and not mod.get_node_lrm_idle(node_name):
-            time.sleep(5)
+    elapsed = 0.0
+    result = dict()
+
+    # Services to see leaving the node; a run which timed out before picks
+    # up the ones still there
+    tracked = list()
+    if enabled:
+        tracked = [
+            s['sid'] for s in mod.get_ha_state().node_services(node_name)
+            if s.get('state', 'started') in DRAINED_STATES + ['enabled']
+        ]
+        result['drained'] = dict()
+    wait_for_guests = enabled and mod.params['wait_for_guests']
+
+    if (changed or (len(tracked) > 0) or wait_for_guests) and not mod.check_mode:
+        if changed:
+            mod.set_node_lrm_maintenance(node_name, enabled)
+        start = time.monotonic()
+        backoff = Backoff(initial=1.0, maximum=10.0, factor=1.5)
+        pending = list()
+
+        def _check():
+            ha = mod.get_ha_state(refresh=True)
+            if not ha.available('status'):
+                mod.fail_json(msg="Unable to get cluster HA status")
+            if len(ha.last_changes) > 0:
+                # services are on the move, look again soon
+                backoff.reset()
+            if enabled:
+                lrm_done = ha.lrm_maintenance(node_name)
+            else:
+                lrm_done = (not ha.lrm_maintenance(node_name)) or ha.lrm_idle(node_name)
+            pending[:] = _drain_check(mod, node_name, ha, tracked, result.get('drained', dict()), start)
+            if wait_for_guests:
+                index = mod.get_resource_index(refresh=True)
+                if index is None:
+                    mod.fail_json(msg="failed to get guests")
+                managed = ha.managed_vmids()
+                pending.extend([
+                    "%s:%d" % ('ct' if vm['type'] == 'lxc' else 'vm', vm['vmid'])
+                    for vm in index.vms(node=node_name)
+                    if (vm['vmid'] not in managed) and (vm.get('status', None) == 'running')
+                ])
+            return lrm_done and (len(pending) == 0), None
+
+        # The CRM picks up the request within ~10s, migrating the services
+        # may take much longer
+        done, _value, elapsed = wait_for(_check, timeout=mod.params['timeout'], backoff=backoff)
+        if not done:
+            mod.fail_json(
+                msg="%s did not reach the requested state in time" % node_name,
+                changed=changed, elapsed=round(elapsed, 3), pending=pending, **result
+            )
 
     mod.exit_json(
         changed=changed,
         message=enabled,
-        original_message=active
+        original_message=active,
+        elapsed=round(elapsed, 3),
+        **result
     )
 
 
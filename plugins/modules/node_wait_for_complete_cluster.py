@@ -14,6 +14,7 @@ ANSIBLE_METADATA = {
 import time
 
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_wait import Backoff, wait_for
 
 DOCUMENTATION = '''
 ---
@@ -36,6 +37,30 @@ options:
              - If value isn't passed, module will wait for all nodes to be online
         required: false
         default: All nodes in cluster
+    checks:
+        description:
+            - Criteria a node has to meet to be ready, checked in this order
+            - online - node is online in the cluster
+            - pve-cluster - pve-cluster service is running on the node
+            - pveproxy - API of the node answers
+            - ceph_osds - all Ceph OSDs of the node are up
+        type: list
+        required: false
+        default: ['online']
+        choices: ['online', 'pve-cluster', 'pveproxy', 'ceph_osds']
+    quorum_only:
+        description:
+            - Only wait for the cluster to be quorate instead of all nodes
+              being ready
+        type: bool
+        required: false
+        default: false
+    timeout:
+        description:
+            - Seconds to wait at most before failing; 0 waits forever
+        type: int
+        required: false
+        default: 1800
 
 author:
     - Maximilian Hill <mhill@inett.de>
@@ -47,6 +72,11 @@ EXAMPELS = '''
   throttle: 1
   proxmox_cluster_wait_for_nodes:
     nodes: ['node0', 'node1']
+
+- name: Wait until the rebooted node is usable again
+  inett.pve.node_wait_for_complete_cluster:
+    checks: ['online', 'pve-cluster', 'pveproxy', 'ceph_osds']
+    timeout: 900
 '''
 
 RETURN = r'''
@@ -54,49 +84,142 @@ changed:
     description: Returns true if the module execution changed anything
     type: boolean
     returned: always
+elapsed:
+    description: Seconds waited
+    type: float
+    returned: always
+quorate:
+    description: Whether the cluster was quorate at the end of the wait
+    type: bool
+    returned: always
+ready:
+    description: Nodes (key) and the seconds it took them to become ready (value)
+    type: dict
+    returned: always
+pending:
+    description: Nodes (key) not ready at the end of the wait and the first check they failed (value)
+    type: dict
+    returned: always
 '''
 
 
-def wait_for_nodes(module, nodes=None):
+def _check_online(module, node, status):
+    return bool(int(status.get('online', 0) or 0))
+
+
+def _check_service(name):
+    def _check(module, node, status):
+        rc, _out, _err, obj = module.query_json(
+            "get", "/nodes/%s/services/%s/state" % (node, name), cache=False
+        )
+        return (rc == 0) and isinstance(obj, dict) and (obj.get('state', None) == 'running')
+    return _check
+
+
+def _check_pveproxy(module, node, status):
+    # requests for a node are answered by its own pveproxy
+    rc, _out, _err, _obj = module.query_json("get", "/nodes/%s/version" % node, cache=False)
+    return rc == 0
+
+
+def _check_ceph_osds(module, node, status):
+    rc, _out, _err, obj = module.query_json("get", "/nodes/%s/ceph/osd" % node, cache=False)
+    if (rc != 0) or not isinstance(obj, dict):
+        return False
+
+    def _host(e):
+        if (e.get('type', None) == 'host') and (e.get('name', None) == node):
+            return e
+        for c in e.get('children', []):
+            ret = _host(c)
+            if ret is not None:
+                return ret
+        return None
+
+    host = _host(obj.get('root', dict()))
+    if host is None:
+        # no OSDs on this node
+        return True
+    return all([c.get('status', None) == 'up' for c in host.get('children', []) if c.get('type', None) == 'osd'])
+
+
+# name -> function(module, node, entry of node in /cluster/status) returning
+# true if the node meets the criterion
+CHECKS = {
+    'online': _check_online,
+    'pve-cluster': _check_service('pve-cluster'),
+    'pveproxy': _check_pveproxy,
+    'ceph_osds': _check_ceph_osds,
+}
+
+
+def wait_for_nodes(module, nodes=None, checks=None, quorum_only=False, timeout=None):
+    """Waits for nodes to be ready or the cluster to be quorate
+
+    Nodes are checked until they meet all criteria once.
+
+    :returns: tuple: (bool: done, float: seconds waited, dict: node ->
+        seconds to ready, dict: node -> first failed check, bool: quorate)
+    :rtype: tuple
+    """
+
     if nodes is None:
         nodes = ['_all']
+    checks = [c for c in (checks or ['online'])]
+    if 'online' not in checks:
+        checks.insert(0, 'online')
+
+    start = time.monotonic()
+    ready = dict()
+    pending = dict()
+    state = dict(quorate=False)
+
+    def _check_node(item):
+        (node, status) = item
+        for c in checks:
+            if not CHECKS[c](module, node, status):
+                return c
+        return None
 
-    while True:
-        time.sleep(1)
-
-        # Get cluster status
-
-        rc, _out, _err, obj = module.query_json("get", "/cluster/status")
-
-        if rc != 0:
-            continue
-        try:
-            online_nodes = 0
-            in_cluster = False
-            n_nodes = 100
-            if '_all' in nodes:
-                for e in obj:
-                    if e["type"] == "cluster":
-                        n_nodes = int(e["nodes"])
-                        in_cluster = True
-                    if e["type"] == "node" and int(e["online"]) == 1:
-                        online_nodes += 1
+    def _check():
+        rc, _out, _err, obj = module.query_json("get", "/cluster/status", cache=False)
+        if (rc != 0) or not isinstance(obj, list):
+            return False, None
+
+        members = dict([(e['name'], e) for e in obj if e.get('type', None) == 'node'])
+        cluster = [e for e in obj if e.get('type', None) == 'cluster']
+        # a node without cluster is always quorate
+        state['quorate'] = (len(cluster) == 0) or bool(int(cluster[0].get('quorate', 0) or 0))
+        if quorum_only:
+            return state['quorate'], None
+
+        wanted = sorted(members.keys()) if '_all' in nodes else nodes
+        todo = [n for n in wanted if n not in ready]
+        results = module.parallel_map(
+            _check_node, [(n, members.get(n, dict())) for n in todo]
+        )
+        now = time.monotonic()
+        pending.clear()
+        for (n, failed) in zip(todo, results):
+            if failed is None:
+                ready[n] = round(now - start, 1)
             else:
-                for e in obj:
-                    if e["type"] == "node" and e["name"] in nodes:
-                        n_nodes += 1
-                        if int(e["online"]) == 1:
-                            online_nodes += 1
+                pending[n] = failed
+        return len(pending) == 0, None
 
-            if (online_nodes == n_nodes) or not in_cluster:
-                return
-        except:
-            continue
+    (done, _value, elapsed) = wait_for(
+        _check, timeout=timeout, backoff=Backoff(initial=1.0, maximum=10.0, factor=1.5)
+    )
+    return done, elapsed, ready, pending, state['quorate']
 
 
 def run_module():
     module_args = dict(
         nodes=dict(type='list', required=False, default=['_all']),
+        checks=dict(type='list', required=False, default=['online'], elements='str',
+                    choices=list(CHECKS.keys())),
+        quorum_only=dict(type='bool', required=False, default=False),
+        timeout=dict(type='int', required=False, default=1800),
         validate_certs=dict(type='bool', required=False, default=True)
     )
 
@@ -109,9 +232,22 @@ def run_module():
         supports_check_mode=False
     )
 
-    nodes = module.params["nodes"]
+    (done, elapsed, ready, pending, quorate) = wait_for_nodes(
+        module, module.params["nodes"], checks=module.params['checks'],
+        quorum_only=module.params['quorum_only'],
+        timeout=module.params['timeout'] if module.params['timeout'] > 0 else None,
+    )
+    result.update(elapsed=round(elapsed, 3), ready=ready, pending=pending, quorate=quorate)
 
-    wait_for_nodes(module, nodes)
+    if not done:
+        module.fail_json(
+            msg="nodes not ready after %ds: %s" % (
+                module.params['timeout'],
+                ', '.join(["%s (%s)" % (n, c) for (n, c) in sorted(pending.items())])
+                if not module.params['quorum_only'] else "cluster not quorate",
+            ),
+            **result
+        )
 
     module.exit_json(**result)
 
@@ -53,6 +53,11 @@ options:
     validate_certs:
         description:
             - weather to validate ssl certs or not
+    timeout:
+        description:
+            - Seconds to wait for the cluster to be created or joined
+        required: false
+        default: 300
 
 author:
     - Maximilian Hill (mhill@inett.de)
@@ -75,13 +80,32 @@ EXAMPELS = '''
 '''
 
 import json
-import time
 from urllib.parse import urlencode
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.urls import fetch_url
 import ansible.module_utils.six.moves.http_cookies as cookies
 
+from ansible_collections.inett.pve.plugins.module_utils.pve_tasks import wait_for_task
+from ansible_collections.inett.pve.plugins.module_utils.pve_wait import wait_for
+
+
+def _api_get(module, api_url, headers):
+    """Returns a function(url, params) querying api_url like wait_for_task expects"""
+
+    def _get(url, params):
+        full_url = api_url + url
+        if len(params) > 0:
+            full_url += "?" + urlencode(params)
+        resp, info = fetch_url(module, full_url, method="GET", headers=headers)
+        if info["status"] != 200:
+            return info["status"], None
+        try:
+            return 0, json.loads(resp.read().decode('utf8'))["data"]
+        except ValueError:
+            return 1, None
+    return _get
+
 
 def run_module():
     module_args = dict(
@@ -91,7 +115,8 @@ def run_module():
         node=dict(type='str', required=True),
         node_auth=dict(type='dict', required=True, no_log=True),
         node_root_password=dict(type='str', required=True, no_log=True),
-        validate_certs=dict(type='bool', required=False, default=True)
+        validate_certs=dict(type='bool', required=False, default=True),
+        timeout=dict(type='int', required=False, default=300)
     )
 
     result = dict(
@@ -208,8 +233,14 @@ def run_module():
         if clc_info["status"] != 200:
             module.fail_json(msg="Unable to create new cluster\n")
 
-        # Wait some time - to be replaced by a lookup of the cluster status
-        time.sleep(15)
+        # Wait for the task creating the cluster
+        clc_task = wait_for_task(
+            _api_get(module, cluster_api_url, cluster_headers),
+            json.loads(clc_resp.read().decode('utf8'))["data"],
+            timeout=module.params['timeout']
+        )
+        if not clc_task["ok"]:
+            module.fail_json(msg="Unable to create new cluster\n", task=clc_task)
 
     # Join `node` into cluster
     if (
@@ -246,18 +277,26 @@ def run_module():
             }
             module.fail_json(msg='Error joining cluster', kwargs=clj_kwargs)
 
-        # Wait some time - to be replaced by a lookup of the cluster status
-        time.sleep(15)
-
-        # Get node cluster status
-        ncl_resp, ncl_info = fetch_url(module,
-            node_api_url+"/cluster/status",
-            method="GET",
-            headers=cluster_headers
+        # Wait for `node` to report the cluster. pveproxy on `node` restarts
+        # with the cluster's keys while joining, so the task itself can't be
+        # followed reliably
+        node_cluster_get = _api_get(module, node_api_url, cluster_headers)
+
+        def _joined():
+            rc, data = node_cluster_get("/cluster/status", dict())
+            if rc != 0:
+                return False, None
+            return any([
+                (v["type"] == "cluster") and (v["name"] == cluster_name)
+                for v in data
+            ]), data
+
+        _done, ncl_data, _elapsed = wait_for(
+            _joined, timeout=module.params['timeout']
         )
-        if ncl_info["status"] != 200:
+        if ncl_data is None:
             module.fail_json(msg='cannot fetch node cluster_status')
-        node_cluster_status = json.loads(ncl_resp.read().decode('utf8'))
+        node_cluster_status = {"data": ncl_data}
 
         # Check if `node` joined the cluster
         node_in_cluster = False
@@ -85,12 +85,15 @@ original_message:
         media:
             type: str
             returned: always
+diff:
+    description: Values of changed config keys before and after the change
+    type: dict
+    returned: always
 '''
 
 
-import re
-
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_property import format_value
 
 
 def run_module():
@@ -127,26 +130,23 @@ def run_module():
             file=file, media=mod.params.get('media', 'cdrom')
         )
         message = dict({
-            k: re.sub(r"^file=", "", PveApiModule.params_dict_to_string(v))
-            for (k, v) in update_params.items()
+            k: format_value(k, v) for (k, v) in update_params.items()
         })
 
-        old_message = dict({k: vm_config[k] for (k, v) in update_params.items()})
-        changed = (old_message != message)
+        old_message = dict({k: format_value(k, vm_config[k]) for (k, v) in update_params.items()})
 
-        if changed:
-            mod.vm_config_set(
-                mod.params['vmid'],
-                node=vm['node'],
-                digest=vm_config.get('digest', None),
-                config=update_params,
-                vm=vm
-            )
+        changed, diff = mod.vm_config_update(
+            mod.params['vmid'],
+            update_params,
+            vm=vm,
+            current=vm_config,
+        )
 
         mod.exit_json(
             changed=changed,
             message=message,
-            original_message=old_message
+            original_message=old_message,
+            diff=diff,
         )
         return
 
@@ -15,7 +15,19 @@ DOCUMENTATION = '''
 '''
 
 RETURN = r'''
-
+changed:
+    description: Returns true if the module execution changed anything
+    type: boolean
+    returned: always
+diff:
+    description: Values of changed config keys before and after the change
+    type: dict
+    returned: always
+    contains:
+        before:
+            type: dict
+        after:
+            type: dict
 '''
 
 
@@ -37,26 +49,10 @@ def run_module():
 
     mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=False)
 
-    change = False
-
     vm, vm_config = mod.vm_config_get(mod.params['vmid'])
 
-    old_config = vm_config.copy()
-    old_config.pop('digest', None)
-
-    delete = mod.params.get('update', {}).get('delete', [])
-    for d in delete:
-        if d in old_config:
-            change = True
-            break
-
-    if not change:
-        for d in mod.params.get('update', {}).keys():
-            if mod.params['update'][d] != old_config.get(d, ""):
-                change = True
-                break
-
     update_params = mod.params.get('update', {})
+    delete = update_params.pop('delete', [])
 
     for k, n in update_params.pop('net', {}).items():
         update_params["net%s" % k] = n
@@ -112,18 +108,17 @@ def run_module():
         description = "\n\n".join(description.split("\n"))
         update_params['description'] = description
 
-    if (len(update_params) > 0) and change:
-        _vm, new_config = mod.vm_config_set(
-            mod.params['vmid'],
-            digest=vm_config.get('digest', None),
-            config=update_params,
-            vm=vm,
-        )
-        new_config.pop('digest', None)
-        mod.exit_json( changed = (old_config != new_config) )
+    changed, diff = mod.vm_config_update(
+        mod.params['vmid'],
+        update_params,
+        delete=delete,
+        vm=vm,
+        current=vm_config,
+    )
 
     mod.exit_json(
-        changed=False,
+        changed=changed,
+        diff=diff,
     )
     return
 
@@ -62,6 +62,10 @@ original_message:
     description: State of subscription after module execution
     type: dict
     returned: always
+diff:
+    description: Values of changed config keys before and after the change
+    type: dict
+    returned: always
 '''
 
 
@@ -99,27 +103,21 @@ def run_module():
 
     old_message = dict({k: vm_config.get(k, None) for (k, v) in update_params.items()})
     message = old_message.copy()
-    message.pop('digest', None)
     message.update(update_params)
-    changed = (old_message != message)
-
-    if update_params['description'] is None:
-        update_params.pop('description')
-        update_params['delete'] = ['description']
-
-    if changed:
-        mod.vm_config_set(
-            mod.params['vmid'],
-            node=vm['node'],
-            digest=vm_config.get('digest', None),
-            config=update_params,
-            vm=vm
-        )
+
+    # None deletes the description
+    changed, diff = mod.vm_config_update(
+        mod.params['vmid'],
+        update_params,
+        vm=vm,
+        current=vm_config,
+    )
 
     mod.exit_json(
         changed=changed,
         message=message,
-        original_message=old_message
+        original_message=old_message,
+        diff=diff,
     )
     return
 
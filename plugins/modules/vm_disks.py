@@ -30,13 +30,26 @@ options:
     scsi:
         description:
             - Config key of the device to be resized
+            - C(size) is given in GiB (default 32); fractions are allowed
+              as long as they are whole MiB, e.g. 0.5
         type: dict
         required: false
     storage:
         description:
             - Storage disk(s) should be created in
-        type: int
+        type: str
+        required: false
+    parallel_storages:
+        description:
+            - Allocate new disks on different storages concurrently, one disk
+              at a time per storage, and attach them with a single config
+              update afterwards
+            - Only applies to storages of type rbd, lvm, lvmthin and zfspool;
+              disks on other storages are allocated by the config update
+            - Volumes allocated this way are freed again if anything fails
+        type: bool
         required: false
+        default: false
 
 author:
     - Maximilian Hill <mhill@inett.de>
@@ -52,6 +65,15 @@ EXAMPLES = r'''
     scsi:
       1: {"size": 500, "ssd": true, "storage": "rbd"}
     storage: "{{ pve_vm_storage }}"
+
+- name: create disks on two storages at once
+  delegate_to: "{{ pve_target_node }}"
+  inett.pve.vm_disks:
+    vmid: "{{ pve_vmid }}"
+    scsi:
+      1: {"size": 500, "storage": "rbd"}
+      2: {"size": 100, "storage": "local-lvm"}
+    parallel_storages: true
 '''
 
 RETURN = r'''
@@ -67,10 +89,95 @@ original_message:
     description: State of subscription after module execution
     type: dict
     returned: always
+diff:
+    description: Values of changed config keys before and after the change
+    type: dict
+    returned: always
+allocated:
+    description: Volumes allocated ahead of the config update (parallel_storages)
+    type: list
+    returned: always
 '''
 
 
+import re
+
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_diff import changes_to_diff, config_diff
+
+
+# Storage types allocating volumes independently of each other
+PARALLEL_STORAGE_TYPES = ['rbd', 'lvm', 'lvmthin', 'zfspool']
+
+
+def _disk_size(mod, key, size):
+    """Checks the size of a new disk
+
+    Sizes are given in GiB, fractions of it are kept as far as they are
+    whole MiB.
+
+    :returns: size in MiB
+    :rtype: int
+    """
+
+    try:
+        mib = float(size) * 1024
+    except (TypeError, ValueError):
+        mod.fail_json(msg="size of %s is not a number: %s" % (key, size))
+    if (mib <= 0) or (mib != int(mib)):
+        mod.fail_json(msg="size of %s has to be a positive number of GiB in whole MiB: %s" % (key, size))
+    return int(mib)
+
+
+def _format_size(mib):
+    """Returns a size in MiB as accepted by the storage API, e.g. 32G or 512M"""
+
+    if mib % 1024 == 0:
+        return "%dG" % (mib // 1024)
+    return "%dM" % mib
+
+
+def _allocate_lane(mod, node, vmid, storage, disks):
+    """Allocates disks on a single storage one after the other
+
+    :param disks: list of (config key, size in MiB)
+    :returns: tuple: (list of (config key, volid), error or None)
+    """
+
+    ret = []
+    rc, _out, err, content = mod.query_json(
+        "get", "/nodes/%s/storage/%s/content" % (node, storage),
+        params=dict(vmid=vmid), cache=False,
+    )
+    if rc != 0:
+        return ret, "failed to list content of storage %s: %s" % (storage, err)
+    used = [-1]
+    for v in content or []:
+        m = re.search(r'vm-%d-disk-(\d+)' % vmid, v.get('volid', ''))
+        if m is not None:
+            used.append(int(m.group(1)))
+    index = max(used) + 1
+
+    for (key, size) in disks:
+        rc, _out, err, volid = mod.query_json(
+            "create", "/nodes/%s/storage/%s/content" % (node, storage),
+            params=dict(
+                vmid=vmid, filename="vm-%d-disk-%d" % (vmid, index),
+                size=_format_size(size),
+            ),
+        )
+        if rc != 0:
+            return ret, "failed to allocate %s on storage %s: %s" % (key, storage, err)
+        ret.append((key, volid))
+        index += 1
+    return ret, None
+
+
+def _free(mod, node, allocated):
+    for (_key, volid) in allocated:
+        mod.query_api(
+            "delete", "/nodes/%s/storage/%s/content/%s" % (node, volid.split(':', 1)[0], volid)
+        )
 
 
 def run_module():
@@ -89,45 +196,76 @@ def run_module():
         ),
         # Fallback storage
         storage=dict(type='str', required=False, default=None),
+        parallel_storages=dict(type='bool', required=False, default=False),
     )
 
     mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=True)
     vm, vm_config = mod.vm_config_get(mod.params['vmid'])
     update_params = dict()
-    update_args = dict()
+    lanes = dict()
 
     for k, s in mod.params.get('scsi', dict()).items():
-        update_args["scsi%s" % k] = s
+        storage = s.get('storage', mod.params.get('storage'))
+        size = _disk_size(mod, "scsi%s" % k, s.get('size', 32))
         update_params["scsi%s" % k] = dict(
-            file="%s:%d" % (
-                s.get('storage', mod.params.get('storage')),
-                s.get('size', 32)
-            ),
+            # STORAGE:SIZE allocates SIZE GiB, fractions included
+            file="%s:%s" % (storage, ("%.10g" % (size / 1024.0))),
             cache=s.get('cache', 'writeback'),
             discard=('on' if s.get('discard', True) else 'ignore'),
-            ssd=('on' if s.get('ssd', True) else 'ignore'),
+            ssd=bool(s.get('ssd', True)),
             mbps_rd=600, mbps_wr=300,
         )
+        if "scsi%s" % k not in vm_config:
+            lanes.setdefault(storage, []).append(("scsi%s" % k, size))
 
     message = update_params
 
     old_message = dict({k: vm_config.get(k, None) for (k, v) in update_params.items()})
-    changed = (old_message != message)
-
-    if changed and not mod.check_mode:
-        for k, v in update_params.items():
-            if k not in vm_config.items():
-                mod.vm_config_set(
-                    mod.params.get('vmid'),
-                    node=vm['node'],
-                    config={k: v},
-                    vm=vm
-                )
+
+    # Existing disks on the requested storage are kept, only their options
+    # are updated
+    update, delete, changes = config_diff(vm_config, update_params)
+
+    allocated = []
+    if (len(changes) > 0) and not mod.check_mode:
+        if mod.params['parallel_storages'] and (len(lanes) > 1):
+            _rc, _out, _err, storages = mod.query_json(
+                "get", "/storage", fail="failed to get storage configuration"
+            )
+            types = dict([(st['storage'], st.get('type', None)) for st in storages])
+            lanes = [
+                (st, disks) for (st, disks) in lanes.items()
+                if types.get(st, None) in PARALLEL_STORAGE_TYPES
+            ]
+            results = mod.parallel_map(
+                lambda lane: _allocate_lane(mod, vm['node'], vm['vmid'], lane[0], lane[1]),
+                lanes,
+            )
+            errors = []
+            for (lane_allocated, error) in results:
+                allocated += lane_allocated
+                if error is not None:
+                    errors.append(error)
+            if len(errors) > 0:
+                _free(mod, vm['node'], allocated)
+                mod.fail_json(msg="failed to allocate disks", errors=errors)
+            for (key, volid) in allocated:
+                update_params[key]['file'] = volid
+            update, delete, changes = config_diff(vm_config, update_params)
+
+        # All disks are created/updated with a single request; volumes
+        # allocated above are freed if it or the task it started fails
+        mod.vm_config_set(
+            vm['vmid'], node=vm['node'], config=update, vm=vm, current=vm_config,
+            on_failure=lambda: _free(mod, vm['node'], allocated),
+        )
 
     mod.exit_json(
-        changed=changed,
+        changed=(len(changes) > 0),
         message=message,
-        original_message=old_message
+        original_message=old_message,
+        diff=changes_to_diff(changes),
+        allocated=[volid for (_key, volid) in allocated],
     )
 
 
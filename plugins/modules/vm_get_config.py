@@ -21,8 +21,9 @@ description:
     - "Fetch configuration of a VM"
     - |
         The raw configuration as returned by the Proxmox VE API will be
-        returned as `pve_vm_config_raw`. A parsed representation will
-        be returned as `pve_vm_config`.
+        returned as `pve_vm_config_raw`. Basic information about the guest
+        and a parsed representation of the config will be returned as
+        `pve_vm_config`, the parsed config is `pve_vm_config[1]`.
 
 options:
     vmid:
@@ -61,13 +62,17 @@ pve_vm_config_raw:
     type: dict
     returned: always
 pve_vm_config:
-    description: Proxmox VE VM configuration with parsed values
-    type: dict
+    description: Basic information about the guest and Proxmox VE VM configuration with parsed values
+    type: list
     returned: always
+    sample: [{"vmid": 100, "node": "pve01", "type": "qemu"}, {"net0": {"virtio": "BC:24:11:00:00:01", "bridge": "vmbr0"}}]
 '''
 
 
+import json
+
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_property import parse_config
 
 
 def run_module():
@@ -77,17 +82,12 @@ def run_module():
 
     mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=True)
 
-    node = mod.vm_locate(mod.params['vmid'])
-
-    _rc, out, err, vm_config_raw = mod.query_json(
-            'get',
-            "/nodes/%s/qemu/%s/config" % (node, mod.params["vmid"])
-    )
-    vm_config = mod.vm_config_get(mod.params["vmid"])
+    vm, vm_config_raw = mod.vm_config_get_raw(mod.params['vmid'])
+    vm_config = parse_config(vm_config_raw)
 
-    mod.exit_json(changed=False, stdout=out, stderr=err, 
+    mod.exit_json(changed=False, stdout=json.dumps(vm_config_raw), stderr="",
         pve_vm_config_raw=vm_config_raw,
-        pve_vm_config=vm_config,
+        pve_vm_config=(vm, vm_config),
     )
 
 
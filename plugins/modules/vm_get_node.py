@@ -56,15 +56,11 @@ from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
 def run_module():
     arg_spec = dict(
         vmid=dict(type=int, required=True),
-        access=dict(
-            choices=['pvesh', 'http'], required=False, default='pvesh'
-        ),
     )
 
     mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=True)
 
-    vm_info = mod.vm_info(mod.params["vmid"])
-    mod.exit_json(changed=False, node=vm_info["node"])
+    mod.exit_json(changed=False, node=mod.vm_locate(mod.params["vmid"]))
 
 
 def main():
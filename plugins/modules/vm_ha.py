@@ -52,7 +52,15 @@ EXAMPLES = r'''
 '''
 
 RETURN = r'''
-
+changed:
+    description: Returns true if the module execution changed anything
+    type: boolean
+message:
+    description: HA state and group of the VM after module execution
+    type: dict
+original_message:
+    description: HA state and group of the VM before, empty if it was not HA managed
+    type: dict
 '''
 
 
@@ -66,19 +74,34 @@ def run_module():
         group=dict(type=str, required=True),
     )
 
-    mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=False)
-
-    node = mod.vm_locate(mod.params['vmid'])
-
-    _rc, out, err, vm_config = mod.query_json(
-        'create', "/cluster/ha/resources",
-        params=dict(
-            sid=mod.params['vmid'],
-            state=mod.params['state'],
-            group=mod.params['group'],
-        ),
-    )
-    mod.exit_json(changed=False, stdout=out, stderr=err)
+    mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=True)
+
+    mod.vm_locate(mod.params['vmid'])
+
+    ha = mod.get_ha_state()
+    if not ha.available('resources'):
+        mod.fail_json(msg="failed to get HA resources")
+    wanted = dict(state=mod.params['state'], group=mod.params['group'])
+    service = ha.service(mod.params['vmid'])
+    original = dict()
+    if service is not None:
+        original = dict(state=service.get('state', None), group=service.get('group', None))
+
+    changed = (original != wanted)
+    if changed and not mod.check_mode:
+        if service is None:
+            mod.query_json(
+                'create', "/cluster/ha/resources",
+                params=dict(sid=mod.params['vmid'], **wanted),
+                fail="failed to add VM %s to HA" % mod.params['vmid'],
+            )
+        else:
+            mod.query_json(
+                'set', "/cluster/ha/resources/%s" % service['sid'],
+                params=wanted,
+                fail="failed to configure HA of VM %s" % mod.params['vmid'],
+            )
+    mod.exit_json(changed=changed, message=wanted, original_message=original)
 
 
 def main():
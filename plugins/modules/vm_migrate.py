@@ -21,30 +21,110 @@ description:
     - "Migrates QEMU VMs and LXC container inside cluster"
 
 options:
+    allow_overcommit:
+        description:
+            - Place VMs exceeding max_memory_ratio or max_cpu_ratio on the
+              least loaded allowed node instead of failing
+            - Default: false
+    bwlimit:
+        description:
+            - Bandwidth limit of each migration in KiB/s
+            - Default: limit configured in datacenter.cfg
     check_ha:
         description:
             - Check HA groups for migration
             - Migrate ony inside HA groups
+            - Only members with the highest priority are considered, as the
+              HA manager would move VMs there anyway
             - Default: true
         required: fase
+    estimated_bandwidth:
+        description:
+            - Bandwidth in MiB/s a single migration is expected to get, used
+              to estimate the duration of migrations
+            - Capped by bwlimit
+            - Default: 1000
     migrate_ha:
         description:
             - wather or not to migrate vms in HA setup
             - If set to false, check_ha is set to true
             - Default true
         required: true
+    max_cpu_ratio:
+        description:
+            - CPU usage of a target node must stay below this fraction of its
+              cores after placing VMs on it
+            - Default: 1.0
+    max_memory_ratio:
+        description:
+            - Memory usage of a target node must stay below this fraction of
+              its memory after placing VMs on it
+            - Default: 0.9
+    memory_basis:
+        description:
+            - Memory of VMs to plan with, configured (maxmem) or currently
+              used (mem)
+            - Default: maxmem
+        choices: ['maxmem', 'mem']
+    mode:
+        description:
+            - migrate moves guests away from src_node_name
+            - return migrates all guests tagged parked-from-<src_node_name>
+              back to src_node_name and removes the tag, guests already
+              there are only untagged. Running it again changes nothing
+            - Default: migrate
+        choices: ['migrate', 'return']
     maxworkers:
         description:
             - Maximum Number of parallel Workers for the migration process
+            - Every VM is migrated by a task of its own, running VMs are
+              migrated online, running containers with restart
+            - Default: 1
+    max_per_target:
+        description:
+            - Maximum number of migrations to the same node running at the
+              same time
             - Default: 1
+    park:
+        description:
+            - Tag guests with parked-from-<src_node_name> before migrating
+              them, so mode=return finds them even if parked_vms got lost
+            - Guests already carrying such a tag keep it
+            - Default: true
+    order:
+        description:
+            - Order to start migrations in, by their estimated duration
+            - largest_first keeps the total time short when migrating in
+              parallel, shortest_first moves the most VMs away early,
+              ha_first migrates HA managed VMs first
+            - The duration is estimated from memory in use, its recent
+              activity, local disks (with_local_disks) and estimated_bandwidth
+            - Default: largest_first
+        choices: ['largest_first', 'shortest_first', 'ha_first']
     src_node_name:
         description:
             - node to migrate away from
+            - node to return guests to with mode=return
+    retries:
+        description:
+            - Number of retries of migrations failing with a transient error,
+              e.g. the VM being locked or a connection timing out
+            - Default: 2
+    timeout:
+        description:
+            - Seconds to wait for the migration of a single VM
+            - Default: 3600
     target_nodes:
         description:
             - List of nodes to migrate to
             - Will automatically detect other nodes in the cluster if not set or list includes 'all'
             - Be careful in HA setups as Proxmox will move VMs back inside HA group if the target node is not part of it
+    use_rrddata:
+        description:
+            - Take the recent memory activity of running VMs from their RRD
+              data into account when estimating migration durations
+            - Needs one API call per running VM
+            - Default: false
     vmids:
         description:
              - List of VMIDs to migrate
@@ -64,6 +144,12 @@ EXAMPELS = '''
   proxmox_migrate:
     src_node_name: "{{ inventory_hostname }}"
     validate_certs: false
+
+- name: Migrate all vms parked away from this node back
+  inett.pve.vm_migrate:
+    src_node_name: "{{ inventory_hostname }}"
+    mode: return
+    maxworkers: 4
 '''
 
 RETURN = r'''
@@ -75,10 +161,44 @@ message:
     description: VMs (value) and nodes (value) they're migrated to on
     type: dict
     returned: always
+load:
+    description:
+        - Memory and CPU usage ratio of target nodes before and after placing
+          VMs on them
+        - VMs are placed largest first on the node with the lowest memory
+          usage afterwards, so the plan only depends on the cluster state
+    type: dict
+    returned: always
+estimate:
+    description:
+        - Estimated duration of all migrations (total) in seconds and start
+          and end of each migration in the order they are started
+        - Assumes every migration gets estimated_bandwidth
+    type: dict
+    returned: always
+unplaced:
+    description: VMs without a target node having enough headroom
+    type: list
+    returned: always
+no_target:
+    description:
+        - VMs staying on the source node as no target node is eligible for
+          them, e.g. HA managed VMs whose group has no other available member
+    type: list
+    returned: always
 original_message:
     description: VMs (value) and nodes (value) they're running on
     type: dict
     returned: always
+migrations:
+    description:
+        - Migration of each VM with its source, target and final node, the
+          number of attempts, duration in seconds, task ID, exit status and
+          the end of the task log if it failed
+        - HA managed VMs are only reported as migrated once they run on their
+          target
+    type: list
+    returned: when VMs were migrated
 ansible_facts:
     type: dict
     returned: always
@@ -89,33 +209,201 @@ ansible_facts:
 '''
 
 
-import random
-import time
-
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
+from ansible_collections.inett.pve.plugins.module_utils.pve_ha import HA_QUERIES
+from ansible_collections.inett.pve.plugins.module_utils.pve_migration import (
+    ha_candidates, memory_activity, migration_cost, node_load, order_jobs,
+    parse_size, parked_from, plan_placement, predict_makespan,
+    run_migrations, set_park_tag,
+)
+from ansible_collections.inett.pve.plugins.module_utils.pve_property import key_class, parse_config
+from ansible_collections.inett.pve.plugins.module_utils.pve_tasks import parse_upid
+
+
+def _local_disk_sizes(module, jobs):
+    """Returns the size of disks on local storages of every guest
+
+    :returns: dict: vmid -> bytes
+    :rtype: dict
+    """
+
+    queries = [("get", "/storage")] + [
+        ("get", "/nodes/%s/%s/%s/config" % (j['source'], j['type'], j['vmid'])) for j in jobs
+    ]
+    results = module.query_many(queries, fail="failed to get guest configs")
+    shared = dict([(s['storage'], bool(int(s.get('shared', 0) or 0))) for s in results[0][3]])
+    # storages which are always shared
+    for s in results[0][3]:
+        if s.get('type', None) in ['rbd', 'cephfs', 'nfs', 'cifs', 'glusterfs', 'iscsi', 'pbs']:
+            shared[s['storage']] = True
+
+    ret = dict()
+    for (j, r) in zip(jobs, results[1:]):
+        size = 0
+        for (k, v) in parse_config(r[3]).items():
+            if (key_class(k) != 'disk') or not isinstance(v, dict):
+                continue
+            volume = v.get('volume', "")
+            if (v.get('media', None) == 'cdrom') or (':' not in volume):
+                continue
+            if not shared.get(volume.split(':', 1)[0], False):
+                size += parse_size(v.get('size', 0))
+        ret[j['vmid']] = size
+    return ret
+
+
+def _set_tags(module, items, fail):
+    """Sets tags of guests
+
+    :param items: list of (node, type, vmid, tags)
+    :type items: list
+    """
+
+    results = module.query_many([
+        ("set", "/nodes/%s/%s/%s/config" % (node, vm_type, vmid),
+         dict(tags=tags) if tags != "" else dict(delete='tags'))
+        for (node, vm_type, vmid, tags) in items
+    ])
+    failed = [str(i[2]) for (i, r) in zip(items, results) if r[0] != 0]
+    if len(failed) > 0:
+        module.fail_json(msg="%s: %s" % (fail, ', '.join(failed)))
+
+
+def _plan_evacuation(module, result, guests, nodes, ha):
+    """Places guests of the source node on other nodes
+
+    :param ha: HA snapshot or None if HA groups are to be ignored
+    :type ha: PveHaState
+
+    :returns: list of dict(vmid, type, source, target) in placement order
+    :rtype: list
+    """
+
+    src_node = module.params['src_node_name']
 
+    # Get possible targets
+    if '_all' in module.params['target_nodes']:
+        target_nodes = sorted(nodes.keys())
+    else:
+        target_nodes = module.params['target_nodes']
 
+    targets = dict([(v, []) for v in target_nodes])
+    targets[src_node] = []
 
-def _pick_target(targets, target_nodes, fallback):
-    if len(target_nodes) == 0:
-        _ret = fallback
-    elif len(target_nodes) == 1:
-        _ret = target_nodes[0]
+    # Guests to move
+    if '_auto' in module.params['vmids']:
+        vmids = [
+            v['vmid'] for v in sorted(guests.values(), key=lambda x: (x['type'] != 'qemu', x['vmid']))
+            if (v.get('node', None) == src_node) and (v.get('status', None) == 'running')
+        ]
     else:
-        min_l = min([len(targets[x]) for x in target_nodes])
-        min_l_lists = [k for k in target_nodes if len(targets[k]) == min_l]
-        l_i = random.randint(0, len(min_l_lists) - 1)
-        _ret = min_l_lists[l_i]
-    return _ret
+        vmids = [int(v) for v in module.params['vmids']]
+        missing = [str(v) for v in vmids if v not in guests]
+        if len(missing) > 0:
+            module.fail_json(msg="VMs %s not found" % ', '.join(missing))
+    result['original_message'][src_node] = vmids
+
+    candidates = dict()
+    to_place = []
+    for vmid in vmids:
+        if (ha is not None) and (ha.vm_group(vmid) is not None):
+            if not module.params['migrate_ha']:
+                # stays where it is
+                targets[src_node].append(vmid)
+                continue
+            members = ha.vm_group_members(vmid)
+            if members is not None:
+                candidates[vmid] = ha_candidates(members, list(nodes.keys()))
+            else:
+                candidates[vmid] = target_nodes
+        else:
+            candidates[vmid] = target_nodes
+        to_place.append(guests[vmid])
+
+    plan = plan_placement(
+        to_place, nodes, candidates,
+        max_memory_ratio=module.params['max_memory_ratio'],
+        max_cpu_ratio=module.params['max_cpu_ratio'],
+        memory=module.params['memory_basis'],
+        allow_overcommit=module.params['allow_overcommit'],
+    )
+    for g in sorted(to_place, key=lambda x: vmids.index(x['vmid'])):
+        target = plan['placement'].get(g['vmid'], src_node)
+        targets.setdefault(target, []).append(g['vmid'])
+
+    result['message'] = targets
+    result['load'] = plan['load']
+    result['unplaced'] = plan['unplaced']
+    result['no_target'] = plan['no_target']
+
+    for k in targets:
+        if (len(targets[k]) > 0) and (k != src_node):
+            result['changed'] = True
+
+    return [
+        dict(vmid=vmid, type=guests[vmid]['type'],
+             source=guests[vmid].get('node', src_node), target=target)
+        for (vmid, target) in plan['placement'].items()
+    ]
+
+
+def _plan_return(module, result, guests, node_data):
+    """Returns guests parked away from the source node to it
+
+    :returns: tuple: (list of dict(vmid, type, source, target), list of
+        (node, type, vmid, tags) of guests already back home)
+    :rtype: tuple
+    """
+
+    home = module.params['src_node_name']
+    if home not in [v['node'] for v in node_data if v.get('status', None) == 'online']:
+        module.fail_json(msg="node %s is not online" % home)
+
+    parked = [
+        g for g in sorted(guests.values(), key=lambda x: x['vmid'])
+        if parked_from(g.get('tags', None)) == home.lower()
+    ]
+    if '_auto' not in module.params['vmids']:
+        vmids = [int(v) for v in module.params['vmids']]
+        parked = [g for g in parked if g['vmid'] in vmids]
+
+    jobs = list()
+    untag = list()
+    for g in parked:
+        result['original_message'].setdefault(g.get('node', None), list()).append(g['vmid'])
+        if g.get('node', None) == home:
+            untag.append((home, g['type'], g['vmid'], set_park_tag(g.get('tags', None))))
+        else:
+            jobs.append(dict(vmid=g['vmid'], type=g['type'], source=g['node'], target=home))
+    result['message'] = {home: [g['vmid'] for g in parked]}
+    result['load'] = dict()
+    result['unplaced'] = list()
+    result['no_target'] = list()
+    result['changed'] = len(parked) > 0
+    return jobs, untag
 
 
 def run_module():
     module_args = dict(
+        allow_overcommit=dict(type='bool', required=False, default=False),
+        bwlimit=dict(type='int', required=False, default=None),
         check_ha=dict(type='bool', required=False, default=True),
+        estimated_bandwidth=dict(type='int', required=False, default=1000),
+        max_cpu_ratio=dict(type='float', required=False, default=1.0),
+        max_memory_ratio=dict(type='float', required=False, default=0.9),
+        memory_basis=dict(type='str', required=False, default='maxmem', choices=['maxmem', 'mem']),
         migrate_ha=dict(type='bool', required=False, default=True),
+        mode=dict(type='str', required=False, default='migrate', choices=['migrate', 'return']),
+        park=dict(type='bool', required=False, default=True),
+        order=dict(type='str', required=False, default='largest_first',
+                   choices=['largest_first', 'shortest_first', 'ha_first']),
         maxworkers=dict(type='int', required=False, default=1),
+        max_per_target=dict(type='int', required=False, default=1),
+        retries=dict(type='int', required=False, default=2),
         src_node_name=dict(type='str', required=True),
         target_nodes=dict(type='list', required=False, default=['_all']),
+        timeout=dict(type='int', required=False, default=3600),
+        use_rrddata=dict(type='bool', required=False, default=False),
         vmids=dict(type='list', required=False, default=['_auto']),
         with_local_disks=dict(type='bool', required=False, default=False)
     )
@@ -130,158 +418,163 @@ def run_module():
         supports_check_mode=True
     )
 
-    module.params['validate_certs'] = (module.params['validate_certs'] == "True")
-
     if not module.params['migrate_ha']:
         module.params['check_ha'] = True
 
-    if module.params['check_ha']:
-        rc, _out, _err, ha_groups = module.query_json("get", "/cluster/ha/groups")
+    src_node = module.params['src_node_name']
+
+    # All reads are independent of each other, issue them in one go; the HA
+    # snapshot is built from the responses cached by this batch
+    results = module.query_many(HA_QUERIES + [
+        ("get", "/cluster/resources", dict(type='node')),
+        ("get", "/cluster/resources", dict(type='vm')),
+    ])
+    (rc_nodes, _out, _err, node_data) = results[len(HA_QUERIES)]
+    (rc_vms, _out, _err, vm_data) = results[len(HA_QUERIES) + 1]
+    ha = module.get_ha_state()
+
+    if rc_nodes != 0:
+        module.fail_json(msg="failed to get target nodes")
+    if rc_vms != 0:
+        module.fail_json(msg="failed to get guests")
+
+    # Nodes able to receive guests and their current load
+    nodes = dict()
+    for v in node_data:
+        if (v.get('status', None) == 'online') and (v['node'] != src_node):
+            nodes[v['node']] = node_load(v)
 
-        if rc != 0:
+    if module.params['check_ha']:
+        if not ha.available('groups'):
             module.fail_json(msg="failed to get HA groups")
-
-        ha_group_node_map = {}
-        for v in ha_groups:
-            ha_group_node_map[v['group']] = v['nodes'].split(',')
-
-
-        rc, _out, _err, ha_resources = module.query_json("get", "/cluster/ha/resources")
-
-        if rc != 0:
+        if not ha.available('resources'):
             module.fail_json(msg="failed to get HA resources")
 
-        ha_vm_group_map = {}
-        for v in ha_resources:
-            if 'group' in v.keys():
-                ha_vm_group_map[v['sid'].split(':', 1)[1]] = v['group']
-
-        def _get_target_nodes(vmid, default):
-            if vmid in ha_vm_group_map:
-                if module.params['migrate_ha']:
-                    if ha_vm_group_map[vmid] in ha_group_node_map:
-                        _ret = ha_group_node_map[ha_vm_group_map[vmid]]
-                        if module.params['src_node_name'] in _ret:
-                            _ret.remove(module.params['src_node_name'])
-                        return _ret
-                else:
-                    return []
-            return default
-    else:
-        def _get_target_nodes(_vmid, default):
-            return default
-
     facts = dict()
-    targets = dict()
-
-    # Get possible targets
-    target_nodes = []
+    guests = dict([(int(v['vmid']), v) for v in vm_data])
+    ha_managed = ha.managed_vmids()
 
-    if '_all' in module.params['target_nodes']:
-        rc, out, err, qs_data = module.query_json("get", "/cluster/status")
-        if rc == 0:
-            for v in qs_data:
-                if v["type"] == "node":
-                    if v["name"] != module.params["src_node_name"]:
-                        target_nodes.append(v["name"])
-        else:
-            module.fail_json(msg="failed to get target nodes")
+    if module.params['mode'] == 'return':
+        jobs, untag = _plan_return(module, result, guests, node_data)
+        facts['parked_vms'] = dict()
     else:
-        target_nodes = module.params['target_nodes']
-
-    for v in target_nodes:
-        result['message'][v] = []
-        targets[v] = []
-        targets[module.params['src_node_name']] = []
-
-    if '_auto' in module.params['vmids']:
-        # Get qemu vms to move
-        qemu_migrate = []
-        rc, _out, _err, sq_data = module.query_json("get",
-                                                    "/nodes/"+module.params['src_node_name']+"/qemu"
-                                                    )
-        if rc == 0:
-            for v in sq_data:
-                if v["status"] == "running":
-                    qemu_migrate.append(v["vmid"])
-
-        # Determine qemu targets
-        for vmid in qemu_migrate:
-            _target_nodes = _get_target_nodes(vmid, target_nodes)
-            _target_node = _pick_target(targets, _target_nodes, module.params['src_node_name'])
-            targets[_target_node].append(vmid)
-
-        # Get lxc container to move
-        lxc_migrate = []
-        rc, _out, _err, lxc_data = module.query_json("get",
-                                                     "/nodes/"+module.params['src_node_name']+"/lxc"
-                                                     )
-        if rc == 0:
-            for v in lxc_data:
-                if v["status"] == "running":
-                    lxc_migrate.append(v["vmid"])
-
-        # Determine LXC targets
-        for vmid in lxc_migrate:
-            _target_nodes = _get_target_nodes(vmid, target_nodes)
-            _target_node = _pick_target(targets, _target_nodes, module.params['src_node_name'])
-            targets[_target_node].append(vmid)
-
-        result['message'] = targets
-
-        result['original_message'][module.params['src_node_name']] = (
-                qemu_migrate + lxc_migrate
+        jobs = _plan_evacuation(
+            module, result, guests, nodes, ha if module.params['check_ha'] else None
         )
-    else:
-        for vmid in module.params['vmids']:
-            _target_nodes = _get_target_nodes(vmid, target_nodes)
-            _target_node = _pick_target(targets, _target_nodes, module.params['src_node_name'])
-            targets[_target_node].append(vmid)
+        facts['parked_vms'] = result['message']
+        if len(result['no_target']) > 0:
+            module.warn("no eligible target for VMs %s, they stay on %s" % (
+                ', '.join([str(v) for v in result['no_target']]), src_node
+            ))
+        if len(result['unplaced']) > 0:
+            module.fail_json(
+                msg="no target with enough headroom for VMs %s" % ', '.join(
+                    [str(v) for v in result['unplaced']]
+                ),
+                ansible_facts=facts, **result
+            )
+        untag = list()
+    for j in jobs:
+        j['running'] = guests[j['vmid']].get('status', None) == 'running'
+        j['ha'] = j['vmid'] in ha_managed
+
+    # Estimate the cost of every migration to order them
+    bandwidth = module.params['estimated_bandwidth'] * 1024 ** 2
+    if module.params['bwlimit'] is not None:
+        bandwidth = min(bandwidth, module.params['bwlimit'] * 1024)
+    local_disks = _local_disk_sizes(module, jobs) if module.params['with_local_disks'] else dict()
+    activity = dict()
+    if module.params['use_rrddata']:
+        active = [j for j in jobs if j['running'] and (j['type'] == 'qemu')]
+        for (j, r) in zip(active, module.query_many([
+            ("get", "/nodes/%s/qemu/%s/rrddata" % (j['source'], j['vmid']),
+             dict(timeframe='hour', cf='AVERAGE'))
+            for j in active
+        ])):
+            if r[0] == 0:
+                activity[j['vmid']] = memory_activity(r[3])
+    for j in jobs:
+        j['cost'] = migration_cost(
+            guests[j['vmid']], bandwidth,
+            local_disk=local_disks.get(j['vmid'], 0), activity=activity.get(j['vmid'], 0.0),
+        )
+    jobs = order_jobs(jobs, module.params['order'])
+    (total, schedule) = predict_makespan(
+        jobs, max_workers=module.params['maxworkers'], max_per_target=module.params['max_per_target']
+    )
+    result['estimate'] = dict(total=round(total, 1), order=module.params['order'], migrations=schedule)
 
-        result['message'] = targets
+    if module.check_mode:
+        module.exit_json(**result, ansible_facts=facts)
 
-        result['original_message'] = {
-            module.params['src_node_name']: module.params['vmids']
-        }
+    # Persist where guests belong before moving them; guests parked before
+    # keep the node they belong on
+    if (module.params['mode'] == 'migrate') and module.params['park']:
+        _set_tags(module, [
+            (j['source'], j['type'], j['vmid'], set_park_tag(guests[j['vmid']].get('tags', None), j['source']))
+            for j in jobs if parked_from(guests[j['vmid']].get('tags', None)) is None
+        ], "failed to tag VMs with the node they belong on")
 
-    for k in targets:
-        if (len(targets[k]) > 0) and (k != module.params['src_node_name']):
-            result['changed'] = True
+    # Migrate 'em all
+    def _start(job):
+        params = dict(target=job['target'])
+        if module.params['bwlimit'] is not None:
+            params['bwlimit'] = module.params['bwlimit']
+        if job['type'] == 'qemu':
+            if job['running']:
+                params['online'] = 1
+            if module.params['with_local_disks']:
+                params['with-local-disks'] = 1
+        elif job['running']:
+            # containers can't be migrated live
+            params['restart'] = 1
+        rc, _out, err, upid = module.query_json(
+            "create", "/nodes/%s/%s/%s/migrate" % (job['source'], job['type'], job['vmid']),
+            params=params,
+        )
+        return rc, upid, err
 
-    facts['parked_vms'] = result['message']
+    def _status_many(upids):
+        return [(r[0], r[3]) for r in module.query_many([
+            ("get", "/nodes/%s/tasks/%s/status" % (parse_upid(u)['node'], u)) for u in upids
+        ], cache=False)]
 
-    if module.check_mode:
-        module.exit_json(**result, ansible_facts=facts)
+    def _locate():
+        _rc, _out, _err, obj = module.query_json(
+            "get", "/cluster/resources", params=dict(type='vm'), cache=False
+        )
+        return dict([(int(v['vmid']), v.get('node', None)) for v in obj or []])
 
-    # Migrate 'em all
-    for k in targets:
-        if (len(targets[k]) < 1) or (k == module.params['src_node_name']):
-            continue
-
-        qemu_data = {
-            "target": k,
-            "vms": targets[k],
-            "maxworkers": module.params['maxworkers'],
-            "with-local-disks": int(module.params['with_local_disks'])
-        }
-        rc_qemu, _out, _err = module.query_api("create",
-                                               "/nodes/"+module.params["src_node_name"]+"/migrateall",
-                                               params=qemu_data
-                                               )
-        lxc_data = {
-            "target": k,
-            "vms": targets[k],
-            "maxworkers": module.params['maxworkers']
-        }
-        rc_lxc, _out, _err = module.query_api("create",
-                                              "/nodes/"+module.params["src_node_name"]+"/migrateall",
-                                              params=lxc_data
-                                              )
-        if (rc_lxc != 0) or (rc_qemu != 0):
-            module.fail_json(msg="failed to migrate")
-
-    if result['changed']:
-        time.sleep(5)
+    def _task_log(upid):
+        rc, _out, _err, obj = module.query_json(
+            "get", "/nodes/%s/tasks/%s/log" % (parse_upid(upid)['node'], upid),
+            params=dict(start=0, limit=100000), cache=False,
+        )
+        if (rc != 0) or not isinstance(obj, list):
+            return []
+        return [e.get('t', "") for e in obj[-20:]]
+
+    result['migrations'] = run_migrations(
+        jobs, _start, _status_many, locate=_locate, task_log=_task_log,
+        max_workers=module.params['maxworkers'],
+        max_per_target=module.params['max_per_target'],
+        retries=module.params['retries'],
+        timeout=module.params['timeout'],
+    )
+
+    if module.params['mode'] == 'return':
+        # Guests back home aren't parked anymore
+        _set_tags(module, [
+            (src_node, guests[m['vmid']]['type'], m['vmid'],
+             set_park_tag(guests[m['vmid']].get('tags', None)))
+            for m in result['migrations'] if m['ok']
+        ] + untag, "failed to remove park tags")
+
+    failed = [str(m['vmid']) for m in result['migrations'] if not m['ok']]
+    if len(failed) > 0:
+        module.fail_json(
+            msg="failed to migrate VMs %s" % ', '.join(failed), ansible_facts=facts, **result
+        )
 
     module.exit_json(**result, ansible_facts=facts)
 
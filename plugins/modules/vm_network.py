@@ -62,13 +62,16 @@ original_message:
     description: Original network config to be changed
     type: dict
     returned: always
+diff:
+    description: Values of changed config keys before and after the change
+    type: dict
+    returned: always
 '''
 
 
 from ansible_collections.inett.pve.plugins.module_utils.pve import PveApiModule
 
 import copy
-import sys
 
 
 
@@ -132,62 +135,22 @@ def run_module():
         if len(update_params["ipconfig%s" % k]) == 0:
             update_params.pop("ipconfig%s" % k, None)
 
-    # message = dict({
-    #     k: re.sub(r"^file=", "", PveApiModule.params_dict_to_string(v))
-    #     for (k, v) in update_params.items()
-    # })
-    message = update_params;
+    message = copy.deepcopy(update_params)
 
     old_message = dict({k: vm_config.get(k, None) for (k, v) in update_params.items()})
 
-    try:
-        msg_cmp_a = copy.deepcopy(old_message)
-        msg_cmp_b = copy.deepcopy(message)
-        for k, v in msg_cmp_a.items():
-            if k.startswith("net") and v is not None:
-                if "macaddr" in v.keys():
-                    v.pop("macaddr")
-                if "virtio" in v.keys():
-                    v.update({"model": "virtio"})
-                    v.pop("virtio")
-                if "firewall" in v.keys():
-                    v.update({"firewall": bool(int(v.get("firewall")))})
-                if "tag" in v.keys():
-                    v.update({"tag": int(v.get("tag"))})
-        for k, v in msg_cmp_b.items():
-            if k.startswith("net") and v is not None:
-                if "virtio" in v.keys():
-                    v.update({"model": "virtio"})
-                    v.pop("virtio")
-                if "macaddr" in v.keys():
-                    v.pop("macaddr")
-    except:
-        mod.fail_json(msg="preparation for comparison failed", error=sys.exec_info()[0],
-                key=k, value=v, msg_cmp_a=msg_cmp_a, msg_cmp_b=msg_cmp_b
-        )
-
-    # remove elements, that didn't change
-    for k, v in msg_cmp_b.items():
-        if v == msg_cmp_a.get(k, None):
-            update_params.pop(k, None)
-
-    changed = (msg_cmp_a != msg_cmp_b)
-
-    if changed:
-        mod.vm_config_set(
-            mod.params['vmid'],
-            node=vm['node'],
-            digest=vm_config.get('digest', None),
-            config=update_params,
-            vm=vm
-        )
+    changed, diff = mod.vm_config_update(
+        mod.params['vmid'],
+        update_params,
+        vm=vm,
+        current=vm_config,
+    )
 
     mod.exit_json(
         changed=changed,
         message=message,
         original_message=old_message,
-        msg_cmp_a=msg_cmp_a,
-        msg_cmp_b=msg_cmp_b,
+        diff=diff,
     )
     return
 
@@ -58,6 +58,10 @@ original_message:
     description: Original list of tags
     type: dict
     returned: always
+diff:
+    description: Values of changed config keys before and after the change
+    type: dict
+    returned: always
 '''
 
 
@@ -69,7 +73,7 @@ def run_module():
         # VM identification
         vmid=dict(type='int'),
 
-        tag=dict(type='list', required=False, default=None, elements='string'),
+        tag=dict(type='list', required=False, default=None, elements='str'),
     )
 
     mod = PveApiModule(argument_spec=arg_spec, supports_check_mode=True)
@@ -78,33 +82,26 @@ def run_module():
 
     tag = mod.params.get('tag', None)
 
-    update_params = {
+    old_message = {
+        'tag': vm_config.get('tags', None)
+    }
+    message = {
         'tag': tag
     }
 
-    old_message = dict({k: vm_config.get(k, None) for (k, v) in update_params.items()})
-    message = old_message.copy()
-    message.pop('digest', None)
-    message.update(update_params)
-    changed = (old_message != message)
-
-    if update_params['tag'] is None:
-        update_params.pop('tag')
-        update_params['delete'] = ['tag']
-
-    if changed:
-        mod.vm_config_set(
-            mod.params['vmid'],
-            node=vm['node'],
-            digest=vm_config.get('digest', None),
-            config=update_params,
-            vm=vm
-        )
+    # Tags are stored as config key 'tags'; None deletes them
+    changed, diff = mod.vm_config_update(
+        mod.params['vmid'],
+        {'tags': tag},
+        vm=vm,
+        current=vm_config,
+    )
 
     mod.exit_json(
         changed=changed,
         message=message,
-        original_message=old_message
+        original_message=old_message,
+        diff=diff,
     )
     return
 